@@ -0,0 +1,430 @@
+import os
+import json
+import glob
+import time
+import random
+import asyncio
+import argparse
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl # Serializes saves from several workers; without it concurrent saves may drop each other's updates
+except ImportError:
+    fcntl = None
+
+from question_bank import BankQuestion, QuestionBank, QuestionIndex, question_bank
+
+ADAPTIVE_PARAMS_PATH = os.getenv(
+    "ADAPTIVE_PARAMS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "adaptive_params.npz")
+)
+ADAPTIVE_TARGET_SUCCESS = float(os.getenv("ADAPTIVE_TARGET_SUCCESS", "0.7"))
+ADAPTIVE_K = float(os.getenv("ADAPTIVE_K", "0.4")) # Elo step size for new users and questions
+ADAPTIVE_K_MIN = float(os.getenv("ADAPTIVE_K_MIN", "0.05")) # ... decaying to this as answers accumulate
+ADAPTIVE_BATCH_SIZE = int(os.getenv("ADAPTIVE_BATCH_SIZE", "64"))
+ADAPTIVE_RESORT_EVERY = int(os.getenv("ADAPTIVE_RESORT_EVERY", "256"))
+ADAPTIVE_CANDIDATES = int(os.getenv("ADAPTIVE_CANDIDATES", "5"))
+ADAPTIVE_SAVE_INTERVAL_S = float(os.getenv("ADAPTIVE_SAVE_INTERVAL_S", "300"))
+# Starting difficulty (logits) for questions with a `difficulty` field and no answers yet
+DIFFICULTY_PRIORS = {"easy": -1.0, "medium": 0.0, "hard": 1.0}
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _step(counts: np.ndarray) -> np.ndarray:
+    """Per-entity Elo step: large while an estimate rests on few answers, shrinking towards ADAPTIVE_K_MIN."""
+    return np.maximum(ADAPTIVE_K / np.sqrt(1.0 + counts), ADAPTIVE_K_MIN)
+
+
+def _merge_estimate(mine: Tuple[float, float], base: Optional[Tuple[float, float]], theirs: Optional[Tuple[float, float]]) -> Tuple[float, float]:
+    """
+    Combines this process's (estimate, answer count) with the one another process saved since `base` was read:
+    Elo steps add up, so both sets of changes since `base` are kept. Without a common base the estimate backed by
+    more answers wins.
+    """
+    if theirs is None:
+        return mine
+    if base is None:
+        return mine if mine[1] >= theirs[1] else theirs
+    return theirs[0] + mine[0] - base[0], theirs[1] + mine[1] - base[1]
+
+
+def fit_rasch(
+    users: np.ndarray,
+    questions: np.ndarray,
+    correct: np.ndarray,
+    n_users: int,
+    n_questions: int,
+    iterations: int = 30,
+    l2: float = 0.1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fits a Rasch (1PL IRT) model, P(correct) = sigmoid(ability[u] - difficulty[q]), to a batch of answers by
+    alternating diagonal Newton steps. Every step is a handful of whole-array operations (gradients via bincount),
+    so millions of answers fit in seconds. The L2 prior keeps users and questions with few answers near 0.
+    """
+    ability = np.zeros(n_users)
+    difficulty = np.zeros(n_questions)
+    y = correct.astype(np.float64)
+    for _ in range(iterations):
+        p = _sigmoid(ability[users] - difficulty[questions])
+        grad = np.bincount(users, y - p, n_users) - l2 * ability
+        ability += grad / (np.bincount(users, p * (1 - p), n_users) + l2)
+        p = _sigmoid(ability[users] - difficulty[questions])
+        grad = np.bincount(questions, p - y, n_questions) - l2 * difficulty
+        difficulty += grad / (np.bincount(questions, p * (1 - p), n_questions) + l2)
+    return ability, difficulty
+
+
+def read_progress_answers(progress_dir: str) -> Tuple[List[str], List[int], List[bool]]:
+    """(user ids, question ids, correct) for every answer in the ProgressTracker files under `progress_dir`."""
+    users, questions, correct = [], [], []
+    for path in glob.glob(os.path.join(progress_dir, "progress_*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                progress = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"WARNING: skipping unreadable progress file {path}.")
+            continue
+        answers = progress.get("answers", {})
+        user_id = progress.get("user_id") or os.path.basename(path)[len("progress_"):-len(".json")]
+        for question_id, answer in answers.items():
+            try:
+                questions.append(int(question_id))
+            except ValueError:
+                continue
+            users.append(user_id)
+            correct.append(bool(answer.get("correct")))
+    return users, questions, correct
+
+
+class _SortedPool:
+    __slots__ = ("pool", "epoch", "positions", "sorted_difficulty")
+
+    def __init__(self, pool: List[BankQuestion], epoch: int, positions: np.ndarray, sorted_difficulty: np.ndarray):
+        self.pool = pool
+        self.epoch = epoch
+        self.positions = positions # Bank positions of the pool's questions, easiest first
+        self.sorted_difficulty = sorted_difficulty
+
+
+class AdaptiveDifficultyEngine:
+    def __init__(self, bank: QuestionBank = question_bank, params_path: str = ADAPTIVE_PARAMS_PATH, target: float = ADAPTIVE_TARGET_SUCCESS):
+        """
+        Elo/IRT-style adaptive question selection.
+        Question difficulties and user abilities live in NumPy arrays (logits), with per-entity answer counts
+        that shrink the Elo step as estimates firm up. Answers are queued by record() and applied in vectorized
+        batches. select() targets the difficulty at which the user's predicted success probability equals
+        `target` and binary-searches a difficulty-sorted index of the candidate pool, then takes one of the
+        closest questions the user has not done. The sorted index is rebuilt only every ADAPTIVE_RESORT_EVERY
+        updates; in between, candidates near the search point are re-ranked with their current difficulty.
+        Parameters follow the bank across reloads (matched by question id) and are saved to `params_path` by
+        run_saver() every ADAPTIVE_SAVE_INTERVAL_S and at shutdown. Every worker saves to the same file, so a save
+        merges in the changes other workers saved since this one last read it instead of overwriting them.
+        recalibrate() refits all of them offline from the ProgressTracker files.
+        """
+        self.bank = bank
+        self.params_path = params_path
+        self.target_offset = float(np.log(target / (1 - target)))
+        self._lock = threading.Lock()
+        self._index: Optional[QuestionIndex] = None
+        self.question_ids = np.zeros(0, dtype=np.int64)
+        self.difficulty = np.zeros(0)
+        self.question_counts = np.zeros(0)
+        self._question_pos: Dict[int, int] = {}
+        self._user_pos: Dict[str, int] = {}
+        self.ability = np.zeros(16)
+        self.user_counts = np.zeros(16)
+        self._pending: List[Tuple[int, int, bool]] = []
+        self._epoch = 0
+        self._updates_since_sort = 0
+        self._sorted: Dict[int, _SortedPool] = {}
+        self.updates = 0
+        self._saved_questions: Dict[int, Tuple[float, float]] = {}
+        # Parameters as last read from or written to params_path; a save merges in what others changed since
+        self._base_questions: Dict[int, Tuple[float, float]] = {}
+        self._base_users: Dict[str, Tuple[float, float]] = {}
+        self._saved_updates = 0
+        self._saver_task: Optional[asyncio.Task] = None
+        self._load()
+
+    def _read_params(self) -> Optional[Tuple[Dict[int, Tuple[float, float]], Dict[str, Tuple[float, float]]]]:
+        """(question id -> (difficulty, count), user id -> (ability, count)) from params_path, or None."""
+        if not os.path.exists(self.params_path):
+            return None
+        try:
+            params = np.load(self.params_path)
+            questions = {
+                int(qid): (float(b), float(n))
+                for qid, b, n in zip(params["question_ids"], params["difficulty"], params["question_counts"])
+            }
+            users = {
+                str(user_id): (float(a), float(n))
+                for user_id, a, n in zip(params["user_ids"], params["ability"], params["user_counts"])
+            }
+            return questions, users
+        except (OSError, KeyError, ValueError) as e:
+            print(f"WARNING: could not load adaptive difficulty parameters from {self.params_path}: {e}")
+            return None
+
+    def _load(self):
+        params = self._read_params()
+        if params is None:
+            return
+        questions, users = params
+        self._saved_questions = dict(questions)
+        self._base_questions, self._base_users = questions, dict(users)
+        self._user_pos = {user_id: i for i, user_id in enumerate(users)}
+        size = max(16, len(users))
+        self.ability = np.zeros(size)
+        self.user_counts = np.zeros(size)
+        for i, (a, n) in enumerate(users.values()):
+            self.ability[i], self.user_counts[i] = a, n
+
+    def save(self):
+        """Merges this process's estimates with the saved ones and writes them atomically."""
+        os.makedirs(os.path.dirname(self.params_path) or ".", exist_ok=True)
+        with self._lock, open(self.params_path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._flush()
+            for qid, b, n in zip(self.question_ids.tolist(), self.difficulty.tolist(), self.question_counts.tolist()):
+                self._saved_questions[qid] = (b, n)
+            users = {user_id: (float(self.ability[pos]), float(self.user_counts[pos])) for user_id, pos in self._user_pos.items()}
+            on_disk = self._read_params()
+            if on_disk is not None:
+                their_questions, their_users = on_disk
+                for qid, theirs in their_questions.items():
+                    mine = self._saved_questions.get(qid)
+                    self._saved_questions[qid] = theirs if mine is None else _merge_estimate(mine, self._base_questions.get(qid), theirs)
+                for user_id, theirs in their_users.items():
+                    mine = users.get(user_id)
+                    users[user_id] = theirs if mine is None else _merge_estimate(mine, self._base_users.get(user_id), theirs)
+                # Adopt the merged estimates
+                for qid, pos in self._question_pos.items():
+                    self.difficulty[pos], self.question_counts[pos] = self._saved_questions[qid]
+                for user_id, (a, n) in users.items():
+                    pos = self._user(user_id)
+                    self.ability[pos], self.user_counts[pos] = a, n
+                self._resort()
+            saved = sorted(self._saved_questions.items())
+            user_ids = list(users)
+            tmp_path = f"{self.params_path}.{os.getpid()}.tmp.npz" # Per process, so concurrent writers never share it
+            np.savez(
+                tmp_path,
+                question_ids=np.array([qid for qid, _ in saved], dtype=np.int64),
+                difficulty=np.array([b for _, (b, _) in saved]),
+                question_counts=np.array([n for _, (_, n) in saved]),
+                user_ids=np.array(user_ids, dtype=str),
+                ability=np.array([users[u][0] for u in user_ids]),
+                user_counts=np.array([users[u][1] for u in user_ids]),
+            )
+            os.replace(tmp_path, self.params_path)
+            self._base_questions, self._base_users = dict(self._saved_questions), users
+            self._saved_updates = self.updates
+
+    async def run_saver(self, interval: float = ADAPTIVE_SAVE_INTERVAL_S):
+        """Saves every `interval` seconds while there are new answers; run as a background task."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.updates != self._saved_updates or self._pending:
+                try:
+                    await asyncio.to_thread(self.save)
+                except OSError as e:
+                    print(f"WARNING: could not save adaptive difficulty parameters to {self.params_path}: {e}")
+
+    def start_saver(self):
+        """Starts run_saver() on the running event loop unless it is already running."""
+        if self._saver_task is None or self._saver_task.done():
+            self._saver_task = asyncio.create_task(self.run_saver())
+
+    async def stop_saver(self):
+        if self._saver_task is not None:
+            self._saver_task.cancel()
+            await asyncio.gather(self._saver_task, return_exceptions=True)
+            self._saver_task = None
+
+    def _sync_bank(self) -> QuestionIndex:
+        """Re-maps the difficulty arrays onto the bank's current questions after a reload."""
+        index = self.bank.index()
+        if index is self._index:
+            return index
+        self._flush() # Queued answers refer to the old positions
+        for qid, b, n in zip(self.question_ids.tolist(), self.difficulty.tolist(), self.question_counts.tolist()):
+            self._saved_questions[qid] = (b, n)
+        questions = index.questions
+        self.question_ids = np.array([q.id for q in questions], dtype=np.int64)
+        self.difficulty = np.empty(len(questions))
+        self.question_counts = np.zeros(len(questions))
+        for i, question in enumerate(questions):
+            saved = self._saved_questions.get(question.id)
+            if saved is not None:
+                self.difficulty[i], self.question_counts[i] = saved
+            else:
+                self.difficulty[i] = DIFFICULTY_PRIORS.get(question.difficulty, 0.0)
+                # Every process starts a new question from the same prior, so saves can merge from it
+                self._base_questions.setdefault(question.id, (self.difficulty[i], 0.0))
+        self._question_pos = {q.id: i for i, q in enumerate(questions)}
+        self._index = index
+        self._resort()
+        return index
+
+    def _user(self, user_id: str) -> int:
+        pos = self._user_pos.get(user_id)
+        if pos is None:
+            pos = self._user_pos[user_id] = len(self._user_pos)
+            if pos >= len(self.ability):
+                self.ability = np.concatenate([self.ability, np.zeros(len(self.ability))])
+                self.user_counts = np.concatenate([self.user_counts, np.zeros(len(self.user_counts))])
+        return pos
+
+    def _resort(self):
+        self._epoch += 1
+        self._updates_since_sort = 0
+        self._sorted = {}
+
+    def _apply(self, users: np.ndarray, questions: np.ndarray, correct: np.ndarray, update_questions: bool = True):
+        """One vectorized Elo step for a batch of answers, each scored against the pre-batch estimates."""
+        residual = correct - _sigmoid(self.ability[users] - self.difficulty[questions])
+        np.add.at(self.ability, users, _step(self.user_counts[users]) * residual)
+        np.add.at(self.user_counts, users, 1)
+        if update_questions:
+            np.add.at(self.difficulty, questions, -_step(self.question_counts[questions]) * residual)
+            np.add.at(self.question_counts, questions, 1)
+            self.updates += len(users)
+            self._updates_since_sort += len(users)
+            if self._updates_since_sort >= ADAPTIVE_RESORT_EVERY:
+                self._resort()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        users, questions, correct = zip(*self._pending)
+        self._pending = []
+        self._apply(np.array(users), np.array(questions), np.array(correct, dtype=np.float64))
+
+    def seed_user(self, user_id: str, answers: Dict[str, dict]):
+        """Estimates a user's ability from answers given before the engine knew them (question difficulties stay put)."""
+        with self._lock:
+            self._sync_bank()
+            if user_id in self._user_pos:
+                return
+            pos = self._user(user_id)
+            known = [(self._question_pos[int(qid)], bool(a.get("correct"))) for qid, a in answers.items() if qid.isdigit() and int(qid) in self._question_pos]
+            if known:
+                questions, correct = zip(*known)
+                # A few passes, since a single batch step would score every answer against the starting estimate
+                for _ in range(3):
+                    self._apply(np.full(len(known), pos), np.array(questions), np.array(correct, dtype=np.float64), update_questions=False)
+                self.user_counts[pos] = len(known)
+
+    def knows(self, user_id: str) -> bool:
+        return user_id in self._user_pos
+
+    def record(self, user_id: str, question_id: int, is_correct: bool):
+        """Queues an answer; queued answers are applied in one batch when the queue fills or before a selection."""
+        with self._lock:
+            self._sync_bank()
+            question_pos = self._question_pos.get(question_id)
+            if question_pos is None:
+                return
+            self._pending.append((self._user(user_id), question_pos, is_correct))
+            if len(self._pending) >= ADAPTIVE_BATCH_SIZE:
+                self._flush()
+
+    def _sorted_pool(self, pool: List[BankQuestion]) -> _SortedPool:
+        cached = self._sorted.get(id(pool))
+        if cached is None or cached.pool is not pool or cached.epoch != self._epoch:
+            positions = np.fromiter((self._question_pos[q.id] for q in pool), dtype=np.int64, count=len(pool))
+            positions = positions[np.argsort(self.difficulty[positions], kind="stable")]
+            cached = self._sorted[id(pool)] = _SortedPool(pool, self._epoch, positions, self.difficulty[positions])
+        return cached
+
+    def predicted_success(self, user_id: str, question_id: int) -> Optional[float]:
+        with self._lock:
+            self._sync_bank()
+            user_pos, question_pos = self._user_pos.get(user_id), self._question_pos.get(question_id)
+            if user_pos is None or question_pos is None:
+                return None
+            return float(_sigmoid(self.ability[user_pos] - self.difficulty[question_pos]))
+
+    def select(self, user_id: str, pool: List[BankQuestion], excluded: Set[int]) -> Optional[BankQuestion]:
+        """One of the ADAPTIVE_CANDIDATES open questions in `pool` closest to the user's target difficulty."""
+        if not pool:
+            return None
+        with self._lock:
+            index = self._sync_bank()
+            self._flush()
+            sorted_pool = self._sorted_pool(pool)
+            target = self.ability[self._user(user_id)] - self.target_offset
+            n = len(sorted_pool.positions)
+            center = int(np.searchsorted(sorted_pool.sorted_difficulty, target))
+            excluded_ids = None
+            width = 4 * ADAPTIVE_CANDIDATES
+            while True:
+                lo, hi = max(0, center - width), min(n, center + width)
+                window = sorted_pool.positions[lo:hi]
+                window_ids = self.question_ids[window]
+                if 4 * len(window) <= len(excluded):
+                    # Usually enough open questions sit next to the target: look those few up in the set
+                    is_open = np.fromiter((qid not in excluded for qid in window_ids.tolist()), dtype=bool, count=len(window))
+                else:
+                    # A wide window (or few exclusions): one vectorized membership test
+                    if excluded_ids is None:
+                        excluded_ids = np.fromiter(excluded, dtype=np.int64, count=len(excluded))
+                    is_open = ~np.isin(window_ids, excluded_ids)
+                open_positions = window[is_open]
+                if len(open_positions) >= ADAPTIVE_CANDIDATES or (lo == 0 and hi == n):
+                    break
+                width *= 4
+            if not len(open_positions):
+                return None
+            nearest = open_positions[np.argsort(np.abs(self.difficulty[open_positions] - target), kind="stable")[:ADAPTIVE_CANDIDATES]]
+            return index.questions[int(random.choice(nearest))]
+
+    def recalibrate(self, progress_dir: str, iterations: int = 30) -> dict:
+        """Refits every question difficulty and user ability from all ProgressTracker files, then saves them."""
+        started = time.perf_counter()
+        user_ids, question_ids, correct = read_progress_answers(progress_dir)
+        with self._lock:
+            self._sync_bank()
+            self._flush()
+            answered = [(u, self._question_pos[q], c) for u, q, c in zip(user_ids, question_ids, correct) if q in self._question_pos]
+            if answered:
+                for user_id, _, _ in answered:
+                    self._user(user_id)
+                users = np.array([self._user_pos[u] for u, _, _ in answered])
+                questions = np.array([q for _, q, _ in answered])
+                n_users = len(self._user_pos)
+                ability, difficulty = fit_rasch(users, questions, np.array([c for _, _, c in answered]), n_users, len(self.difficulty), iterations)
+                seen = np.bincount(questions, minlength=len(self.difficulty))
+                # Questions nobody has answered keep their prior difficulty
+                self.difficulty = np.where(seen > 0, difficulty, self.difficulty)
+                self.question_counts = seen.astype(np.float64)
+                self.ability[:n_users] = ability
+                self.user_counts[:n_users] = np.bincount(users, minlength=n_users)
+                self._resort()
+        if answered:
+            self.save()
+        return {"answers": len(answered), "users": len(set(user_ids)), "seconds": round(time.perf_counter() - started, 3)}
+
+    def stats(self) -> dict:
+        return {
+            "questions": len(self.difficulty),
+            "users": len(self._user_pos),
+            "updates": self.updates,
+            "pending": len(self._pending),
+            "target_success": ADAPTIVE_TARGET_SUCCESS,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalibrate aptitude question difficulties from progress files.")
+    parser.add_argument("--progress-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+    print(AdaptiveDifficultyEngine().recalibrate(args.progress_dir, args.iterations))
@@ -0,0 +1,187 @@
+import json
+import math
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+# Lexicon of closing cues and their log-odds weights. Positive weights push towards "the interview is over",
+# negative weights towards "the conversation continues". Phrases are matched on lower-cased text.
+CLOSING_LEXICON: Dict[str, float] = {
+    # Explicit requests to stop (usually from the interviewee)
+    "end the interview": 6.0,
+    "end this interview": 6.0,
+    "stop the interview": 6.0,
+    "finish the interview": 5.5,
+    "conclude the interview": 5.5,
+    "i want to stop": 5.0,
+    "i'd like to stop": 5.0,
+    "i have to go": 4.5,
+    "i need to go": 4.5,
+    "i have to leave": 4.5,
+    "let's wrap up": 4.0,
+    "let's wrap this up": 4.0,
+    "that's all from me": 4.0,
+    "that's all i have": 3.5,
+    "no more questions": 3.0,
+    "i'm done": 3.5,
+    "we're done": 4.0,
+    "goodbye": 4.0,
+    "good bye": 4.0,
+    "bye": 2.5,
+    # Interviewer sign-offs
+    "this concludes": 5.5,
+    "concludes our interview": 6.0,
+    "end of the interview": 5.5,
+    "end of our interview": 5.5,
+    "thank you for your time": 3.0,
+    "thanks for your time": 3.0,
+    "we'll be in touch": 4.0,
+    "we will be in touch": 4.0,
+    "hear from us": 3.0,
+    "next steps": 1.5,
+    "best of luck": 2.5,
+    "good luck": 2.0,
+    "have a great day": 3.0,
+    "have a good day": 3.0,
+    "it was a pleasure": 2.0,
+    "nice talking to you": 2.5,
+    # Continuation cues
+    "next question": -5.0,
+    "let's move on": -4.0,
+    "moving on": -3.5,
+    "can you": -2.0,
+    "could you": -2.0,
+    "tell me": -2.5,
+    "walk me through": -3.0,
+    "how would you": -3.0,
+    "what would you": -2.5,
+    "why did you": -2.5,
+    "explain": -1.5,
+    "for example": -1.5,
+    "let me think": -3.0,
+    "don't stop": -6.0,
+    "not done": -5.0,
+    "not finished": -5.0,
+    "continue": -2.5,
+}
+CLOSING_BIAS = -2.5
+QUESTION_MARK_WEIGHT = -2.0 # A reply that still asks something is rarely a sign-off
+LONG_TEXT_WORDS = 80
+LONG_TEXT_WEIGHT = -1.5 # Long, substantive answers are rarely closing statements
+
+DONE_THRESHOLD = 0.85
+NOT_DONE_THRESHOLD = 0.15
+
+
+def _compile_lexicon(lexicon: Dict[str, float]) -> re.Pattern:
+    # Longest phrases first so "end the interview" wins over shorter overlapping cues
+    phrases = sorted(lexicon, key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(re.escape(p) for p in phrases) + r")\b")
+
+
+class ClosingIntentDetector:
+    def __init__(
+        self,
+        lexicon: Optional[Dict[str, float]] = None,
+        bias: float = CLOSING_BIAS,
+        done_threshold: float = DONE_THRESHOLD,
+        not_done_threshold: float = NOT_DONE_THRESHOLD,
+        log_path: Optional[str] = None,
+    ):
+        """
+        Local, CPU-only classifier for "does this message end the interview?".
+        Scores a message with a weighted phrase lexicon and a logistic link. Confident scores are answered
+        locally; anything between the two thresholds is reported as unsure so the caller can ask the LLM.
+        Args:
+            log_path: Optional JSONL file where every (text, local probability, LLM decision) comparison is
+                appended for offline tuning.
+        """
+        self.lexicon = dict(lexicon or CLOSING_LEXICON)
+        self.bias = bias
+        self.done_threshold = done_threshold
+        self.not_done_threshold = not_done_threshold
+        self.log_path = log_path
+        self._pattern = _compile_lexicon(self.lexicon)
+        self._lock = threading.Lock()
+        self._counts = {
+            "local_done": 0,
+            "local_not_done": 0,
+            "unsure": 0,
+            "compared": 0,
+            "agreed": 0,
+            "false_done": 0, # Local said done, LLM said not done
+            "missed_done": 0, # Local said not done, LLM said done
+        }
+
+    def load_weights(self, path: str):
+        """Replaces the lexicon and thresholds with weights tuned offline (JSON with 'lexicon', 'bias', ...)."""
+        with open(path, "r", encoding="utf-8") as f:
+            weights = json.load(f)
+        self.lexicon = dict(weights.get("lexicon", self.lexicon))
+        self.bias = weights.get("bias", self.bias)
+        self.done_threshold = weights.get("done_threshold", self.done_threshold)
+        self.not_done_threshold = weights.get("not_done_threshold", self.not_done_threshold)
+        self._pattern = _compile_lexicon(self.lexicon)
+
+    def score(self, text: str) -> float:
+        """Returns the probability that `text` signals the end of the interview."""
+        normalized = text.lower().replace("’", "'")
+        logit = self.bias
+        for match in self._pattern.finditer(normalized):
+            logit += self.lexicon[match.group(1)]
+        if normalized.rstrip().endswith("?"):
+            logit += QUESTION_MARK_WEIGHT
+        if len(normalized.split()) > LONG_TEXT_WORDS:
+            logit += LONG_TEXT_WEIGHT
+        return 1.0 / (1.0 + math.exp(-logit))
+
+    def classify(self, text: str) -> Tuple[Optional[bool], float]:
+        """
+        Returns (decision, probability). `decision` is None when the local model is unsure and the
+        caller should fall back to the LLM.
+        """
+        if not text or not text.strip():
+            with self._lock:
+                self._counts["local_not_done"] += 1
+            return False, 0.0
+        probability = self.score(text)
+        if probability >= self.done_threshold:
+            decision, bucket = True, "local_done"
+        elif probability <= self.not_done_threshold:
+            decision, bucket = False, "local_not_done"
+        else:
+            decision, bucket = None, "unsure"
+        with self._lock:
+            self._counts[bucket] += 1
+        return decision, probability
+
+    def record_llm_decision(self, text: str, probability: float, llm_decision: bool):
+        """Records how the local score compares with the LLM's answer for the same message."""
+        local_decision = probability >= 0.5
+        with self._lock:
+            self._counts["compared"] += 1
+            if local_decision == llm_decision:
+                self._counts["agreed"] += 1
+            elif local_decision:
+                self._counts["false_done"] += 1
+            else:
+                self._counts["missed_done"] += 1
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"text": text, "probability": round(probability, 4), "llm_decision": llm_decision}) + "\n")
+                except OSError as e:
+                    print(f"Warning: could not log closing-intent sample: {e}")
+
+    def stats(self) -> dict:
+        """Returns decision counts and the local/LLM agreement rate."""
+        with self._lock:
+            counts = dict(self._counts)
+        classified = counts["local_done"] + counts["local_not_done"] + counts["unsure"]
+        counts["local_rate"] = (classified - counts["unsure"]) / classified if classified else 0.0
+        counts["agreement_rate"] = counts["agreed"] / counts["compared"] if counts["compared"] else None
+        return counts
+
+
+# Shared detector used by every interview session
+closing_intent_detector = ClosingIntentDetector()
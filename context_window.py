@@ -0,0 +1,107 @@
+import os
+import re
+from typing import Dict, List
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_KEEP_RECENT_TURNS = int(os.getenv("CONTEXT_KEEP_RECENT_TURNS", "6"))
+CONTEXT_RECAP_TOKEN_BUDGET = int(os.getenv("CONTEXT_RECAP_TOKEN_BUDGET", "800"))
+
+CHARS_PER_TOKEN = 4 # Rough average for English text with BPE tokenizers
+MESSAGE_OVERHEAD_TOKENS = 4 # Role and separator tokens added per chat message
+RECAP_ANSWER_WORDS = 40
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting; close enough without shipping a tokenizer."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _compress_turn(turn: Dict[str, str]) -> str:
+    """Reduces one turn to a single recap line: the interviewer's questions, or the gist of an answer."""
+    content = " ".join(turn["content"].split())
+    if turn["role"] == "assistant":
+        questions = [s for s in _SENTENCE_SPLIT.split(content) if s.endswith("?")]
+        gist = " ".join(questions[-2:]) if questions else content
+        return f"Interviewer: {' '.join(gist.split()[:RECAP_ANSWER_WORDS])}"
+    words = content.split()
+    gist = " ".join(words[:RECAP_ANSWER_WORDS]) + (" ..." if len(words) > RECAP_ANSWER_WORDS else "")
+    return f"Candidate: {gist}"
+
+
+class ContextWindow:
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_recent_turns: int = CONTEXT_KEEP_RECENT_TURNS,
+        recap_token_budget: int = CONTEXT_RECAP_TOKEN_BUDGET,
+        pinned_turns: int = 1,
+    ):
+        """
+        Token-budgeted view over an interview history.
+        The first `pinned_turns` messages (the persona system prompt) and the most recent `keep_recent_turns`
+        messages are always sent verbatim. When the request would exceed `token_budget`, older turns are folded,
+        oldest first, into a compact recap that is updated incrementally and sent as a second system message.
+        The history list itself is never modified, so the full transcript stays available.
+        """
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.recap_token_budget = recap_token_budget
+        self.pinned_turns = pinned_turns
+        self.folded_upto = pinned_turns # Index of the first history turn not yet folded into the recap
+        self.recap_lines: List[str] = []
+        self.recap_tokens = 0
+        self._turn_tokens: List[int] = [] # Cached token estimate per history index
+
+    def truncate(self, length: int):
+        """Forgets the cached sizes of history turns from index `length` on (e.g. a rolled-back user turn)."""
+        del self._turn_tokens[length:]
+
+    def _sync_token_counts(self, history: List[Dict[str, str]]):
+        self.truncate(len(history)) # History got shorter since the last call
+        for turn in history[len(self._turn_tokens):]:
+            self._turn_tokens.append(estimate_tokens(turn["content"]) + MESSAGE_OVERHEAD_TOKENS)
+
+    def _fold(self, turn: Dict[str, str]):
+        line = _compress_turn(turn)
+        self.recap_lines.append(line)
+        self.recap_tokens += estimate_tokens(line) + 1
+        # Keep the recap itself bounded: the oldest recap lines go first
+        while self.recap_tokens > self.recap_token_budget and len(self.recap_lines) > 1:
+            dropped = self.recap_lines.pop(0)
+            self.recap_tokens -= estimate_tokens(dropped) + 1
+
+    def recap_message(self) -> Dict[str, str]:
+        return {
+            'role': 'system',
+            'content': "Recap of the earlier part of this interview (older turns, compressed):\n" + "\n".join(self.recap_lines)
+        }
+
+    def build_messages(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Returns the messages to send for the next completion, folding old turns as needed to fit the budget."""
+        self._sync_token_counts(history)
+        pinned_tokens = sum(self._turn_tokens[:self.pinned_turns])
+        verbatim_tokens = sum(self._turn_tokens[self.folded_upto:])
+        foldable_until = max(self.pinned_turns, len(history) - self.keep_recent_turns)
+
+        while self.folded_upto < foldable_until and pinned_tokens + self.recap_tokens + verbatim_tokens > self.token_budget:
+            self._fold(history[self.folded_upto])
+            verbatim_tokens -= self._turn_tokens[self.folded_upto]
+            self.folded_upto += 1
+
+        messages = list(history[:self.pinned_turns])
+        if self.recap_lines:
+            messages.append(self.recap_message())
+        messages.extend(history[self.folded_upto:])
+        return messages
+
+    def prompt_tokens(self, history: List[Dict[str, str]]) -> int:
+        """Estimated size of the request build_messages would produce."""
+        return estimate_message_tokens(self.build_messages(history))
@@ -0,0 +1,196 @@
+import os
+import re
+import time
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+EXPLANATION_CACHE_PATH = os.getenv(
+    "EXPLANATION_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "explanation_cache.sqlite3")
+)
+EXPLANATION_CACHE_MEMORY_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MEMORY_ENTRIES", "256"))
+EXPLANATION_CACHE_DISK_ENTRIES = int(os.getenv("EXPLANATION_CACHE_DISK_ENTRIES", "10000"))
+EXPLANATION_CACHE_TTL_SECONDS = float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Disk access times are only used to pick eviction victims, so they are written in batches of this many
+EXPLANATION_CACHE_TOUCH_BATCH = int(os.getenv("EXPLANATION_CACHE_TOUCH_BATCH", "64"))
+
+_NON_WORD = re.compile(r"[^\w\s+#]")
+
+
+def normalize_topic(topic: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a topic ('Big-O  notation?' -> 'big o notation')."""
+    return " ".join(_NON_WORD.sub(" ", topic.lower()).split())
+
+
+def make_cache_key(topic: str, model_name: str, temperature: float) -> str:
+    raw = json.dumps([normalize_topic(topic), model_name, round(float(temperature), 3)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    def __init__(
+        self,
+        db_path: str = EXPLANATION_CACHE_PATH,
+        max_memory_entries: int = EXPLANATION_CACHE_MEMORY_ENTRIES,
+        max_disk_entries: int = EXPLANATION_CACHE_DISK_ENTRIES,
+        ttl_seconds: float = EXPLANATION_CACHE_TTL_SECONDS,
+    ):
+        """
+        Two-tier cache for concept explanations: an in-memory LRU in front of a persistent SQLite table.
+        Entries expire after `ttl_seconds`; each tier evicts its least recently used entries once full.
+        peek() only consults memory; get(), set() and the other methods touch SQLite, so async callers run them
+        with asyncio.to_thread. Access times of entries read from disk are queued and written with the next
+        set(), or once EXPLANATION_CACHE_TOUCH_BATCH have accumulated, instead of committing on every hit.
+        """
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict() # key -> (explanation, created_at)
+        self._touched: dict = {} # key -> accessed_at not yet written to disk
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "key TEXT PRIMARY KEY, topic TEXT NOT NULL, model TEXT NOT NULL, temperature REAL NOT NULL, "
+            "explanation TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_explanations_topic ON explanations (topic)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_explanations_accessed ON explanations (accessed_at)")
+        self._conn.commit()
+
+    def _remember(self, key: str, explanation: str, created_at: float):
+        self._memory[key] = (explanation, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            if now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            del self._memory[key]
+        return None
+
+    def peek(self, topic: str, model_name: str, temperature: float) -> Optional[str]:
+        """Returns the explanation if it is in the memory tier; never touches disk, so it is safe on the event loop."""
+        key = make_cache_key(topic, model_name, temperature)
+        with self._lock:
+            return self._memory_get(key, time.time())
+
+    def get(self, topic: str, model_name: str, temperature: float) -> Optional[str]:
+        """Returns the cached explanation, or None on a miss or an expired entry."""
+        key = make_cache_key(topic, model_name, temperature)
+        now = time.time()
+        with self._lock:
+            explanation = self._memory_get(key, now)
+            if explanation is not None:
+                return explanation
+
+            row = self._conn.execute(
+                "SELECT explanation, created_at FROM explanations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] < self.ttl_seconds:
+                self._touched[key] = now
+                if len(self._touched) >= EXPLANATION_CACHE_TOUCH_BATCH:
+                    self._write_touched()
+                    self._conn.commit()
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+            if row is not None:
+                self._conn.execute("DELETE FROM explanations WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+    def _write_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE explanations SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in self._touched.items()]
+            )
+            self._touched = {}
+
+    def set(self, topic: str, model_name: str, temperature: float, explanation: str):
+        key = make_cache_key(topic, model_name, temperature)
+        now = time.time()
+        with self._lock:
+            self._remember(key, explanation, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, topic, model, temperature, explanation, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_topic(topic), model_name, float(temperature), explanation, now, now),
+            )
+            self._touched.pop(key, None)
+            self._write_touched() # Before evicting, so recent hits count
+            self._evict_disk(now)
+            self._conn.commit()
+
+    def _evict_disk(self, now: float):
+        self._conn.execute("DELETE FROM explanations WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+        if count > self.max_disk_entries:
+            self._conn.execute(
+                "DELETE FROM explanations WHERE key IN (SELECT key FROM explanations ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+    def invalidate(self, topic: Optional[str] = None) -> int:
+        """
+        Drops cached explanations for one topic (any model/temperature), or everything when topic is None.
+        Returns the number of on-disk entries removed.
+        """
+        with self._lock:
+            if topic is None:
+                removed = self._conn.execute("DELETE FROM explanations").rowcount
+                self._memory.clear()
+            else:
+                normalized = normalize_topic(topic)
+                keys = [row[0] for row in self._conn.execute("SELECT key FROM explanations WHERE topic = ?", (normalized,))]
+                removed = self._conn.execute("DELETE FROM explanations WHERE topic = ?", (normalized,)).rowcount
+                for key in keys:
+                    self._memory.pop(key, None)
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+_explanation_cache: Optional[ExplanationCache] = None
+
+
+def get_explanation_cache() -> ExplanationCache:
+    """Returns the process-wide explanation cache, opening the SQLite file on first use."""
+    global _explanation_cache
+    if _explanation_cache is None:
+        _explanation_cache = ExplanationCache()
+    return _explanation_cache
@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import itertools
+import multiprocessing
+from collections import Counter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from question_bank import QUESTIONS_FILE_PATH, SHARD_MANIFEST_NAME, QuestionBank, read_manifest
+
+INGEST_SHARD_SIZE = int(os.getenv("INGEST_SHARD_SIZE", "5000"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "2000")) # Blocks in flight at once; bounds memory
+INGEST_READ_CHUNK = 1 << 20
+RAW_FILE_EXTENSIONS = (".txt", ".md")
+
+# "12. " at a word boundary, before text that does not start lower-case ("... then 3. is" is not a question);
+# only accepted when it continues (or restarts) the numbering, see iter_blocks()
+_NUMBER_RE = re.compile(r"(?<![\w.])(\d{1,5})\.\s+(?=[^\sa-z])")
+_OPTION_RE = re.compile(r"(?<!\S)([A-F])[.)]\s*")
+_ANSWER_RE = re.compile(r"\s(?:Answer|ANSWER|Ans)\s*[:–—-]?\s*\(?([A-F])\b[.)]?")
+_EXPLANATION_RE = re.compile(r"\s(?:Explanation|EXPLANATION|Solution)\s*[:–—-]?\s*")
+_SPACE_RE = re.compile(r"\s+")
+MAX_QUESTION_CHARS = 4000
+
+
+def iter_raw_files(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith(RAW_FILE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def iter_blocks(path: str, chunk_size: int = INGEST_READ_CHUNK) -> Iterator[Tuple[str, int, str]]:
+    """
+    Streams (source, number, text) for each numbered question in a raw dump, reading `chunk_size` characters
+    at a time. A "N. " marker only starts a new block when N is the next number, or 1 at the start of a line
+    (a new section), so numbers inside questions and explanations ("... is 40 2. 5 men") do not split them.
+    """
+    source = os.path.basename(path)
+    buf, start, number, scan, dropped = "", None, 0, 0, 0
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buf += chunk
+            # A marker near the end of the buffer may be cut in two; markers starting there wait for the next chunk
+            limit = len(buf) if not chunk else max(scan, len(buf) - 16)
+            for match in _NUMBER_RE.finditer(buf, scan):
+                if match.start() >= limit:
+                    break
+                n = int(match.group(1))
+                if n != number + 1:
+                    pos = match.start()
+                    line_start = buf[pos - 1] == "\n" if pos else dropped == 0
+                    if n != 1 or not line_start:
+                        continue
+                if start is not None:
+                    yield source, number, buf[start:match.start()]
+                start, number = match.end(), n
+            scan = limit
+            # Keep only the current block and the unscanned tail
+            keep_from = start if start is not None else scan
+            if keep_from > 0:
+                buf, scan, dropped = buf[keep_from:], scan - keep_from, dropped + keep_from
+                start = 0 if start is not None else None
+            if not chunk:
+                break
+    if start is not None and buf[start:].strip():
+        yield source, number, buf[start:]
+
+
+def content_hash(question: str, options: List[str]) -> str:
+    """Identity of a question for deduplication: its normalized text and options."""
+    text = "\x1f".join([question, *options]).lower()
+    return hashlib.sha1(_SPACE_RE.sub(" ", text).strip().encode("utf-8")).hexdigest()[:20]
+
+
+_strip_patterns: List[re.Pattern] = []
+
+
+def _init_worker(strip: List[str]):
+    global _strip_patterns
+    _strip_patterns = [re.compile(pattern) for pattern in strip]
+
+
+def parse_block(block: Tuple[str, int, str]) -> Tuple[Optional[dict], Optional[str], Tuple[str, int, str]]:
+    """Parses one block into (record, None, block) or (None, reject reason, block). Runs in the worker processes."""
+    source, number, text = block
+    for pattern in _strip_patterns:
+        text = pattern.sub(" ", text)
+    text = " " + _SPACE_RE.sub(" ", text).strip()
+    if len(text) > MAX_QUESTION_CHARS:
+        return None, "too long", block
+    answer = _ANSWER_RE.search(text)
+    if answer is None:
+        return None, "no answer", block
+    body, rest = text[:answer.start()], text[answer.end():]
+    explanation = _EXPLANATION_RE.search(" " + rest)
+    explanation_text = (" " + rest)[explanation.end():].strip() if explanation else ""
+    # Options are "A. ..." "B. ..." in order; other capital letters followed by a dot stay in the text
+    markers, expected = [], "A"
+    for match in _OPTION_RE.finditer(body):
+        if match.group(1) == expected:
+            markers.append(match)
+            expected = chr(ord(expected) + 1)
+    if len(markers) < 2:
+        return None, "fewer than two options", block
+    question = body[:markers[0].start()].strip()
+    if not question:
+        return None, "empty question", block
+    options = []
+    for i, match in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(body)
+        option = body[match.end():end].strip()
+        if not option:
+            return None, "empty option", block
+        options.append(f"{match.group(1)}. {option}")
+    correct = ord(answer.group(1)) - ord("A")
+    if correct >= len(options):
+        return None, "answer not among options", block
+    record = {
+        "question": question,
+        "options": options,
+        "correct_option_index": correct,
+        "explanation": explanation_text,
+        "content_hash": content_hash(question, options),
+    }
+    return record, None, block
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ShardWriter:
+    def __init__(self, shard_dir: str, shard_size: int = INGEST_SHARD_SIZE):
+        """
+        Writes accepted questions as immutable shard files of `shard_size` records. Shards stay invisible to the
+        QuestionBank until commit() replaces the manifest, in a single rename, with one that also lists them.
+        """
+        self.shard_dir = shard_dir
+        self.shard_size = shard_size
+        self.prefix = f"questions-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.pending: List[dict] = []
+        self.written: List[str] = []
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def _write_json(self, name: str, payload):
+        tmp_path = os.path.join(self.shard_dir, f".{name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.shard_dir, name))
+
+    def add(self, record: dict):
+        self.pending.append(record)
+        if len(self.pending) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        name = f"{self.prefix}-{len(self.written):05d}.json"
+        self._write_json(name, self.pending)
+        self.written.append(name)
+        self.pending = []
+
+    def commit(self):
+        self.flush()
+        if self.written:
+            self._write_json(SHARD_MANIFEST_NAME, {"shards": read_manifest(self.shard_dir) + self.written})
+
+    def abort(self):
+        for name in self.written:
+            try:
+                os.remove(os.path.join(self.shard_dir, name))
+            except OSError:
+                pass
+        self.written, self.pending = [], []
+
+
+def ingest(
+    paths: List[str],
+    bank_path: str = QUESTIONS_FILE_PATH,
+    strip: Optional[List[str]] = None,
+    fields: Optional[dict] = None,
+    rejects_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    shard_size: int = INGEST_SHARD_SIZE,
+    batch_size: int = INGEST_BATCH_SIZE,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Imports raw question dumps into the bank at `bank_path`: blocks are streamed from the files, parsed and
+    validated in a process pool one bounded batch at a time, deduplicated by content hash against the bank and
+    each other, given fresh ids and written as shards committed all at once. Rejects go to `rejects_path` (JSONL).
+    """
+    started = time.perf_counter()
+    bank = QuestionBank(bank_path, check_interval=float("inf"))
+    existing = bank.all()
+    seen = {content_hash(q.question, q.options) for q in existing}
+    next_id = max((q.id for q in existing), default=0) + 1
+    del existing
+    writer = ShardWriter(bank.shard_dir, shard_size)
+    counts, reasons = Counter(), Counter()
+    blocks = (block for path in iter_raw_files(paths) for block in iter_blocks(path))
+    rejects = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(strip or [],)) as pool:
+            for batch in _batched(blocks, batch_size):
+                for record, reason, (source, number, text) in pool.imap(parse_block, batch, chunksize=64):
+                    counts["blocks"] += 1
+                    if record is not None and record["content_hash"] in seen:
+                        reason = "duplicate"
+                    if reason is not None:
+                        reasons[reason] += 1
+                        if rejects is not None:
+                            rejects.write(json.dumps({"source": source, "number": number, "reason": reason, "text": text.strip()[:500]}, ensure_ascii=False) + "\n")
+                        continue
+                    seen.add(record["content_hash"])
+                    record = {"id": next_id, **record, **(fields or {})}
+                    next_id += 1
+                    counts["accepted"] += 1
+                    if not dry_run:
+                        writer.add(record)
+        if not dry_run:
+            writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if rejects is not None:
+            rejects.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "blocks": counts["blocks"],
+        "accepted": counts["accepted"],
+        "rejected": dict(reasons),
+        "shards": len(writer.written),
+        "seconds": round(elapsed, 2),
+        "blocks_per_second": round(counts["blocks"] / elapsed) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import raw aptitude question dumps into the question bank.")
+    parser.add_argument("paths", nargs="+", help="Raw text files, or directories of .txt/.md files")
+    parser.add_argument("--bank", default=QUESTIONS_FILE_PATH, help="Question file; shards go to <bank>.d/")
+    parser.add_argument("--strip", action="append", default=[], help="Regex removed from every block (e.g. a repeated page header)")
+    parser.add_argument("--topic")
+    parser.add_argument("--company")
+    parser.add_argument("--difficulty")
+    parser.add_argument("--rejects", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ingest_rejects.jsonl"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=INGEST_SHARD_SIZE)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report without writing shards")
+    args = parser.parse_args()
+    fields = {name: getattr(args, name) for name in ("topic", "company", "difficulty") if getattr(args, name)}
+    report = ingest(
+        args.paths, args.bank, args.strip, fields, args.rejects, args.workers, args.shard_size, args.batch_size, args.dry_run
+    )
+    print(json.dumps(report, indent=2))
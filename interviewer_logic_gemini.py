@@ -1,80 +1,267 @@
 import os
 import asyncio
-from openai import OpenAI # Keep OpenAI as the client for NVIDIA's API
+import random
+from typing import AsyncIterator, Optional
+from llm_client import get_llm_pool # Shared async client for NVIDIA's OpenAI-compatible API
+from closing_intent import closing_intent_detector
+from context_window import ContextWindow
+from singleflight import llm_singleflight
+from llm_transport import LLMTransportError
+from llm_scheduler import PRIORITY_INTERVIEW_TURN, PRIORITY_DONE_CHECK
+from response_budget import response_budget
+from turn_tracing import TurnTrace, tracer
+from turn_log import TurnLog
+
+# Fraction of confident local done-checks that are also sent to the LLM, in the background, to track agreement
+DONE_CHECK_SHADOW_RATE = float(os.getenv("DONE_CHECK_SHADOW_RATE", "0.05"))
+
+# The done-check is a tiny call; give up on it long before a normal turn would
+DONE_CHECK_DEADLINE_S = float(os.getenv("DONE_CHECK_DEADLINE_S", "8"))
+
+# Shown by the front ends instead of an error when the upstream API is failing or the circuit breaker is open
+UPSTREAM_UNAVAILABLE_MESSAGE = "I'm sorry, we're having a brief technical issue on our side. Could you give me a moment and then repeat your last answer?"
+
+# Strong references to fire-and-forget tasks so they are not garbage-collected mid-flight
+_background_tasks = set()
+
+INTERVIEW_START_PROMPT = "Start the interview by greeting the interviewee and asking the first question based on your persona."
+
+class InterviewerUnavailableError(LLMTransportError):
+    """The upstream API failed before any of the reply was produced; the turn was not recorded."""
+
+def build_system_prompt(persona: str) -> str:
+    """Wraps a persona in the interviewer system prompt that opens every history."""
+    return f"You are an AI interviewer with the following persona:\n\n{persona}\n\nStrictly adhere to this persona for the entire interview. Do not break character."
 
 class InterviewLogicNVIDIA:
-    def __init__(self, persona: str):
-        # Initialize the OpenAI client pointing to NVIDIA's API
-        self.client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key="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"
-        )
+    def __init__(self, persona: str, context_window: Optional[ContextWindow] = None, evaluator=None):
+        # Use the process-wide async client pool pointing to NVIDIA's API
+        self.llm = get_llm_pool()
         self.model_name = "openai/gpt-oss-20b" # Or "nvidia/nemotron-4-340b-instruct" or other compatible models
         self.persona = persona
         self.history = [] # Stores conversation turns as [{'role': ..., 'content': ...}]
+        self.context_window = context_window or ContextWindow() # Token-budgeted view of history sent to the API
         self.is_done_flag = False # Internal flag to track if the interview is considered finished
+        self.evaluator = evaluator # Optional summary_logic_gemini.RunningEvaluator, updated after every exchange
+        self.turn_log = TurnLog() # Compact, pre-serialized mirror of history for incremental history reads
 
         # Inject the persona as a system message for the NVIDIA API
         # The first message in the history will be the system message setting the persona.
         # Then, the first user message will be to "Start the interview...".
-        self.history.append({'role': 'system', 'content': f"You are an AI interviewer with the following persona:\n\n{self.persona}\n\nStrictly adhere to this persona for the entire interview. Do not break character."})
-        self.history.append({'role': 'user', 'content': "Start the interview by greeting the interviewee and asking the first question based on your persona."})
+        self.history.append({'role': 'system', 'content': build_system_prompt(self.persona)})
+        self.history.append({'role': 'user', 'content': INTERVIEW_START_PROMPT})
         
         print("NVIDIA API InterviewLogic initialized.")
 
-    async def _get_streaming_response(self, messages: list) -> str:
+    @classmethod
+    def restore(cls, persona: str, history: list, is_done: bool = False, evaluator=None) -> "InterviewLogicNVIDIA":
+        """Rebuilds an interview from a stored history (e.g. one saved by another worker)."""
+        interview_logic = cls(persona, evaluator=evaluator)
+        interview_logic.history = history
+        interview_logic.is_done_flag = is_done
+        return interview_logic
+
+    def _turn_call_type(self) -> str:
+        """'opening' until the interviewer has spoken once, 'follow_up' afterwards (used for response budgets)."""
+        return "follow_up" if any(turn['role'] == 'assistant' for turn in self.history) else "opening"
+
+    async def _stream_response(self, messages: list, priority: int = PRIORITY_INTERVIEW_TURN, trace: Optional[TurnTrace] = None) -> AsyncIterator[str]:
         """
-        Helper to get a streaming response from the NVIDIA API and reconstruct it.
+        Helper that yields each text delta from a streaming NVIDIA API completion as it arrives.
+        Reasoning tokens are kept out of the reply, max_tokens comes from the response budget for this kind of
+        turn, and generation stops early at a sentence boundary once the budget's soft limit is reached.
         """
-        full_response_content = []
+        call_type = self._turn_call_type()
+        limiter = response_budget.limiter(call_type)
+        max_tokens = response_budget.max_tokens(call_type)
+        completion_tokens = 0
+        reasoning_tokens = 0
+        hit_length_limit = False
+        reasoning_parts = []
+        yielded_any = False
+        completion = None
         try:
-            completion = self.client.chat.completions.create(
+            completion = self.llm.stream_chat(
                 model=self.model_name,
                 messages=messages,
                 temperature=1,
                 top_p=1,
-                max_tokens=4096,
-                stream=True
+                max_tokens=max_tokens,
+                priority=priority,
+                trace=trace
             )
 
-            for chunk in completion:
-                # NVIDIA API might send 'reasoning_content' but often the main response is in 'content'
+            async for chunk in completion:
+                if not chunk.choices:
+                    continue
+                if chunk.choices[0].finish_reason == "length":
+                    hit_length_limit = True
+                # NVIDIA API might send 'reasoning_content' but the reply itself is in 'content'
                 reasoning = getattr(chunk.choices[0].delta, "reasoning_content", None)
                 if reasoning:
-                    full_response_content.append(reasoning)
+                    reasoning_tokens += 1
+                    reasoning_parts.append(reasoning)
+                    visible_reasoning = response_budget.handle_reasoning(call_type, reasoning)
+                    if visible_reasoning:
+                        yielded_any = True
+                        yield visible_reasoning
                 if chunk.choices[0].delta.content is not None:
-                    full_response_content.append(chunk.choices[0].delta.content)
-            
-            return "".join(full_response_content)
+                    completion_tokens += 1
+                    text, stop = limiter.feed(chunk.choices[0].delta.content)
+                    if text:
+                        yielded_any = True
+                        yield text
+                    if stop:
+                        break # Closing the stream cancels the rest of the upstream generation
+            else:
+                remaining = limiter.flush()
+                if remaining:
+                    yielded_any = True
+                    yield remaining
+        except LLMTransportError as e:
+            # Timed out after retries or the circuit is open: fail fast so the front end can show
+            # UPSTREAM_UNAVAILABLE_MESSAGE, unless part of the reply already reached the candidate
+            print(f"NVIDIA API unavailable: {e}")
+            if yielded_any:
+                raise
+            raise InterviewerUnavailableError(str(e)) from e
         except Exception as e:
             print(f"Error in NVIDIA API call: {e}")
             raise
+        finally:
+            if completion is not None:
+                await completion.aclose()
+            if completion_tokens or reasoning_tokens:
+                response_budget.observe(call_type, completion_tokens, hit_length_limit, "".join(reasoning_parts), reasoning_tokens)
 
-    async def get_interviewer_response(self, user_text: str) -> str:
+    async def _get_streaming_response(self, messages: list, priority: int = PRIORITY_INTERVIEW_TURN, trace: Optional[TurnTrace] = None) -> str:
+        """
+        Helper to get a streaming response from the NVIDIA API and reconstruct it.
+        """
+        full_response_content = []
+        async for delta in self._stream_response(messages, priority, trace):
+            full_response_content.append(delta)
+        return "".join(full_response_content)
+
+    async def generate_opening(self, priority: int = PRIORITY_INTERVIEW_TURN) -> Optional[str]:
+        """
+        Generates the greeting and first question without touching history (used to pre-warm openings).
+        Returns None if the API was unavailable.
+        """
+        try:
+            opening = await self._get_streaming_response(self.context_window.build_messages(self.history), priority)
+        except InterviewerUnavailableError:
+            return None
+        return opening or None
+
+    def seed_opening(self, opening: str):
+        """Appends a pre-generated opening to history, exactly as get_interviewer_response("") would have."""
+        self.history.append({'role': 'assistant', 'content': opening})
+
+    def _rollback_user_turn(self, user_turn: Optional[dict]):
+        """Drops a user turn whose reply never arrived, so a retried answer is not recorded twice."""
+        if user_turn is not None and self.history and self.history[-1] is user_turn:
+            self.history.pop()
+            self.turn_log.truncate(len(self.history))
+            self.context_window.truncate(len(self.history))
+
+    async def get_interviewer_response(self, user_text: str, trace: Optional[TurnTrace] = None) -> str:
         """
         Takes user text, updates history, and gets the interviewer's next response from the NVIDIA API.
+        `trace` collects the turn's queue wait, time-to-first-token and generation spans.
+        Raises InterviewerUnavailableError, with history left as it was, when the upstream API is unavailable.
         """
+        user_turn = None
         if user_text: # Only add user_text if it's not empty (e.g., for the first turn from the user after the initial prompt)
-            self.history.append({'role': 'user', 'content': user_text})
+            user_turn = {'role': 'user', 'content': user_text}
+            self.history.append(user_turn)
         
         try:
             # The NVIDIA API using the OpenAI client expects messages in the format:
             # [{"role": "system", "content": "..."}, {"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}, ...]
-            # Our self.history already stores them in this compatible format.
+            # Our self.history already stores them in this compatible format; the context window keeps the
+            # persona and recent turns verbatim and folds older turns into a recap once over budget.
             
-            response_text = await self._get_streaming_response(self.history)
+            response_text = await self._get_streaming_response(self.context_window.build_messages(self.history), trace=trace)
             
             self.history.append({'role': 'assistant', 'content': response_text})
+            if self.evaluator is not None:
+                self.evaluator.update(self.history)
             
             return response_text
         except Exception as e:
             print(f"Error getting interviewer response from NVIDIA API: {e}")
+            self._rollback_user_turn(user_turn)
             raise # Re-raise for FastAPI to catch
 
-    async def check_if_done(self, last_message: str) -> bool:
+    async def get_interviewer_response_stream(self, user_text: str, trace: Optional[TurnTrace] = None) -> AsyncIterator[str]:
+        """
+        Streaming variant of get_interviewer_response: yields the interviewer's reply delta by delta.
+        The full reply is appended to history once the stream ends (or whatever was received if the
+        consumer stops early), so history stays identical to the non-streaming path. If nothing was received
+        the pending user turn is dropped again.
+        """
+        user_turn = None
+        if user_text:
+            user_turn = {'role': 'user', 'content': user_text}
+            self.history.append(user_turn)
+
+        response_parts = []
+        try:
+            async for delta in self._stream_response(self.context_window.build_messages(self.history), trace=trace):
+                response_parts.append(delta)
+                yield delta
+        except Exception as e:
+            print(f"Error streaming interviewer response from NVIDIA API: {e}")
+            raise
+        finally:
+            if response_parts:
+                self.history.append({'role': 'assistant', 'content': "".join(response_parts)})
+                if self.evaluator is not None:
+                    self.evaluator.update(self.history)
+            else:
+                self._rollback_user_turn(user_turn)
+
+    async def check_if_done(self, last_message: str, trace: Optional[TurnTrace] = None) -> bool:
         """
-        Checks if the conversation should end based on the last message using the NVIDIA API.
+        Checks if the conversation should end based on the last message.
+        The local closing-intent detector answers confident cases in microseconds; only unsure messages
+        (plus a small shadow sample used to measure agreement) go to the NVIDIA API.
         """
+        with tracer.stage("done_check", trace):
+            return await self._check_if_done(last_message)
+
+    async def _check_if_done(self, last_message: str) -> bool:
+        decision, probability = closing_intent_detector.classify(last_message)
+        if decision is None:
+            llm_decision = await self._llm_check_if_done(last_message)
+            if llm_decision is None:
+                # Default to not done if there's an error
+                return False
+            closing_intent_detector.record_llm_decision(last_message, probability, llm_decision)
+            return llm_decision
+
+        if random.random() < DONE_CHECK_SHADOW_RATE:
+            # Compare against the LLM off the critical path so agreement can be tuned offline
+            task = asyncio.create_task(self._shadow_check_if_done(last_message, probability))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        return decision
+
+    async def _shadow_check_if_done(self, last_message: str, probability: float):
+        llm_decision = await self._llm_check_if_done(last_message)
+        if llm_decision is not None:
+            closing_intent_detector.record_llm_decision(last_message, probability, llm_decision)
+
+    async def _llm_check_if_done(self, last_message: str) -> Optional[bool]:
+        """
+        Asks the NVIDIA API whether the last message ends the conversation. Returns None on API errors.
+        Identical concurrent checks (e.g. the same sign-off from many sessions) share one call.
+        """
+        key = ("check_if_done", self.model_name, last_message.strip().lower())
+        return await llm_singleflight.do(key, lambda: self._request_done_check(last_message))
+
+    async def _request_done_check(self, last_message: str) -> Optional[bool]:
         try:
             # Create a separate, short-lived history for this specific check.
             check_messages = [
@@ -82,17 +269,17 @@ class InterviewLogicNVIDIA:
                 {"role": "user", "content": f"Given this statement: '{last_message}', does it convey an explicit intent to end the conversation or explicitly conclude the interview? Respond ONLY with 'yes' or 'no' and nothing else."}
             ]
             
-            check_completion = self.client.chat.completions.create(
+            check_completion = await self.llm.complete_chat(
                 model=self.model_name, # Use the same model or a different one if preferred for this task
                 messages=check_messages,
                 temperature=0.1, # Keep temperature low for factual, direct answers
-                max_tokens=5, # Limit tokens to get just 'yes' or 'no'
-                stream=False # No need to stream for a short answer
+                max_tokens=response_budget.max_tokens("done_check"), # Limit tokens to get just 'yes' or 'no'
+                deadline=DONE_CHECK_DEADLINE_S,
+                priority=PRIORITY_DONE_CHECK
             )
             
             decision = check_completion.choices[0].message.content.strip().lower()
             return decision == 'yes'
         except Exception as e:
             print(f"Error checking if done with NVIDIA API: {e}")
-            # Default to not done if there's an error
-            return False
\ No newline at end of file
+            return None
@@ -0,0 +1,167 @@
+import os
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+from llm_transport import ResilientTransport
+from llm_scheduler import UpstreamScheduler, PRIORITY_INTERVIEW_TURN
+from context_window import estimate_message_tokens
+from turn_tracing import TurnTrace, tracer
+
+# Process-wide configuration for every call to NVIDIA's OpenAI-compatible API.
+# Set NVIDIA_BASE_URL=http://127.0.0.1:8001/v1 to run against mock_llm_server.py instead.
+NVIDIA_BASE_URL = os.getenv("NVIDIA_BASE_URL", "https://integrate.api.nvidia.com/v1")
+NVIDIA_API_KEY = os.getenv("NVAPI_KEY") # Required; any non-empty value works against the mock server
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "32"))
+
+
+class LLMClientPool:
+    def __init__(
+        self,
+        base_url: str = NVIDIA_BASE_URL,
+        api_key: Optional[str] = NVIDIA_API_KEY,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_keepalive_connections: int = LLM_MAX_KEEPALIVE_CONNECTIONS,
+        max_concurrent_requests: int = LLM_MAX_CONCURRENT_REQUESTS,
+    ):
+        """
+        Shared async client with pooled keep-alive connections.
+        At most `max_concurrent_requests` completions are in flight at once; the rest wait in the upstream
+        scheduler's priority lanes, subject to the requests/min and tokens/min limits, without blocking the
+        event loop.
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.max_concurrent_requests = max_concurrent_requests
+        self._client: Optional[AsyncOpenAI] = None
+        self._scheduler: Optional[UpstreamScheduler] = None
+        self.transport = ResilientTransport() # Deadlines, retries, hedging and circuit breaking
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Lazily builds the AsyncOpenAI client so it binds to the running event loop."""
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+            # Retries are handled by the transport, so the SDK's own retry loop is disabled
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, http_client=http_client, max_retries=0)
+        return self._client
+
+    @property
+    def scheduler(self) -> UpstreamScheduler:
+        if self._scheduler is None:
+            self._scheduler = UpstreamScheduler(self.max_concurrent_requests)
+        return self._scheduler
+
+    @staticmethod
+    def _estimate_request_tokens(kwargs: dict) -> int:
+        # Charge the worst case up front; the difference is refunded once the real size is known
+        return estimate_message_tokens(kwargs.get("messages", [])) + (kwargs.get("max_tokens") or 0)
+
+    async def _raw_stream(self, kwargs: dict, priority: int, trace: Optional[TurnTrace], timing: dict) -> AsyncIterator:
+        # The admission slot is held until the stream is exhausted or closed
+        estimated = self._estimate_request_tokens(kwargs)
+        async with self.scheduler.slot(priority, estimated) as usage:
+            tracer.observe_queue_wait(priority, usage["queue_wait_s"], trace)
+            timing["granted_at"] = time.perf_counter() # Time to first token excludes the queue wait recorded above
+            stream = await self.client.chat.completions.create(stream=True, **kwargs)
+            completion_chunks = 0
+            try:
+                async for chunk in stream:
+                    completion_chunks += 1 # Roughly one token per streamed chunk
+                    yield chunk
+            finally:
+                await stream.close()
+                usage["actual_tokens"] = estimate_message_tokens(kwargs.get("messages", [])) + completion_chunks
+
+    async def _raw_complete(self, kwargs: dict, priority: int, trace: Optional[TurnTrace]):
+        estimated = self._estimate_request_tokens(kwargs)
+        async with self.scheduler.slot(priority, estimated) as usage:
+            tracer.observe_queue_wait(priority, usage["queue_wait_s"], trace)
+            completion = await self.client.chat.completions.create(stream=False, **kwargs)
+            if getattr(completion, "usage", None) is not None:
+                usage["actual_tokens"] = completion.usage.total_tokens
+                tracer.observe_completion(priority, completion.usage.prompt_tokens, completion.usage.completion_tokens)
+            return completion
+
+    async def stream_chat(
+        self,
+        deadline: Optional[float] = None,
+        priority: int = PRIORITY_INTERVIEW_TURN,
+        trace: Optional[TurnTrace] = None,
+        **kwargs
+    ) -> AsyncIterator:
+        """
+        Yields raw chat-completion chunks as they arrive.
+        `deadline` overrides the transport's default end-to-end budget (seconds) for this call;
+        `priority` is the scheduler lane (see llm_scheduler.PRIORITY_*); `trace` receives the queue wait,
+        time to first token and generation spans when the call is part of an interview turn.
+        """
+        timing = {} # Set by each attempt once its scheduler slot is granted
+        first_chunk_at = None
+        chunks = 0
+        try:
+            async for chunk in self.transport.stream(lambda: self._raw_stream(kwargs, priority, trace, timing), deadline=deadline):
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                chunks += 1 # Roughly one token per streamed chunk
+                yield chunk
+        finally:
+            if first_chunk_at is not None:
+                tracer.observe_stream(
+                    priority,
+                    max(0.0, first_chunk_at - timing.get("granted_at", first_chunk_at)), # A hedged attempt may be granted later
+                    time.perf_counter() - first_chunk_at,
+                    estimate_message_tokens(kwargs.get("messages", [])),
+                    chunks,
+                    trace,
+                )
+
+    async def complete_chat(
+        self,
+        deadline: Optional[float] = None,
+        priority: int = PRIORITY_INTERVIEW_TURN,
+        trace: Optional[TurnTrace] = None,
+        **kwargs
+    ):
+        """Returns a non-streamed chat completion."""
+        return await self.transport.call(lambda: self._raw_complete(kwargs, priority, trace), deadline=deadline)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+_pools: Dict[Tuple[str, str], LLMClientPool] = {}
+
+
+def get_llm_pool(base_url: Optional[str] = None, api_key: Optional[str] = None) -> LLMClientPool:
+    """Returns the process-wide pool for a (base_url, api_key) pair, creating it on first use."""
+    key = (base_url or NVIDIA_BASE_URL, api_key or NVIDIA_API_KEY)
+    if not key[1]:
+        raise ValueError("NVIDIA API Key not provided and NVAPI_KEY environment variable not set.")
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = LLMClientPool(base_url=key[0], api_key=key[1])
+    return pool
+
+
+async def close_llm_pools():
+    """Closes every pooled connection; call on application shutdown."""
+    for pool in list(_pools.values()):
+        await pool.aclose()
+    _pools.clear()
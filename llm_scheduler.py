@@ -0,0 +1,189 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from sample_window import SampleWindow
+
+LLM_REQUESTS_PER_MIN = float(os.getenv("LLM_REQUESTS_PER_MIN", "40"))
+LLM_TOKENS_PER_MIN = float(os.getenv("LLM_TOKENS_PER_MIN", "100000"))
+
+# Priority lanes, most urgent first
+PRIORITY_INTERVIEW_TURN = 0
+PRIORITY_DONE_CHECK = 1
+PRIORITY_TUTOR_CHAT = 2
+PRIORITY_CONCEPT_EXPLANATION = 3
+PRIORITY_SUMMARY = 4
+PRIORITY_PREWARM = 5 # Background work nobody is waiting on yet
+PRIORITY_NAMES = {
+    PRIORITY_INTERVIEW_TURN: "interview_turn",
+    PRIORITY_DONE_CHECK: "done_check",
+    PRIORITY_TUTOR_CHAT: "tutor_chat",
+    PRIORITY_CONCEPT_EXPLANATION: "concept_explanation",
+    PRIORITY_SUMMARY: "summary",
+    PRIORITY_PREWARM: "prewarm",
+}
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        """Classic token bucket refilled continuously at `per_minute`/60 per second; a rate of 0 disables it."""
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are available now)."""
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        if self.enabled:
+            self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Refunds (positive) or charges (negative) tokens once the real cost of a request is known."""
+        if self.enabled:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class UpstreamScheduler:
+    def __init__(
+        self,
+        max_concurrent: int,
+        requests_per_min: float = LLM_REQUESTS_PER_MIN,
+        tokens_per_min: float = LLM_TOKENS_PER_MIN,
+    ):
+        """
+        Central admission control for upstream LLM requests.
+        Requests wait in strict priority order (interview turn > done check > tutor chat > concept explanation >
+        summary > prewarm) and are admitted when a concurrency slot is free and both the requests/min and
+        tokens/min buckets can pay for them. A lower lane is never admitted ahead of a waiting higher lane.
+        """
+        self.max_concurrent = max_concurrent
+        self.request_bucket = TokenBucket(requests_per_min)
+        self.token_bucket = TokenBucket(tokens_per_min)
+        self.active = 0
+        self._queue: List[tuple] = [] # Heap of (priority, sequence, waiter), including waiters cancelled since
+        self._cancelled = 0 # Cancelled waiters still in the heap
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.queue_depth: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES} # Live waiters only
+        self.admitted: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_times: Dict[int, SampleWindow] = {p: SampleWindow() for p in PRIORITY_NAMES}
+        self.max_wait: Dict[int, float] = {p: 0.0 for p in PRIORITY_NAMES}
+
+    def _dispatch(self):
+        self._timer = None
+        while self._queue and self.active < self.max_concurrent:
+            _, _, waiter = self._queue[0]
+            if waiter.future.done(): # Cancelled while queued; already taken out of queue_depth
+                heapq.heappop(self._queue)
+                self._cancelled -= 1
+                continue
+            wait = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(waiter.tokens))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            self.queue_depth[waiter.priority] -= 1
+            self.request_bucket.take(1)
+            self.token_bucket.take(waiter.tokens)
+            self.active += 1
+            waited = time.monotonic() - waiter.enqueued_at
+            self.admitted[waiter.priority] += 1
+            self.wait_times[waiter.priority].observe(waited)
+            self.max_wait[waiter.priority] = max(self.max_wait[waiter.priority], waited)
+            waiter.future.set_result(waited)
+
+    async def acquire(self, priority: int, tokens: int) -> float:
+        """Waits for admission; returns the time spent queued in seconds."""
+        priority = priority if priority in PRIORITY_NAMES else PRIORITY_PREWARM
+        waiter = _Waiter(priority, tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self.queue_depth[priority] += 1
+        if self._timer is None:
+            self._dispatch()
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                self._discard_waiter(waiter)
+            else:
+                # Admitted at the same moment the caller gave up: hand the slot back
+                self.release()
+            raise
+
+    def _discard_waiter(self, waiter: _Waiter):
+        """Stops counting a waiter that gave up; it is dropped from the heap lazily, or all at once if they pile up."""
+        self.queue_depth[waiter.priority] -= 1
+        self._cancelled += 1
+        if self._cancelled > len(self._queue) // 2:
+            self._queue = [entry for entry in self._queue if not entry[2].future.done()]
+            heapq.heapify(self._queue)
+            self._cancelled = 0
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        """Frees a concurrency slot and, when known, corrects the token bucket for the request's real size."""
+        self.active -= 1
+        if actual_tokens is not None:
+            self.token_bucket.adjust(estimated_tokens - actual_tokens)
+        if self._timer is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int, tokens: int):
+        """
+        Holds an admission slot for the duration of the block. The yielded dict holds the time spent queued
+        ('queue_wait_s') and may be given an 'actual_tokens' entry to reconcile the token bucket on exit.
+        """
+        waited = await self.acquire(priority, tokens)
+        usage = {"actual_tokens": None, "queue_wait_s": waited}
+        try:
+            yield usage
+        finally:
+            self.release(tokens, usage["actual_tokens"])
+
+    def stats(self) -> dict:
+        lanes = {}
+        for priority, name in PRIORITY_NAMES.items():
+            lanes[name] = {
+                "queue_depth": self.queue_depth[priority],
+                "admitted": self.admitted[priority],
+                "wait_p95_s": self.wait_times[priority].percentile(0.95),
+                "wait_max_s": self.max_wait[priority],
+            }
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "requests_available": self.request_bucket.tokens if self.request_bucket.enabled else None,
+            "tokens_available": self.token_bucket.tokens if self.token_bucket.enabled else None,
+            "lanes": lanes,
+        }
@@ -0,0 +1,302 @@
+import os
+import time
+import random
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import openai
+
+from sample_window import SampleWindow
+
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "90"))
+LLM_FIRST_TOKEN_TIMEOUT_S = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT_S", "20"))
+LLM_STALL_TIMEOUT_S = float(os.getenv("LLM_STALL_TIMEOUT_S", "15"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.5"))
+LLM_RETRY_MAX_S = float(os.getenv("LLM_RETRY_MAX_S", "4"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+
+
+class LLMTransportError(Exception):
+    """Base class for failures raised by the resilient transport itself."""
+
+
+class LLMTimeoutError(LLMTransportError):
+    """The first token, the next chunk, or the whole call did not arrive in time."""
+
+
+class CircuitOpenError(LLMTransportError):
+    """The circuit breaker is open: the upstream API is failing and calls are rejected immediately."""
+
+
+_EMPTY = object()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures, rate limits and 5xx responses are worth retrying; 4xx are not."""
+    if isinstance(error, (LLMTimeoutError, asyncio.TimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_S):
+        """
+        Opens after `failure_threshold` consecutive upstream failures and rejects calls for `reset_timeout` seconds.
+        After that a single probe call is let through (half-open); its outcome closes or re-opens the circuit.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self.probe_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError("LLM upstream circuit is open; failing fast.")
+        if state == "half_open":
+            self.probe_in_flight = True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.probe_in_flight or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+
+class LatencyTracker(SampleWindow):
+    """Rolling window of observed upstream latencies in seconds, used to pick the hedging delay."""
+
+
+class ResilientTransport:
+    def __init__(
+        self,
+        deadline: float = LLM_DEADLINE_S,
+        first_token_timeout: float = LLM_FIRST_TOKEN_TIMEOUT_S,
+        stall_timeout: float = LLM_STALL_TIMEOUT_S,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_S,
+        retry_max: float = LLM_RETRY_MAX_S,
+        hedge_enabled: bool = LLM_HEDGE_ENABLED,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """
+        Deadlines, retries, hedging and circuit breaking around upstream LLM calls.
+        - Every call has an overall deadline; streams also have a first-token timeout and a stall timeout
+          between chunks.
+        - Failures before the first token are retried with full-jitter exponential backoff. Once tokens have
+          reached the caller a failure is final, since the output cannot be taken back.
+        - With hedging on, a duplicate request is started if the first token (or the whole non-streamed
+          reply) is slower than the observed p95; the first to answer wins and the other is cancelled.
+        - Repeated failures open the circuit breaker, which then rejects calls immediately with CircuitOpenError.
+        """
+        self.deadline = deadline
+        self.first_token_timeout = first_token_timeout
+        self.stall_timeout = stall_timeout
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.first_token_latency = LatencyTracker()
+        self.call_latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max, self.retry_base * (2 ** attempt)))
+
+    def _hedge_delay(self, tracker: LatencyTracker) -> Optional[float]:
+        if not self.hedge_enabled or len(tracker) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return tracker.percentile(self.hedge_percentile)
+
+    async def _race(
+        self,
+        attempt: Callable[[], Awaitable[Any]],
+        timeout: float,
+        tracker: LatencyTracker,
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Any:
+        """Runs `attempt`, plus a hedged duplicate if it is slower than the tracked p95; returns the first success."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        give_up_at = started + timeout
+        primary = asyncio.ensure_future(attempt())
+        tasks = {primary}
+        hedge_delay = self._hedge_delay(tracker)
+        last_error: Optional[BaseException] = None
+        winner = _EMPTY
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    self.hedges += 1
+                    tasks.add(asyncio.ensure_future(attempt()))
+            while tasks and winner is _EMPTY:
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None and winner is _EMPTY:
+                        winner = task.result()
+                        if task is not primary:
+                            self.hedge_wins += 1
+                    elif task.exception() is not None:
+                        last_error = task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            if discard is not None:
+                for result in results:
+                    if not isinstance(result, BaseException):
+                        await discard(result)
+
+        if winner is not _EMPTY:
+            tracker.observe(loop.time() - started)
+            return winner
+        if last_error is not None:
+            raise last_error
+        self.timeouts += 1
+        raise LLMTimeoutError(f"No response from the LLM API within {timeout:.1f}s.")
+
+    async def _with_retries(self, run: Callable[[float], Awaitable[Any]], deadline: float) -> Any:
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + deadline
+        attempt = 0
+        while True:
+            remaining = give_up_at - loop.time()
+            if remaining <= 0:
+                self.timeouts += 1
+                self.breaker.record_failure()
+                raise LLMTimeoutError(f"LLM call exceeded its {deadline:.1f}s deadline.")
+            try:
+                return await run(remaining)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or loop.time() + delay >= give_up_at:
+                    self.breaker.record_failure()
+                    raise
+                attempt += 1
+                self.retries += 1
+                print(f"LLM call failed ({e}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def call(self, make_call: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """Runs a non-streamed call under the deadline, retry, hedging and circuit-breaker policy."""
+        self.breaker.before_call()
+        try:
+            result = await self._with_retries(
+                lambda remaining: self._race(make_call, remaining, self.call_latency),
+                deadline or self.deadline,
+            )
+        except BaseException:
+            self.breaker.probe_in_flight = False
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[Any]], deadline: Optional[float] = None) -> AsyncIterator[Any]:
+        """Yields the chunks of `open_stream()` under the deadline, timeout, retry, hedging and circuit-breaker policy."""
+        self.breaker.before_call()
+        loop = asyncio.get_running_loop()
+        deadline = deadline or self.deadline
+        give_up_at = loop.time() + deadline
+
+        async def first_chunk():
+            iterator = open_stream()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, _EMPTY
+            except BaseException:
+                await iterator.aclose()
+                raise
+
+        async def discard(result):
+            await result[0].aclose()
+
+        try:
+            iterator, first = await self._with_retries(
+                lambda remaining: self._race(first_chunk, min(remaining, self.first_token_timeout), self.first_token_latency, discard),
+                deadline,
+            )
+        except BaseException:
+            self.breaker.probe_in_flight = False
+            raise
+
+        try:
+            if first is not _EMPTY:
+                yield first
+            while True:
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise LLMTimeoutError(f"LLM stream exceeded its {deadline:.1f}s deadline.")
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=min(self.stall_timeout, remaining))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise LLMTimeoutError("LLM stream stalled between chunks.")
+                yield chunk
+            self.breaker.record_success()
+        except GeneratorExit:
+            # The consumer stopped early (e.g. client disconnected); that says nothing about upstream health
+            self.breaker.probe_in_flight = False
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.probe_in_flight = False
+            raise
+        finally:
+            await iterator.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "breaker_state": self.breaker.state,
+            "breaker_rejected": self.breaker.rejected,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "first_token_p95_s": self.first_token_latency.percentile(0.95),
+            "call_p95_s": self.call_latency.percentile(0.95),
+        }
@@ -10,22 +10,17 @@ from typing import Dict, List, Optional
 from stt_service import SpeechHandler
 
 # --- Import the new InterviewLogicNVIDIA and NvidiaConceptExplainer ---
-from interviewer_logic_gemini import InterviewLogicNVIDIA # Assuming this file now houses your NVIDIA LLM interview logic
-# from summary_logic_gemini import NvidiaConceptExplainer # NEW IMPORT
+from interviewer_logic_gemini import InterviewLogicNVIDIA, InterviewerUnavailableError, UPSTREAM_UNAVAILABLE_MESSAGE # Assuming this file now houses your NVIDIA LLM interview logic
+from summary_logic_gemini import ConceptExplainerNVIDIA # Shares the async LLM client pool with the interviewer
+from opening_pool import opening_pool
+from turn_tracing import tracer
+from session_store import SessionStore
+from question_bank import question_bank
+from question_sampler import question_sampler, adaptive_engine
+from question_search import get_question_search
 
 # --- Dummy Implementations (as in your original combined script) ---
 # Retain other dummy classes unless specified for replacement
-class ProgressTracker:
-    def __init__(self):
-        self.scores = {}
-    def update_progress(self, user_id: str, correct_answers: int, total_questions: int):
-        if user_id not in self.scores:
-            self.scores[user_id] = {"correct": 0, "total": 0}
-        self.scores[user_id]["correct"] = correct_answers
-        self.scores[user_id]["total"] = total_questions
-    def get_score(self, user_id: str):
-        return self.scores.get(user_id, {"correct": 0, "total": 0})
-
 class NvidiaChatForAptitude:
     def __init__(self):
         print("NVIDIA Chat for Aptitude initialized (conceptual).")
@@ -34,33 +29,31 @@ class NvidiaChatForAptitude:
         return f"NVIDIA Aptitude AI acknowledged: '{last_message}'. I can provide more details if needed."
 
 
-# Global State for Gradio
+# Global State for Gradio (scores are kept by question_sampler.tracker)
 aptitude_user_sessions = {
     "default_user": {
-        "score": {"correct": 0, "total": 0},
         "chat_history": []
     }
 }
-QUESTIONS_FILE_PATH = os.path.join(os.path.dirname(__file__), "data", "questions.json")
-questions_data = []
-try:
-    with open(QUESTIONS_FILE_PATH, encoding="utf-8") as f:
-        questions_data = json.load(f)
-except FileNotFoundError:
-    print(f"WARNING: questions.json not found at {QUESTIONS_FILE_PATH}. Aptitude questions will not be available.")
-except json.JSONDecodeError:
-    print(f"ERROR: Could not decode questions.json at {QUESTIONS_FILE_PATH}. Check file format.")
-
 # --- INSTANTIATE NVIDIA CONCEPT EXPLAINER ---
-# concept_explainer_instance = NvidiaConceptExplainer() # <-- CHANGE HERE
-progress_tracker_instance = ProgressTracker()
+concept_explainer_instance = ConceptExplainerNVIDIA()
 nvidia_chat_instance = NvidiaChatForAptitude()
 
 # Initialize a dummy speech handler
 speech_handler =SpeechHandler() # Assuming this is defined elsewhere
 
-# Global variable to hold the InterviewLogicNVIDIA instance for the current session
-current_interviewer_logic: Optional[InterviewLogicNVIDIA] = None
+# The default persona is pre-warmed so the first "Start Interview" click does not wait on a generation
+DEFAULT_INTERVIEWER_PERSONA = "You are a professional software engineering hiring manager. Ask relevant technical and behavioral questions."
+opening_pool.register(DEFAULT_INTERVIEWER_PERSONA)
+
+# Shows per-stage timings of recent turns under the interviewer chat (INTERVIEW_DEBUG_PANEL=1)
+INTERVIEW_DEBUG_PANEL = os.getenv("INTERVIEW_DEBUG_PANEL", "0") == "1"
+
+# One InterviewLogicNVIDIA per browser session, keyed by Gradio's session hash
+interview_sessions = SessionStore(
+    max_sessions=int(os.getenv("GRADIO_MAX_SESSIONS", "200")),
+    idle_timeout=float(os.getenv("GRADIO_SESSION_IDLE_TIMEOUT_S", "1800")),
+)
 
 # Helper function for file transcription (using SpeechRecognition library)
 def transcribe_audio_file(filename: str) -> str:
@@ -74,54 +67,112 @@ def transcribe_audio_file(filename: str) -> str:
     except Exception as e:
         return f"Error transcribing file: {e}"
 
-# --- Interviewer Tab Functions (unchanged as they use current_interviewer_logic) ---
-async def start_interview_single(persona_input: str, difficulty: str):
-    global current_interviewer_logic
-    
-    current_interviewer_logic = InterviewLogicNVIDIA(persona=persona_input)
-    
-    initial_interviewer_response = await current_interviewer_logic.get_interviewer_response(user_text="")
-    
-    chatbot_history = [[None, initial_interviewer_response]]
-    
-    return chatbot_history, gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
-
-async def respond_to_interviewer_single(user_input: str, chat_history: List[List[Optional[str]]]):
-    global current_interviewer_logic
-    
-    if current_interviewer_logic is None:
-        return chat_history + [[None, "Error: Interview not started. Please click 'Start Interview'."]], gr.update(value="", interactive=False), gr.update(interactive=False), gr.update(interactive=False), gr.update(interactive=False)
-    
-    if not user_input.strip():
-        return chat_history, gr.update(value="", interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
-
-    chat_history.append([user_input, None])
+def _session_key(request: Optional[gr.Request]) -> str:
+    """Identifies the browser session an event came from."""
+    return (request.session_hash if request is not None else None) or "default"
 
-    try:
-        interviewer_response_text = await current_interviewer_logic.get_interviewer_response(user_text=user_input)
+# --- Interviewer Tab Functions (one interview per browser session) ---
+async def start_interview_single(persona_input: str, difficulty: str, request: gr.Request):
+    session_key = _session_key(request)
+    async with interview_sessions.lock(session_key):
+        interviewer_logic = InterviewLogicNVIDIA(persona=persona_input)
         
-        is_done = await current_interviewer_logic.check_if_done(user_input)
-        if is_done:
-            interviewer_response_text += "\n\n(Interview concluded by AI. Click 'Clear Interview' to restart.)"
-            current_interviewer_logic = None
-            
-        chat_history[-1][1] = interviewer_response_text
-        
-        if is_done:
-            return chat_history, gr.update(value="", interactive=False), gr.update(interactive=False), gr.update(interactive=False), gr.update(interactive=False)
+        # Use a pre-generated opening when one is ready; the pool refills itself in the background
+        initial_interviewer_response = opening_pool.take(persona_input)
+        if initial_interviewer_response is not None:
+            interviewer_logic.seed_opening(initial_interviewer_response)
         else:
-            return chat_history, gr.update(value=""), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
+            trace = tracer.start_turn("gradio_start", session_key)
+            try:
+                initial_interviewer_response = await interviewer_logic.get_interviewer_response(user_text="", trace=trace)
+            except InterviewerUnavailableError:
+                # Nothing to keep yet; the candidate can press Start again
+                return [[None, UPSTREAM_UNAVAILABLE_MESSAGE]], gr.update(interactive=False), gr.update(interactive=False), gr.update(interactive=False), gr.update(interactive=False)
+            finally:
+                trace.finish()
+        interview_sessions.set(session_key, interviewer_logic)
     
-    except Exception as e:
-        error_message = f"Error during interview: {e}"
-        chat_history[-1][1] = error_message
-        print(f"Error: {e}")
-        return chat_history, gr.update(value=""), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
-
+    chatbot_history = [[None, initial_interviewer_response]]
+    
+    return chatbot_history, gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
 
-def clear_interview_single():
-    global current_interviewer_logic
-    current_interviewer_logic = None
+async def respond_to_interviewer_single_stream(user_input: str, chat_history: List[List[Optional[str]]], request: gr.Request):
+    """Sends the candidate's answer and streams the interviewer's reply: the chatbot updates as each token arrives."""
+    session_key = _session_key(request)
+    async with interview_sessions.lock(session_key): # Events from one browser run one at a time
+        interviewer_logic = interview_sessions.get(session_key)
+
+        if interviewer_logic is None:
+            yield chat_history + [[None, "Error: Interview not started. Please click 'Start Interview'."]], gr.update(value="", interactive=False), gr.update(interactive=False), gr.update(interactive=False), gr.update(interactive=False)
+            return
+
+        if not user_input.strip():
+            yield chat_history, gr.update(value="", interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
+            return
+
+        chat_history.append([user_input, ""])
+        # Lock the inputs while the reply is streaming in
+        yield chat_history, gr.update(value="", interactive=False), gr.update(interactive=False), gr.update(interactive=False), gr.update(interactive=False)
+
+        trace = tracer.start_turn("gradio_respond_stream", session_key)
+        try:
+            async for delta in interviewer_logic.get_interviewer_response_stream(user_text=user_input, trace=trace):
+                chat_history[-1][1] += delta
+                yield chat_history, gr.update(), gr.update(), gr.update(), gr.update()
+
+            is_done = await interviewer_logic.check_if_done(user_input, trace=trace)
+            if is_done:
+                chat_history[-1][1] += "\n\n(Interview concluded by AI. Click 'Clear Interview' to restart.)"
+                interview_sessions.pop(session_key)
+                yield chat_history, gr.update(value="", interactive=False), gr.update(interactive=False), gr.update(interactive=False), gr.update(interactive=False)
+            else:
+                yield chat_history, gr.update(value="", interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
+
+        except InterviewerUnavailableError:
+            # The answer was not recorded; ask the candidate to send it again
+            chat_history[-1][1] = UPSTREAM_UNAVAILABLE_MESSAGE
+            yield chat_history, gr.update(value=user_input, interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
+        except Exception as e:
+            error_message = f"Error during interview: {e}"
+            chat_history[-1][1] = error_message
+            print(f"Error: {e}")
+            yield chat_history, gr.update(value="", interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
+        finally:
+            trace.finish()
+
+
+# Expires idle interview sessions in the background (started with the first page load)
+_session_sweeper: Optional[asyncio.Task] = None
+
+async def start_opening_prewarm():
+    """
+    Starts the background work on Gradio's event loop: pre-generation of opening turns, the interview session
+    sweeper and periodic adaptive-difficulty saves.
+    """
+    global _session_sweeper
+    opening_pool.start()
+    if _session_sweeper is None or _session_sweeper.done():
+        _session_sweeper = asyncio.create_task(interview_sessions.run_sweeper())
+    if adaptive_engine is not None:
+        adaptive_engine.start_saver()
+
+def render_turn_debug_panel() -> str:
+    """Markdown view of the latest turn's spans and the p50/p95 of every stage."""
+    lines = ["| Stage | Count | p50 (s) | p95 (s) |", "|---|---|---|---|"]
+    for stage, summary in tracer.stage_summary().items():
+        lines.append(f"| {stage} | {summary['count']} | {summary['p50_s']:.3f} | {summary['p95_s']:.3f} |")
+    recent = tracer.recent(1)
+    if recent:
+        turn = recent[0]
+        spans = ", ".join(f"{span['stage']} {span['seconds']:.3f}s" for span in turn["spans"])
+        metrics = ", ".join(f"{name} {value}" for name, value in turn["metrics"].items())
+        lines += ["", f"**Last turn** ({turn['kind']}): {spans}", "", metrics]
+    return "\n".join(lines)
+
+async def clear_interview_single(request: gr.Request):
+    session_key = _session_key(request)
+    async with interview_sessions.lock(session_key):
+        interview_sessions.pop(session_key)
     return [], gr.update(value="", interactive=True), gr.update(interactive=True), gr.update(interactive=True), gr.update(interactive=True)
 
 # --- Aptitude Tutor Tab Functions ---
@@ -129,67 +180,80 @@ def get_aptitude_user_id():
     return "default_user"
 
 def gradio_get_random_aptitude_question():
-    if not questions_data:
+    question = question_sampler.draw(get_aptitude_user_id())
+    if question is None:
         return "No aptitude questions available.", "", 0
-    question = random.choice(questions_data)
-    return question["question"], ", ".join(question["options"]), question["id"]
+    return question.question, question.options_text, question.id
 
 def gradio_submit_aptitude_answer(question_id: int, selected_option_index: str):
     user_id = get_aptitude_user_id()
-    if not questions_data:
+    if not question_bank:
         return "Error: No aptitude questions loaded."
     try:
         selected_option_index_int = int(selected_option_index)
     except ValueError:
         return "Error: Please select a valid option."
-    question = next((q for q in questions_data if q["id"] == question_id), None)
+    question = question_bank.get(question_id)
     if not question:
         return "Error: Question not found."
-    is_correct = (selected_option_index_int == question["correct_option_index"])
-    user_session = aptitude_user_sessions.get(user_id)
-    if not user_session:
-        user_session = aptitude_user_sessions[user_id] = {"score": {"correct": 0, "total": 0}, "chat_history": []}
-    user_session["score"]["total"] += 1
-    if is_correct:
-        user_session["score"]["correct"] += 1
-    progress_tracker_instance.update_progress(user_id, user_session["score"]["correct"], user_session["score"]["total"])
-    status_message = "Correct!" if is_correct else f"Incorrect. The correct option was: {question['options'][question['correct_option_index']]}."
-    return status_message + f" Your current score: {user_session['score']['correct']}/{user_session['score']['total']}"
+    is_correct = question.is_correct(selected_option_index_int)
+    question_sampler.record(user_id, question.id, is_correct)
+    score = question_sampler.tracker.get_score(user_id)
+    status_message = "Correct!" if is_correct else f"Incorrect. The correct option was: {question.options[question.correct_option_index]}."
+    return status_message + f" Your current score: {score['correct']}/{score['total']}"
 
 def gradio_get_aptitude_user_progress():
-    user_id = get_aptitude_user_id()
-    user_session = aptitude_user_sessions.get(user_id)
-    if not user_session:
+    score = question_sampler.tracker.get_score(get_aptitude_user_id())
+    if not score["total"]:
         return "Start practicing aptitude to see your progress!"
-    correct = user_session["score"]["correct"]
-    total = user_session["score"]["total"]
-    accuracy = (correct / total) * 100 if total > 0 else 0.0
-    return f"Correct: {correct}, Total: {total}, Accuracy: {accuracy:.1f}%"
+    return f"Correct: {score['correct']}, Total: {score['total']}, Accuracy: {score['accuracy']:.1f}%"
 
-async def gradio_explain_aptitude_concept(topic: str):
+def _render_question_matches(matches) -> str:
+    if not matches:
+        return "No matching questions found."
+    return "\n\n".join(f"**Q{question.id}** ({score:.2f}) {question.question}\n\n{question.options_text}" for question, score in matches)
+
+async def gradio_find_practice_questions(topic: str):
     if not topic:
         return "Topic cannot be empty."
+    return _render_question_matches(await asyncio.to_thread(get_question_search().search, topic, 5))
+
+async def gradio_more_like_this(question_id: int):
+    if not question_id:
+        return "Get a question first."
+    return _render_question_matches(await asyncio.to_thread(get_question_search().similar, question_id, 5))
+
+async def gradio_explain_aptitude_concept(topic: str):
+    if not topic:
+        yield "Topic cannot be empty."
+        return
     # --- CALL NVIDIA CONCEPT EXPLAINER HERE ---
-    explanation = await concept_explainer_instance.explain_concept(topic)
-    
-    # --- ADD CONSOLE PRINT HERE ---
-    print(f"\n--- Concept Explanation for '{topic}' (NVIDIA API) ---\n{explanation}\n-------------------------------------------\n") # New print statement
+    # Streams into the textbox; identical topics requested at the same time share one upstream call
+    explanation = ""
+    try:
+        async for delta in concept_explainer_instance.explain_concept_stream(topic):
+            explanation += delta
+            yield explanation
+        explanation = explanation.strip()
+    except Exception as e:
+        print(f"Error in NVIDIA API call for concept explanation: {e}")
+        explanation = f"Failed to get explanation due to API error: {e}"
+    yield explanation
     
     user_id = get_aptitude_user_id()
     user_session = aptitude_user_sessions.get(user_id)
     if not user_session:
-        user_session = aptitude_user_sessions[user_id] = {"score": {"correct": 0, "total": 0}, "chat_history": []}
+        user_session = aptitude_user_sessions[user_id] = {"chat_history": []}
     user_session["chat_history"].extend([
         {"role": "user", "content": f"Explain: {topic}"},
         {"role": "assistant", "content": explanation}
     ])
-    return explanation
 
 async def gradio_chat_with_aptitude_ai(message: str, chat_history: list):
     user_id = get_aptitude_user_id()
     user_session = aptitude_user_sessions.get(user_id)
     if not user_session:
-        user_session = aptitude_user_sessions[user_id] = {"score": {"correct": 0, "total": 0}, "chat_history": []}
+        user_session = aptitude_user_sessions[user_id] = {"chat_history": []}
     formatted_history = []
     for user_msg, bot_msg in chat_history:
         if user_msg:
@@ -206,7 +270,8 @@ async def gradio_transcribe_uploaded_audio_endpoint(audio_file_path: str):
     if not audio_file_path:
         return "No audio file uploaded."
     try:
-        transcription_text = await asyncio.to_thread(transcribe_audio_file, audio_file_path)
+        with tracer.stage("stt"):
+            transcription_text = await asyncio.to_thread(transcribe_audio_file, audio_file_path)
         return transcription_text
     except Exception as e:
         return f"Audio transcription failed: {e}"
@@ -215,7 +280,8 @@ async def gradio_transcribe_recorded_audio_endpoint(audio_file_path: str):
     if not audio_file_path:
         return "No audio recorded."
     try:
-        transcription_text = await asyncio.to_thread(transcribe_audio_file, audio_file_path)
+        with tracer.stage("stt"):
+            transcription_text = await asyncio.to_thread(transcribe_audio_file, audio_file_path)
         return transcription_text
     except Exception as e:
         return f"Recording or transcription failed: {e}"
@@ -292,7 +358,7 @@ with gr.Blocks(css=custom_css, title="AI Assistant") as interviewer_tab:
                 gr.Markdown("### Interview Settings")
                 persona_input = gr.Textbox(
                     label="Interviewer Persona",
-                    value="You are a professional software engineering hiring manager. Ask relevant technical and behavioral questions.",
+                    value=DEFAULT_INTERVIEWER_PERSONA,
                     lines=3,
                     placeholder="e.g., 'You are a friendly HR representative...' or 'You are a tough technical lead...'"
                 )
@@ -343,34 +409,42 @@ with gr.Blocks(css=custom_css, title="AI Assistant") as interviewer_tab:
                         submit_btn = gr.Button("Send Text", size="sm", interactive=False)
                         voice_send_btn = gr.Button("🎤 Send Voice", size="sm", interactive=False) 
 
+            with gr.Accordion("Debug: turn timings", open=False, visible=INTERVIEW_DEBUG_PANEL):
+                turn_debug_output = gr.Markdown("No turns recorded yet.")
+                refresh_debug_btn = gr.Button("Refresh Timings", size="sm")
+
     start_btn.click(
         start_interview_single,
         inputs=[persona_input, difficulty_radio],
         outputs=[interviewer_chatbot, user_input, submit_btn, voice_send_btn, stt_record_audio_input_interview]
-    )
+    ).then(render_turn_debug_panel, outputs=turn_debug_output)
     
     submit_btn.click(
-        respond_to_interviewer_single,
+        respond_to_interviewer_single_stream,
         inputs=[user_input, interviewer_chatbot],
         outputs=[interviewer_chatbot, user_input, submit_btn, voice_send_btn, stt_record_audio_input_interview]
-    )
+    ).then(render_turn_debug_panel, outputs=turn_debug_output)
     
     user_input.submit(
-        respond_to_interviewer_single,
+        respond_to_interviewer_single_stream,
         inputs=[user_input, interviewer_chatbot],
         outputs=[interviewer_chatbot, user_input, submit_btn, voice_send_btn, stt_record_audio_input_interview]
-    )
+    ).then(render_turn_debug_panel, outputs=turn_debug_output)
 
     voice_send_btn.click(
         gradio_transcribe_recorded_audio_endpoint,
         inputs=[stt_record_audio_input_interview],
         outputs=[user_input]
     ).then(
-        respond_to_interviewer_single,
+        respond_to_interviewer_single_stream,
         inputs=[user_input, interviewer_chatbot],
         outputs=[interviewer_chatbot, user_input, submit_btn, voice_send_btn, stt_record_audio_input_interview]
-    )
+    ).then(render_turn_debug_panel, outputs=turn_debug_output)
+
+    refresh_debug_btn.click(render_turn_debug_panel, outputs=turn_debug_output)
     
+    interviewer_tab.load(start_opening_prewarm)
+
     clear_btn.click(
         clear_interview_single,
         outputs=[interviewer_chatbot, user_input, submit_btn, voice_send_btn, stt_record_audio_input_interview]
@@ -415,6 +489,9 @@ with gr.Blocks() as aptitude_tab:
             inputs=[apt_question_id_state, selected_option_index_input],
             outputs=apt_answer_status
         )
+        more_like_this_btn = gr.Button("More Like This")
+        similar_questions_output = gr.Markdown()
+        more_like_this_btn.click(gradio_more_like_this, inputs=apt_question_id_state, outputs=similar_questions_output)
 
     with gr.Tab("Progress"):
         apt_progress_output = gr.Textbox(label="Your Aptitude Progress", interactive=False)
@@ -426,6 +503,9 @@ with gr.Blocks() as aptitude_tab:
         explain_concept_btn = gr.Button("Explain Concept")
         concept_explanation_output = gr.Textbox(label="Explanation", lines=10, interactive=False)
         explain_concept_btn.click(gradio_explain_aptitude_concept, inputs=concept_topic_input, outputs=concept_explanation_output)
+        find_questions_btn = gr.Button("Find Practice Questions")
+        practice_questions_output = gr.Markdown()
+        find_questions_btn.click(gradio_find_practice_questions, inputs=concept_topic_input, outputs=practice_questions_output)
 
     with gr.Tab("Tutor Chat (NVIDIA Concept)"):
         apt_tutor_chatbot = gr.Chatbot(label="Aptitude Tutor Chat")
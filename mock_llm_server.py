@@ -0,0 +1,215 @@
+# mock_llm_server.py
+"""
+Local stand-in for NVIDIA's OpenAI-compatible chat-completions API, for offline load and latency testing.
+
+Run it and point the app at it:
+    python mock_llm_server.py --port 8001 --ttft-ms 300 --tokens-per-sec 60 --error-rate 0.02
+    NVIDIA_BASE_URL=http://127.0.0.1:8001/v1 uvicorn sampleapp:app
+"""
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+MOCK_LLM_TTFT_MS = float(os.getenv("MOCK_LLM_TTFT_MS", "250"))
+MOCK_LLM_TTFT_JITTER_MS = float(os.getenv("MOCK_LLM_TTFT_JITTER_MS", "50"))
+MOCK_LLM_TOKENS_PER_SEC = float(os.getenv("MOCK_LLM_TOKENS_PER_SEC", "80"))
+MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+MOCK_LLM_ERROR_STATUS = int(os.getenv("MOCK_LLM_ERROR_STATUS", "503"))
+MOCK_LLM_REASONING_TOKENS = int(os.getenv("MOCK_LLM_REASONING_TOKENS", "0"))
+MOCK_LLM_REPLIES_FILE = os.getenv("MOCK_LLM_REPLIES_FILE")
+MOCK_LLM_SEED = os.getenv("MOCK_LLM_SEED")
+
+DEFAULT_REPLIES: Dict[str, List[str]] = {
+    "interviewer": [
+        "Thanks for that answer. Can you walk me through how you would design a rate limiter for a public API?",
+        "That makes sense. How would you debug a service whose p99 latency doubled after a deploy?",
+        "Good. Tell me about a time you disagreed with a teammate on a technical decision. How did you resolve it?",
+        "Hello, and welcome! I'm your interviewer today. To start, could you briefly introduce yourself and your recent work?",
+    ],
+    "done_check": ["no"],
+    "explanation": [
+        "Probability measures how likely an event is, as the ratio of favourable outcomes to total outcomes. "
+        "For example, the probability of rolling a 4 on a fair die is 1/6. For independent events A and B, "
+        "P(A and B) = P(A) * P(B); for mutually exclusive events, P(A or B) = P(A) + P(B).",
+    ],
+    "summary": [
+        "Overall assessment: the candidate communicated clearly and structured their answers well. "
+        "Strengths: problem decomposition, trade-off discussion. Areas to improve: depth on distributed systems. "
+        "Recommendation: lean hire.",
+    ],
+}
+REASONING_FILLER = "Let me think about what the candidate said and pick a relevant follow-up question."
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+class MockLLMConfig:
+    def __init__(
+        self,
+        ttft_ms: float = MOCK_LLM_TTFT_MS,
+        ttft_jitter_ms: float = MOCK_LLM_TTFT_JITTER_MS,
+        tokens_per_sec: float = MOCK_LLM_TOKENS_PER_SEC,
+        error_rate: float = MOCK_LLM_ERROR_RATE,
+        error_status: int = MOCK_LLM_ERROR_STATUS,
+        reasoning_tokens: int = MOCK_LLM_REASONING_TOKENS,
+        replies_file: Optional[str] = MOCK_LLM_REPLIES_FILE,
+        seed: Optional[str] = MOCK_LLM_SEED,
+    ):
+        self.ttft_ms = ttft_ms
+        self.ttft_jitter_ms = ttft_jitter_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reasoning_tokens = reasoning_tokens
+        self.replies = dict(DEFAULT_REPLIES)
+        if replies_file:
+            # JSON object mapping call kind ("interviewer", "done_check", "explanation", "summary") to a list of replies
+            with open(replies_file, "r", encoding="utf-8") as f:
+                self.replies.update(json.load(f))
+        self.random = random.Random(int(seed)) if seed is not None else random.Random()
+
+
+config = MockLLMConfig()
+app = FastAPI(title="Mock OpenAI-compatible LLM", version="0.1.0")
+
+
+def classify_call(messages: List[dict]) -> str:
+    """Guesses which app call site a request comes from, so the canned reply fits."""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system").lower()
+    if "respond only with 'yes' or 'no'" in system:
+        return "done_check"
+    if "aptitude test preparation" in system:
+        return "explanation"
+    if "summar" in system or "evaluat" in system:
+        return "summary"
+    return "interviewer"
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text)
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+async def _first_token_delay():
+    delay_ms = max(0.0, config.ttft_ms + config.random.uniform(-config.ttft_jitter_ms, config.ttft_jitter_ms))
+    await asyncio.sleep(delay_ms / 1000)
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "openai/gpt-oss-20b", "object": "model", "owned_by": "mock"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "mock-model")
+    messages = body.get("messages", [])
+    max_tokens = body.get("max_tokens") or 4096
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    prompt_tokens = sum(len(tokenize(m.get("content") or "")) + 4 for m in messages)
+
+    if config.random.random() < config.error_rate:
+        await _first_token_delay()
+        return JSONResponse(
+            status_code=config.error_status,
+            content={"error": {"message": "Mock upstream error", "type": "server_error", "code": config.error_status}},
+        )
+
+    kind = classify_call(messages)
+    reply = config.random.choice(config.replies.get(kind) or DEFAULT_REPLIES["interviewer"])
+    tokens = tokenize(reply)
+    finish_reason = "stop"
+    if len(tokens) > max_tokens:
+        tokens, finish_reason = tokens[:max_tokens], "length"
+    reasoning = tokenize(REASONING_FILLER)[:config.reasoning_tokens] if kind != "done_check" else []
+
+    if not body.get("stream"):
+        await _first_token_delay()
+        await asyncio.sleep((len(reasoning) + len(tokens)) / config.tokens_per_sec)
+        message = {"role": "assistant", "content": "".join(tokens)}
+        if reasoning:
+            message["reasoning_content"] = "".join(reasoning)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": _usage(prompt_tokens, len(reasoning) + len(tokens)),
+        }
+
+    include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+    async def event_stream():
+        await _first_token_delay()
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        interval = 1.0 / config.tokens_per_sec
+        for token in reasoning:
+            yield _chunk(completion_id, model, {"reasoning_content": token, "content": None})
+            await asyncio.sleep(interval)
+        for token in tokens:
+            yield _chunk(completion_id, model, {"content": token})
+            await asyncio.sleep(interval)
+        yield _chunk(completion_id, model, {}, finish_reason)
+        if include_usage:
+            payload = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [], "usage": _usage(prompt_tokens, len(reasoning) + len(tokens)),
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, default=MOCK_LLM_TTFT_MS, help="Mean time to first token")
+    parser.add_argument("--ttft-jitter-ms", type=float, default=MOCK_LLM_TTFT_JITTER_MS)
+    parser.add_argument("--tokens-per-sec", type=float, default=MOCK_LLM_TOKENS_PER_SEC)
+    parser.add_argument("--error-rate", type=float, default=MOCK_LLM_ERROR_RATE, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=MOCK_LLM_ERROR_STATUS)
+    parser.add_argument("--reasoning-tokens", type=int, default=MOCK_LLM_REASONING_TOKENS, help="reasoning_content tokens streamed before the reply")
+    parser.add_argument("--replies-file", default=MOCK_LLM_REPLIES_FILE, help="JSON file of canned replies per call kind")
+    parser.add_argument("--seed", default=MOCK_LLM_SEED)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        ttft_ms=args.ttft_ms,
+        ttft_jitter_ms=args.ttft_jitter_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        reasoning_tokens=args.reasoning_tokens,
+        replies_file=args.replies_file,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,134 @@
+import os
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from interviewer_logic_gemini import InterviewLogicNVIDIA
+from llm_scheduler import PRIORITY_PREWARM
+
+OPENING_POOL_SIZE = int(os.getenv("OPENING_POOL_SIZE", "3"))
+OPENING_POOL_CONCURRENCY = int(os.getenv("OPENING_POOL_CONCURRENCY", "2"))
+OPENING_POOL_RETRY_S = float(os.getenv("OPENING_POOL_RETRY_S", "30"))
+
+
+class OpeningPool:
+    def __init__(
+        self,
+        pool_size: int = OPENING_POOL_SIZE,
+        concurrency: int = OPENING_POOL_CONCURRENCY,
+    ):
+        """
+        Warm pool of pre-generated opening turns (greeting + first question), kept per full persona prompt.
+        Each opening is handed out at most once, so candidates with the same persona still get variety.
+        A background task refills drained pools in the lowest scheduler lane. Only personas registered up front
+        (at startup) are pooled; any other persona is generated live, so request payloads cannot make the
+        server pre-generate openings that are never reused.
+        """
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self._openings: Dict[str, Deque[str]] = {}
+        self._in_flight = {} # persona -> number of openings being generated
+        self._wakeup: Optional[asyncio.Event] = None
+        self._refill_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+    def register(self, persona: str):
+        """Starts keeping `pool_size` openings ready for this full persona prompt."""
+        if persona not in self._openings:
+            self._openings[persona] = deque()
+            self._in_flight[persona] = 0
+        self._notify()
+
+    def take(self, persona: str) -> Optional[str]:
+        """
+        Returns a pre-generated opening for this persona, or None if none is ready or the persona was never
+        registered (the caller generates live).
+        """
+        openings = self._openings.get(persona)
+        if openings:
+            self.hits += 1
+            opening = openings.popleft()
+            self._notify()
+            return opening
+        self.misses += 1
+        return None
+
+    def _notify(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return # No event loop yet; start() will pick up the registered personas
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Starts the background refill task on the running event loop (idempotent)."""
+        if self._refill_task is None or self._refill_task.done():
+            self._wakeup = asyncio.Event()
+            self._wakeup.set()
+            self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+            self._refill_task = None
+
+    def _next_persona_to_fill(self) -> Optional[str]:
+        # Emptiest pool first, so every persona gets at least one opening quickly
+        candidates = [
+            (len(openings) + self._in_flight[persona], persona)
+            for persona, openings in self._openings.items()
+            if len(openings) + self._in_flight[persona] < self.pool_size
+        ]
+        return min(candidates)[1] if candidates else None
+
+    async def _generate(self, persona: str):
+        try:
+            opening = await InterviewLogicNVIDIA(persona).generate_opening(priority=PRIORITY_PREWARM)
+        except Exception as e:
+            print(f"Opening pre-generation failed: {e}")
+            opening = None
+        finally:
+            if persona in self._in_flight:
+                self._in_flight[persona] -= 1
+        if opening is None:
+            return False
+        if persona in self._openings:
+            self._openings[persona].append(opening)
+            self.generated += 1
+        return True
+
+    async def _refill_loop(self):
+        running = set()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                while len(running) < self.concurrency:
+                    persona = self._next_persona_to_fill()
+                    if persona is None:
+                        break
+                    self._in_flight[persona] += 1
+                    running.add(asyncio.create_task(self._generate(persona)))
+                if not running:
+                    break
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                if not all(task.result() for task in done):
+                    # Upstream is struggling; stop hammering it and try again later
+                    await asyncio.sleep(OPENING_POOL_RETRY_S)
+
+    def stats(self) -> dict:
+        return {
+            "personas": len(self._openings),
+            "ready": sum(len(openings) for openings in self._openings.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+        }
+
+
+# Shared pool used by both the Gradio and FastAPI front ends
+opening_pool = OpeningPool()
@@ -1,5 +1,10 @@
+import re
 import json
 import os
+import hashlib
+
+# User ids used verbatim in file names; anything else (e.g. containing "/") is hashed
+_SAFE_USER_ID_RE = re.compile(r"[A-Za-z0-9_.-]{1,64}")
 
 class ProgressTracker:
     def __init__(self, data_dir: str = "data"):
@@ -13,6 +18,8 @@ class ProgressTracker:
 
     def _get_progress_file_path(self, user_id: str) -> str:
         """Constructs the path to the user's progress file."""
+        if _SAFE_USER_ID_RE.fullmatch(user_id) is None:
+            user_id = "h" + hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
         return os.path.join(self.data_dir, f"progress_{user_id}.json")
 
     def load_progress(self, user_id: str) -> dict:
@@ -36,6 +43,7 @@ class ProgressTracker:
         Saves the progress data for a specific user to their progress file.
         """
         progress_file = self._get_progress_file_path(user_id)
+        progress_data["user_id"] = user_id # The file name may be a hash of it
         with open(progress_file, "w", encoding="utf-8") as f:
             json.dump(progress_data, f, indent=2)
 
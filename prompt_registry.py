@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from typing import Dict, List, Literal, Optional, get_args
+
+from context_window import estimate_tokens
+from interviewer_logic_gemini import INTERVIEW_START_PROMPT, build_system_prompt
+
+PROMPT_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT_DIRS = [d.strip() for d in os.getenv("PROMPT_DIRS", "personas,guidelines").split(",") if d.strip()]
+PROMPT_FILE_EXTENSIONS = (".txt", ".md")
+PROMPT_MTIME_CHECK_INTERVAL = float(os.getenv("PROMPT_MTIME_CHECK_INTERVAL", "2.0"))
+Difficulty = Literal["easy", "medium", "hard"]
+DIFFICULTIES = get_args(Difficulty)
+
+
+class PromptNotRegisteredError(KeyError):
+    """Raised when a persona/criteria path is not one of the registered prompt files."""
+
+
+def assemble_persona(persona: str, difficulty: str) -> str:
+    """Appends the interview instructions for a difficulty level to a raw persona file."""
+    return f"{persona}\nBegin the interview. You are the interviewer and I am the interviewee. Please be very concise as the interviewer in your answers but do not skip the formalities. Use this opportunity to pick up on interviewee social cues. Keep in mind time is limited and make this interview {difficulty}"
+
+
+class PersonaPrompt:
+    __slots__ = ("path", "difficulty", "full_persona", "system_prompt", "system_tokens", "opening_tokens")
+
+    def __init__(self, path: str, difficulty: str, persona_text: str):
+        self.path = path
+        self.difficulty = difficulty
+        self.full_persona = assemble_persona(persona_text, difficulty)
+        self.system_prompt = build_system_prompt(self.full_persona)
+        # Estimated sizes (chars / 4, see context_window.estimate_tokens), not tokenizer counts
+        self.system_tokens = estimate_tokens(self.system_prompt)
+        # Size of the very first request: system prompt plus the "start the interview" instruction
+        self.opening_tokens = self.system_tokens + estimate_tokens(INTERVIEW_START_PROMPT)
+
+
+class PromptAsset:
+    def __init__(self, path: str, full_path: str):
+        self.path = path
+        self.full_path = full_path
+        self.mtime = 0.0
+        self.checked_at = 0.0
+        self.text = ""
+        self.tokens = 0
+        self.personas: Dict[str, PersonaPrompt] = {}
+
+    def load(self):
+        with open(self.full_path, 'r', encoding="utf-8") as f:
+            text = f.read()
+        self.mtime = os.path.getmtime(self.full_path)
+        self.checked_at = time.monotonic()
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.personas = {}
+
+    def persona(self, difficulty: str) -> PersonaPrompt:
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"Unknown difficulty {difficulty!r}; expected one of {', '.join(DIFFICULTIES)}")
+        prompt = self.personas.get(difficulty)
+        if prompt is None:
+            prompt = self.personas[difficulty] = PersonaPrompt(self.path, difficulty, self.text)
+        return prompt
+
+
+class PromptRegistry:
+    def __init__(self, base_dir: str = PROMPT_BASE_DIR, prompt_dirs: Optional[List[str]] = None):
+        """
+        Loads every persona and guideline file once and serves them from memory.
+        Lookups re-stat a file at most every PROMPT_MTIME_CHECK_INTERVAL seconds and reload it only when its
+        mtime changed. Paths that are not registered files are rejected, so request payloads cannot read
+        arbitrary files from disk.
+        """
+        self.base_dir = base_dir
+        self.prompt_dirs = prompt_dirs if prompt_dirs is not None else PROMPT_DIRS
+        self._assets: Dict[str, PromptAsset] = {}
+        self._lock = threading.Lock()
+        self.rescan()
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return os.path.normpath(path).replace(os.sep, "/")
+
+    def rescan(self):
+        """(Re)discovers prompt files under the configured directories and preloads them."""
+        assets = {}
+        for prompt_dir in self.prompt_dirs:
+            full_dir = os.path.join(self.base_dir, prompt_dir)
+            if not os.path.isdir(full_dir):
+                print(f"WARNING: prompt directory not found at {full_dir}.")
+                continue
+            for root, _, files in os.walk(full_dir):
+                for name in files:
+                    if not name.endswith(PROMPT_FILE_EXTENSIONS):
+                        continue
+                    full_path = os.path.join(root, name)
+                    rel_path = self._normalize(os.path.relpath(full_path, self.base_dir))
+                    asset = self._assets.get(rel_path) or PromptAsset(rel_path, full_path)
+                    try:
+                        if asset.mtime != os.path.getmtime(full_path):
+                            asset.load()
+                            for difficulty in DIFFICULTIES:
+                                asset.persona(difficulty)
+                    except OSError as e:
+                        print(f"WARNING: could not load prompt file {full_path}: {e}")
+                        continue
+                    assets[rel_path] = asset
+        with self._lock:
+            self._assets = assets
+        print(f"PromptRegistry loaded {len(assets)} prompt files.")
+
+    def _get_asset(self, path: str) -> PromptAsset:
+        asset = self._assets.get(self._normalize(path))
+        if asset is None:
+            raise PromptNotRegisteredError(path)
+        now = time.monotonic()
+        if now - asset.checked_at >= PROMPT_MTIME_CHECK_INTERVAL:
+            with self._lock:
+                try:
+                    asset.checked_at = now
+                    if os.path.getmtime(asset.full_path) != asset.mtime:
+                        asset.load()
+                except OSError:
+                    # File vanished: stop serving it
+                    self._assets.pop(asset.path, None)
+                    raise PromptNotRegisteredError(path)
+        return asset
+
+    def paths(self) -> List[str]:
+        return sorted(self._assets)
+
+    def get_text(self, path: str) -> str:
+        """Returns the raw contents of a registered prompt file (e.g. summary criteria)."""
+        return self._get_asset(path).text
+
+    def get_tokens(self, path: str) -> int:
+        return self._get_asset(path).tokens
+
+    def get_persona(self, path: str, difficulty: str) -> PersonaPrompt:
+        """
+        Returns the assembled persona and system prompt for a persona file at a given difficulty.
+        Raises ValueError for a difficulty outside DIFFICULTIES, so only those are ever assembled and cached.
+        """
+        return self._get_asset(path).persona(difficulty.strip().lower())
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+QUESTIONS_FILE_PATH = os.getenv(
+    "QUESTIONS_FILE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "questions.json")
+)
+# Imported question shards, listed by a manifest that is replaced atomically once an import completes
+QUESTIONS_SHARD_DIR = os.getenv("QUESTIONS_SHARD_DIR", os.path.splitext(QUESTIONS_FILE_PATH)[0] + ".d")
+SHARD_MANIFEST_NAME = "manifest.json"
+QUESTIONS_MTIME_CHECK_INTERVAL = float(os.getenv("QUESTIONS_MTIME_CHECK_INTERVAL", "2.0"))
+# Optional question fields with a secondary index; lookups on them are case-insensitive
+INDEXED_FIELDS = ("topic", "company", "difficulty")
+
+
+class BankQuestion:
+    __slots__ = ("id", "question", "options", "correct_option_index", "explanation", "topic", "company", "difficulty", "options_text", "raw")
+
+    def __init__(self, raw: dict):
+        self.id = int(raw["id"])
+        self.question = raw["question"]
+        self.options = list(raw["options"])
+        self.correct_option_index = int(raw["correct_option_index"])
+        self.explanation = raw.get("explanation", "")
+        self.topic = _index_key(raw.get("topic"))
+        self.company = _index_key(raw.get("company"))
+        self.difficulty = _index_key(raw.get("difficulty"))
+        # Rendered once here instead of on every draw
+        self.options_text = ", ".join(self.options)
+        self.raw = raw
+
+    def is_correct(self, selected_option_index: int) -> bool:
+        return selected_option_index == self.correct_option_index
+
+
+def _index_key(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+class QuestionIndex:
+    __slots__ = ("questions", "by_id", "by_field", "version", "filtered")
+
+    def __init__(self, questions: List[BankQuestion], version: tuple = ()):
+        """Immutable snapshot of the bank: the questions in file order, an id map and one map per indexed field."""
+        self.questions = questions
+        self.by_id: Dict[int, BankQuestion] = {}
+        self.by_field: Dict[str, Dict[str, List[BankQuestion]]] = {field: {} for field in INDEXED_FIELDS}
+        self.version = version # mtimes of the question file and shard manifest it was built from
+        self.filtered: Dict[tuple, List[BankQuestion]] = {} # Multi-field filter results, built on first use
+        for question in questions:
+            self.by_id[question.id] = question
+            for field in INDEXED_FIELDS:
+                value = getattr(question, field)
+                if value is not None:
+                    self.by_field[field].setdefault(value, []).append(question)
+
+
+def parse_questions(records: list) -> Tuple[List[BankQuestion], int]:
+    """Builds BankQuestions from raw records, skipping malformed ones and duplicate ids; returns (questions, skipped)."""
+    questions, seen, skipped = [], set(), 0
+    for raw in records:
+        try:
+            question = BankQuestion(raw)
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+            continue
+        if question.id in seen:
+            skipped += 1
+            continue
+        seen.add(question.id)
+        questions.append(question)
+    return questions, skipped
+
+
+def read_manifest(shard_dir: str) -> List[str]:
+    """File names of the committed shards in `shard_dir`, oldest first."""
+    try:
+        with open(os.path.join(shard_dir, SHARD_MANIFEST_NAME), encoding="utf-8") as f:
+            return list(json.load(f)["shards"])
+    except FileNotFoundError:
+        return []
+
+
+class QuestionBank:
+    def __init__(self, path: str = QUESTIONS_FILE_PATH, check_interval: float = QUESTIONS_MTIME_CHECK_INTERVAL, shard_dir: Optional[str] = None):
+        """
+        Aptitude questions held in memory with O(1) lookups by id and secondary indexes by topic, company and
+        difficulty. The bank is the question file plus the shards listed in `shard_dir`'s manifest (written by
+        ingest_questions.py); ids repeated in a later source are ignored. Accesses re-stat the file and manifest at
+        most every `check_interval` seconds; when either changed the whole index is rebuilt off to the side and
+        swapped in with one assignment, so concurrent readers see either the old or the new bank, never a mix.
+        Shards never change once written, so a reload only parses shards it has not seen. A source that fails to
+        load keeps the previous bank in service.
+        """
+        self.path = path
+        self.shard_dir = shard_dir if shard_dir is not None else (
+            QUESTIONS_SHARD_DIR if path == QUESTIONS_FILE_PATH else os.path.splitext(path)[0] + ".d"
+        )
+        self.check_interval = check_interval
+        self._index = QuestionIndex([])
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._shards: Dict[str, list] = {} # shard name -> raw records
+        self.reloads = 0
+        self.reload()
+
+    def _version(self) -> tuple:
+        version = []
+        for path in (self.path, os.path.join(self.shard_dir, SHARD_MANIFEST_NAME)):
+            try:
+                version.append(os.path.getmtime(path))
+            except OSError:
+                version.append(None)
+        return tuple(version)
+
+    def _read_records(self) -> list:
+        records = []
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                loaded = json.load(f)
+            records.extend(loaded if isinstance(loaded, list) else [])
+        shards = {}
+        for name in read_manifest(self.shard_dir):
+            shard = self._shards.get(name)
+            if shard is None:
+                with open(os.path.join(self.shard_dir, name), encoding="utf-8") as f:
+                    shard = json.load(f)
+            shards[name] = shard
+            records.extend(shard)
+        self._shards = shards
+        return records
+
+    def reload(self) -> bool:
+        """Loads the questions if the file or manifest changed since the last load; returns whether a new bank was swapped in."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = self._version()
+            if version == self._index.version:
+                return False
+            if version == (None, None):
+                if not self._index.questions:
+                    print(f"WARNING: questions.json not found at {self.path}. Aptitude questions will not be available.")
+                    self._index = QuestionIndex([], version)
+                return False
+            try:
+                records = self._read_records()
+            except (OSError, ValueError, KeyError, TypeError):
+                print(f"ERROR: Could not decode questions.json at {self.path} or its shards. Check file format.")
+                return False
+            questions, skipped = parse_questions(records)
+            if skipped:
+                print(f"WARNING: skipped {skipped} malformed or duplicate questions in {self.path} and its shards.")
+            self._index = QuestionIndex(questions, version)
+            self.reloads += 1
+            return True
+
+    def _current(self) -> QuestionIndex:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+        return self._index
+
+    def index(self) -> QuestionIndex:
+        """The current snapshot; reloads replace it rather than change it, so callers can hold on to it."""
+        return self._current()
+
+    def __len__(self) -> int:
+        return len(self._current().questions)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def get(self, question_id: int) -> Optional[BankQuestion]:
+        return self._current().by_id.get(question_id)
+
+    def all(self) -> List[BankQuestion]:
+        return self._current().questions
+
+    def filter(self, topic: Optional[str] = None, company: Optional[str] = None, difficulty: Optional[str] = None) -> List[BankQuestion]:
+        """
+        Questions matching every given field. Single-field filters return the index bucket itself; combinations
+        are intersected from the smallest bucket once and memoized, so repeated filters return the same list.
+        """
+        index = self._current()
+        criteria = [(field, _index_key(value)) for field, value in (("topic", topic), ("company", company), ("difficulty", difficulty)) if value]
+        if not criteria:
+            return index.questions
+        buckets = [(field, value, index.by_field[field].get(value, [])) for field, value in criteria]
+        buckets.sort(key=lambda bucket: len(bucket[2]))
+        _, _, smallest = buckets[0]
+        if len(buckets) == 1:
+            return smallest
+        key = tuple(sorted(criteria))
+        matched = index.filtered.get(key)
+        if matched is None:
+            matched = index.filtered[key] = [q for q in smallest if all(getattr(q, field) == value for field, value, _ in buckets[1:])]
+        return matched
+
+    def random(self, topic: Optional[str] = None, company: Optional[str] = None, difficulty: Optional[str] = None) -> Optional[BankQuestion]:
+        questions = self.filter(topic, company, difficulty)
+        return random.choice(questions) if questions else None
+
+    def values(self, field: str) -> List[str]:
+        """The distinct values of an indexed field, e.g. the available topics."""
+        return sorted(self._current().by_field[field])
+
+    def stats(self) -> dict:
+        index = self._current()
+        return {
+            "questions": len(index.questions),
+            "shards": len(self._shards),
+            "reloads": self.reloads,
+            **{f"{field}_values": len(index.by_field[field]) for field in INDEXED_FIELDS},
+        }
+
+
+# Shared by the Gradio and FastAPI front ends
+question_bank = QuestionBank()
@@ -0,0 +1,161 @@
+import os
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from question_bank import BankQuestion, QuestionBank, question_bank
+from progress_tracker import ProgressTracker
+from adaptive_difficulty import AdaptiveDifficultyEngine
+
+# "answered" never repeats a question the user has answered; "correct" only retires correctly answered ones
+QUESTION_SAMPLER_EXCLUDE = os.getenv("QUESTION_SAMPLER_EXCLUDE", "answered")
+QUESTION_SAMPLER_MAX_USERS = int(os.getenv("QUESTION_SAMPLER_MAX_USERS", "5000"))
+# Pick questions at the user's level with the adaptive difficulty engine rather than uniformly from the bag
+APTITUDE_ADAPTIVE = os.getenv("APTITUDE_ADAPTIVE", "0") == "1"
+PROGRESS_DATA_DIR = os.getenv("PROGRESS_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+
+class ShuffleBag:
+    __slots__ = ("base", "items", "remaining", "swaps", "repeat")
+
+    def __init__(self, base: List[BankQuestion], items: Optional[List[BankQuestion]] = None, repeat: bool = False):
+        """
+        Lazy Fisher-Yates shuffle over `items` (by default the whole filtered `base` pool): each draw picks a
+        random position among those not yet drawn and swaps the last of them into its place. Only swapped
+        positions are stored, so creating a bag costs nothing and it holds at most one entry per draw.
+        """
+        self.base = base
+        self.items = items if items is not None else base
+        self.remaining = len(self.items)
+        self.swaps: Dict[int, int] = {} # position -> item index now stored there
+        self.repeat = repeat # Serves excluded questions too
+
+    def next(self) -> Optional[BankQuestion]:
+        if not self.remaining:
+            return None
+        i = random.randrange(self.remaining)
+        last = self.remaining - 1
+        picked = self.swaps.get(i, i)
+        self.swaps[i] = self.swaps.pop(last, last)
+        self.remaining = last
+        return self.items[picked]
+
+
+class _UserState:
+    __slots__ = ("excluded", "bags")
+
+    def __init__(self, excluded: Set[int]):
+        self.excluded = excluded
+        self.bags: Dict[Tuple, ShuffleBag] = {} # filter -> bag
+
+
+class QuestionSampler:
+    def __init__(
+        self,
+        bank: QuestionBank = question_bank,
+        tracker: Optional[ProgressTracker] = None,
+        exclude: str = QUESTION_SAMPLER_EXCLUDE,
+        max_users: int = QUESTION_SAMPLER_MAX_USERS,
+        engine: Optional[AdaptiveDifficultyEngine] = None,
+    ):
+        """
+        Per-user, non-repeating question draws. Each user gets one shuffle bag per filter (topic, company,
+        difficulty); a draw skips questions in the user's excluded set, which is seeded from the `answers` map of
+        the ProgressTracker on first use and kept current by record(). Skipped questions leave the bag, so draws
+        are O(1) amortized whatever the bank size. An exhausted bag is refilled lazily on the next draw with the
+        questions still open, compacted from its own list so a nearly finished user's cycles stay short; once
+        every matching question is excluded the user starts a cycle repeating all of them instead of running dry.
+        Bags follow the bank: a reload gives every user fresh bags over the new questions.
+        At most `max_users` users are held in memory, least recently drawing users first out.
+        With an adaptive `engine`, draws pick among the open questions nearest the user's level instead (falling
+        back to the bag once none are open) and recorded answers also update the engine's estimates.
+        draw() and record() read and write the ProgressTracker's files; async callers run them with asyncio.to_thread.
+        """
+        self.bank = bank
+        self.tracker = tracker if tracker is not None else ProgressTracker(PROGRESS_DATA_DIR)
+        self.exclude_correct_only = exclude == "correct"
+        self.max_users = max_users
+        self.engine = engine
+        self._users: "OrderedDict[str, _UserState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._record_lock = threading.Lock() # The tracker rewrites a user's whole file on every answer
+
+    def _answers(self, user_id: str) -> dict:
+        return self.tracker.load_progress(user_id).get("answers", {})
+
+    def _user(self, user_id: str, answers: Optional[dict] = None) -> _UserState:
+        state = self._users.get(user_id)
+        if state is None:
+            if answers is None:
+                answers = self._answers(user_id)
+            excluded = {
+                int(question_id) for question_id, answer in answers.items()
+                if not self.exclude_correct_only or answer.get("correct")
+            }
+            state = self._users[user_id] = _UserState(excluded)
+            if self.engine is not None and not self.engine.knows(user_id):
+                self.engine.seed_user(user_id, answers)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return state
+
+    def draw(
+        self,
+        user_id: str,
+        topic: Optional[str] = None,
+        company: Optional[str] = None,
+        difficulty: Optional[str] = None,
+    ) -> Optional[BankQuestion]:
+        """The user's next question matching the filters, or None if none match."""
+        pool = self.bank.filter(topic, company, difficulty)
+        if not pool:
+            return None
+        key = (topic, company, difficulty)
+        # A new user's answers are read before taking the lock, so other users' draws don't wait on the file
+        answers = None if user_id in self._users else self._answers(user_id)
+        with self._lock:
+            state = self._user(user_id, answers)
+            if self.engine is not None:
+                question = self.engine.select(user_id, pool, state.excluded)
+                if question is not None:
+                    return question
+            bag = state.bags.get(key)
+            if bag is None or bag.base is not pool:
+                bag = state.bags[key] = ShuffleBag(pool)
+            while True:
+                question = bag.next()
+                while question is not None and not bag.repeat and question.id in state.excluded:
+                    question = bag.next()
+                if question is not None:
+                    return question
+                # Refill with the questions still open, compacted from this bag's (usually much shorter) list.
+                # If none are left the user has done them all: start a cycle that repeats the whole pool.
+                items = [q for q in bag.items if q.id not in state.excluded]
+                bag = state.bags[key] = ShuffleBag(pool, items) if items else ShuffleBag(pool, repeat=True)
+
+    def record(self, user_id: str, question_id: int, is_correct: bool):
+        """Records an answer in the ProgressTracker and retires the question from the user's future draws."""
+        with self._record_lock:
+            self.tracker.record_answer(user_id, question_id, is_correct)
+        if self.engine is not None:
+            self.engine.record(user_id, question_id, is_correct)
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is not None:
+                if is_correct or not self.exclude_correct_only:
+                    state.excluded.add(question_id)
+                else:
+                    state.excluded.discard(question_id)
+
+    def stats(self) -> dict:
+        stats = {"users": len(self._users), "max_users": self.max_users, "exclude": "correct" if self.exclude_correct_only else "answered"}
+        if self.engine is not None:
+            stats["adaptive"] = self.engine.stats()
+        return stats
+
+
+# Shared by the Gradio and FastAPI front ends
+adaptive_engine = AdaptiveDifficultyEngine() if APTITUDE_ADAPTIVE else None
+question_sampler = QuestionSampler(engine=adaptive_engine)
@@ -0,0 +1,273 @@
+import os
+import re
+import time
+import zlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from question_bank import BankQuestion, QuestionBank, QuestionIndex, question_bank
+
+QUESTION_INDEX_PATH = os.getenv("QUESTION_INDEX_PATH", os.path.splitext(question_bank.path)[0] + ".index.npz")
+QUESTION_INDEX_DIM_BITS = int(os.getenv("QUESTION_INDEX_DIM_BITS", "20")) # 2^20 hashed features
+# Rows added since the inverted index was built are scored by a direct scan until there are this many
+QUESTION_INDEX_TAIL_ROWS = int(os.getenv("QUESTION_INDEX_TAIL_ROWS", "2048"))
+QUESTION_INDEX_QUERY_TERMS = int(os.getenv("QUESTION_INDEX_QUERY_TERMS", "32")) # Strongest query features scored
+QUESTION_INDEX_MAX_DF = float(os.getenv("QUESTION_INDEX_MAX_DF", "0.2")) # Query features in more questions are skipped
+
+_TOKEN_RE = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has he her his if in is it its of on or she that the their then there "
+    "they this to was were what which who will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words (plural 's' stripped) and numbers without stopwords, plus adjacent-word bigrams."""
+    words = [
+        w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+        for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS
+    ]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def question_text(question: BankQuestion) -> str:
+    return "\n".join([question.question, *question.options, question.explanation or ""])
+
+
+def _hash_features(text: str, mask: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted hashed feature ids and their sublinear term frequencies (1 + log tf)."""
+    tokens = tokenize(text)
+    if not tokens:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    hashed = np.fromiter((zlib.crc32(t.encode("utf-8")) & mask for t in tokens), dtype=np.int64, count=len(tokens))
+    features, counts = np.unique(hashed, return_counts=True)
+    return features.astype(np.int32), (1.0 + np.log(counts)).astype(np.float32)
+
+
+class QuestionSearchIndex:
+    def __init__(self, bank: QuestionBank = question_bank, path: str = QUESTION_INDEX_PATH, dim_bits: int = QUESTION_INDEX_DIM_BITS):
+        """
+        CPU-only similarity search over each question's text, options and explanation.
+        Questions are hashed into word and bigram features and kept as a CSR matrix of sublinear term
+        frequencies (NumPy arrays), weighted by IDF at query time and cosine-normalized. Queries walk an inverted
+        (feature -> rows) copy of the matrix, so they touch only rows sharing a term with the query.
+        The index follows the bank incrementally: new or edited questions are appended as rows (scanned directly
+        until the inverted copy is rebuilt) and removed ones are masked out. It is persisted next to the question
+        file and reused at startup for every question whose content is unchanged.
+        """
+        self.bank = bank
+        self.path = path
+        self.dim = 1 << dim_bits
+        self.mask = self.dim - 1
+        self._lock = threading.Lock()
+        self._index: Optional[QuestionIndex] = None
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.row_ids = np.zeros(0, dtype=np.int64) # Question id of each row
+        self.row_hashes = np.zeros(0, dtype=np.int64) # Content hash of each row
+        self.alive = np.zeros(0, dtype=bool)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.data = np.zeros(0, dtype=np.float32)
+        self.df = np.zeros(self.dim, dtype=np.int32)
+        self._row_of: Dict[int, int] = {}
+        self._inverted: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None # (feature ptr, rows, tf)
+        self._inverted_rows = 0
+        self._idf: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._dirty = False
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            saved = np.load(self.path)
+            if int(saved["dim"]) != self.dim:
+                return # Built with another feature size; rebuild from scratch
+            self.row_ids, self.row_hashes, self.alive = saved["row_ids"], saved["row_hashes"], saved["alive"]
+            self.indptr, self.indices, self.data = saved["indptr"], saved["indices"], saved["data"]
+            self.df = np.bincount(self.indices[np.repeat(self.alive, np.diff(self.indptr))], minlength=self.dim).astype(np.int32)
+            self._row_of = {int(qid): row for row, qid in enumerate(self.row_ids.tolist()) if self.alive[row]}
+        except (OSError, KeyError, ValueError) as e:
+            print(f"WARNING: could not load question search index from {self.path}: {e}")
+            self._reset()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(
+            tmp_path, dim=self.dim, row_ids=self.row_ids, row_hashes=self.row_hashes, alive=self.alive,
+            indptr=self.indptr, indices=self.indices, data=self.data,
+        )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _append(self, questions: List[BankQuestion], hashes: List[int]):
+        rows = [_hash_features(question_text(q), self.mask) for q in questions]
+        start = len(self.row_ids)
+        lengths = np.array([len(features) for features, _ in rows], dtype=np.int64)
+        self.indptr = np.concatenate([self.indptr, self.indptr[-1] + np.cumsum(lengths)])
+        self.indices = np.concatenate([self.indices, *[features for features, _ in rows]])
+        self.data = np.concatenate([self.data, *[tf for _, tf in rows]])
+        self.row_ids = np.concatenate([self.row_ids, np.array([q.id for q in questions], dtype=np.int64)])
+        self.row_hashes = np.concatenate([self.row_hashes, np.array(hashes, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.ones(len(questions), dtype=bool)])
+        np.add.at(self.df, self.indices[self.indptr[start]:], 1)
+        for offset, question in enumerate(questions):
+            self._row_of[question.id] = start + offset
+
+    def _remove(self, row: int):
+        self.alive[row] = False
+        np.subtract.at(self.df, self.indices[self.indptr[row]:self.indptr[row + 1]], 1)
+
+    def _compact(self):
+        """Drops removed rows and rebuilds the inverted copy; O(nnz log nnz), so done only when the tail grows."""
+        if not self.alive.all():
+            keep = np.flatnonzero(self.alive)
+            lengths = np.diff(self.indptr)[keep]
+            entries = np.repeat(self.alive, np.diff(self.indptr))
+            self.indices, self.data = self.indices[entries], self.data[entries]
+            self.indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            self.row_ids, self.row_hashes = self.row_ids[keep], self.row_hashes[keep]
+            self.alive = np.ones(len(keep), dtype=bool)
+            self._row_of = {int(qid): row for row, qid in enumerate(self.row_ids.tolist())}
+        rows = np.repeat(np.arange(len(self.row_ids), dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        feature_ptr = np.concatenate([[0], np.cumsum(np.bincount(self.indices, minlength=self.dim))]).astype(np.int64)
+        self._inverted = (feature_ptr, rows[order], self.data[order])
+        self._inverted_rows = len(self.row_ids)
+
+    def _sync(self):
+        """Brings the rows in line with the bank's current questions (no-op until the bank reloads)."""
+        index = self.bank.index()
+        if index is self._index:
+            return
+        added, hashes = [], []
+        current = set()
+        for question in index.questions:
+            current.add(question.id)
+            content_hash = zlib.crc32(question_text(question).encode("utf-8"))
+            row = self._row_of.get(question.id)
+            if row is not None and self.row_hashes[row] == content_hash:
+                continue
+            if row is not None:
+                self._remove(row) # Edited: re-index it as a new row
+            added.append(question)
+            hashes.append(content_hash)
+        removed = [qid for qid in self._row_of if qid not in current]
+        for question_id in removed:
+            self._remove(self._row_of.pop(question_id))
+        if added:
+            self._append(added, hashes)
+        self._dirty = self._dirty or bool(added or removed)
+        self._index = index
+        self._norms = None
+        if self._inverted is None or len(self.row_ids) - self._inverted_rows > QUESTION_INDEX_TAIL_ROWS:
+            self._compact()
+        if self._dirty:
+            self._save()
+
+    def _weights(self) -> Tuple[np.ndarray, np.ndarray]:
+        """IDF per feature and the rows' tf-idf norms; recomputed only after the rows change."""
+        if self._norms is None:
+            n = max(1, int(self.alive.sum()))
+            self._idf = np.log((1.0 + n) / (1.0 + self.df)).astype(np.float32) + 1.0
+            rows = np.repeat(np.arange(len(self.row_ids)), np.diff(self.indptr))
+            weighted = self.data * self._idf[self.indices]
+            self._norms = np.sqrt(np.bincount(rows, weighted * weighted, minlength=len(self.row_ids))).astype(np.float32)
+        return self._idf, self._norms
+
+    def _scores(self, features: np.ndarray, tf: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, cosine scores) of the live rows sharing one of the query's strongest features."""
+        idf, norms = self._weights()
+        query = tf * idf[features]
+        query_norm = float(np.sqrt(np.dot(query, query))) or 1.0
+        # Terms in a large share of the questions barely discriminate but have the longest posting lists
+        # (lists of up to 1000 rows are cheap to walk, so small banks keep every term)
+        df = self.df[features]
+        selective = (df > 0) & (df <= max(QUESTION_INDEX_MAX_DF * len(self._row_of), 1000))
+        if selective.any():
+            features, query = features[selective], query[selective]
+        if len(features) > QUESTION_INDEX_QUERY_TERMS:
+            strongest = np.sort(np.argpartition(-query, QUESTION_INDEX_QUERY_TERMS)[:QUESTION_INDEX_QUERY_TERMS])
+            features, query = features[strongest], query[strongest]
+        weights = query * idf[features] # Query tf-idf times the rows' idf; rows hold raw tf
+        n_rows = len(self.row_ids)
+        feature_ptr, inv_rows, inv_tf = self._inverted
+        starts, ends = feature_ptr[features], feature_ptr[features + 1]
+        lengths = ends - starts
+        spans = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths) + np.arange(lengths.sum())
+        scores = np.bincount(inv_rows[spans], inv_tf[spans] * np.repeat(weights, lengths), minlength=n_rows)
+        if self._inverted_rows < n_rows:
+            # Rows appended since the inverted copy was built
+            lo = self.indptr[self._inverted_rows]
+            tail_features = self.indices[lo:]
+            tail_rows = np.repeat(np.arange(self._inverted_rows, n_rows), np.diff(self.indptr[self._inverted_rows:]))
+            position = np.minimum(np.searchsorted(features, tail_features), max(0, len(features) - 1))
+            match = features[position] == tail_features if len(features) else np.zeros(len(tail_features), dtype=bool)
+            scores += np.bincount(tail_rows[match], self.data[lo:][match] * weights[position[match]], minlength=n_rows)
+        rows = np.flatnonzero((scores > 0) & self.alive)
+        return rows, scores[rows] / (norms[rows] * query_norm + 1e-9)
+
+    def _top(self, rows: np.ndarray, scores: np.ndarray, k: int, exclude: Optional[int] = None, topic: Optional[str] = None) -> List[Tuple[BankQuestion, float]]:
+        if exclude is not None:
+            keep = self.row_ids[rows] != exclude
+            rows, scores = rows[keep], scores[keep]
+        if topic:
+            topic = topic.strip().lower()
+            keep = np.array([self._index.by_id[int(qid)].topic == topic for qid in self.row_ids[rows].tolist()], dtype=bool)
+            rows, scores = rows[keep], scores[keep]
+        if len(rows) > k:
+            best = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(self._index.by_id[int(self.row_ids[rows[i]])], float(scores[i])) for i in order]
+
+    def search(self, text: str, k: int = 10, topic: Optional[str] = None) -> List[Tuple[BankQuestion, float]]:
+        """The `k` questions most similar to free text (e.g. a concept or topic name), best first."""
+        features, tf = _hash_features(text, self.mask)
+        with self._lock:
+            self._sync()
+            rows, scores = self._scores(features, tf)
+            return self._top(rows, scores, k, topic=topic)
+
+    def similar(self, question_id: int, k: int = 5) -> Optional[List[Tuple[BankQuestion, float]]]:
+        """The `k` questions most like a given one, or None if it is not in the bank."""
+        with self._lock:
+            self._sync()
+            row = self._row_of.get(question_id)
+            if row is None:
+                return None
+            lo, hi = self.indptr[row], self.indptr[row + 1]
+            rows, scores = self._scores(self.indices[lo:hi], self.data[lo:hi])
+            return self._top(rows, scores, k, exclude=question_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._sync()
+            return {
+                "questions": len(self._row_of),
+                "rows": len(self.row_ids),
+                "nonzeros": int(len(self.indices)),
+                "tail_rows": len(self.row_ids) - self._inverted_rows,
+                "dim": self.dim,
+            }
+
+
+# Shared by the Gradio and FastAPI front ends; built (or loaded) on first use
+_question_search: Optional[QuestionSearchIndex] = None
+
+
+def get_question_search() -> QuestionSearchIndex:
+    global _question_search
+    if _question_search is None:
+        _question_search = QuestionSearchIndex()
+    return _question_search
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+
+from sample_window import SampleWindow
+
+# Per call type: (default max_tokens, floor, ceiling, max_sentences, soft_token_limit).
+# Floor and ceiling bound the budget for reply content; reasoning models also think before replying, so the
+# observed reasoning length is budgeted separately and added on top (see max_tokens()).
+# max_sentences / soft_token_limit stop generation early at a sentence boundary (None disables them). Interviewer
+# turns have no soft limit: their question comes last, so cutting at a length would drop it.
+DEFAULT_RESPONSE_BUDGETS: Dict[str, Tuple[int, int, int, Optional[int], Optional[int]]] = {
+    "opening": (1024, 256, 2048, None, None),
+    "follow_up": (1024, 256, 2048, None, None),
+    "done_check": (5, 5, 5, None, None),
+    "explanation": (1500, 512, 2048, None, None),
+    "summary_partial": (768, 256, 1536, None, None),
+    "summary": (2048, 512, 4096, None, None),
+}
+# Optional JSON override, e.g. RESPONSE_BUDGETS='{"follow_up": [768, 256, 1536, 4, 120]}'
+RESPONSE_BUDGETS_OVERRIDE = os.getenv("RESPONSE_BUDGETS")
+RESPONSE_BUDGET_HEADROOM = float(os.getenv("RESPONSE_BUDGET_HEADROOM", "1.25"))
+RESPONSE_BUDGET_MIN_SAMPLES = int(os.getenv("RESPONSE_BUDGET_MIN_SAMPLES", "30"))
+# What to do with reasoning_content deltas: "drop", "log" (kept out of the reply, written to REASONING_LOG_PATH) or "include"
+REASONING_MODE = os.getenv("REASONING_MODE", "drop")
+REASONING_LOG_PATH = os.getenv("REASONING_LOG_PATH")
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s)")
+
+
+class SentenceLimiter:
+    def __init__(self, max_sentences: Optional[int] = None, soft_token_limit: Optional[int] = None):
+        """
+        Watches streamed text and signals where to stop: after `max_sentences` complete sentences, or at the
+        first sentence boundary once `soft_token_limit` content tokens (chunks) have been produced.
+        """
+        self.max_sentences = max_sentences
+        self.soft_token_limit = soft_token_limit
+        self.sentences = 0
+        self.tokens = 0
+        self._pending = "" # Text since the last sentence boundary, held back until the boundary is confirmed
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_sentences is not None or self.soft_token_limit is not None
+
+    def feed(self, delta: str) -> Tuple[str, bool]:
+        """Returns (text to emit, stop). Text after the stopping boundary is dropped."""
+        if not self.enabled:
+            return delta, False
+        self.tokens += 1
+        text = self._pending + delta
+        emitted = 0
+        for match in _SENTENCE_END.finditer(text):
+            self.sentences += 1
+            emitted = match.end()
+            if (self.max_sentences is not None and self.sentences >= self.max_sentences) or \
+                    (self.soft_token_limit is not None and self.tokens >= self.soft_token_limit):
+                self._pending = ""
+                return text[:emitted], True
+        self._pending = text[emitted:]
+        return text[:emitted], False
+
+    def flush(self) -> str:
+        """Returns any text held back when the stream ends naturally."""
+        pending, self._pending = self._pending, ""
+        return pending
+
+
+class ResponseBudgetController:
+    def __init__(self, budgets: Optional[Dict[str, tuple]] = None, reasoning_mode: str = REASONING_MODE):
+        """
+        Chooses max_tokens per call type from observed completion lengths and decides what happens to reasoning
+        tokens. Content and reasoning lengths are tracked apart: the content budget is p95 x headroom clamped to
+        the configured floor and ceiling, and the reasoning budget (p95 x headroom, at most the ceiling) is added
+        to it, so a model that thinks at length does not eat into the reply.
+        """
+        self.budgets = dict(DEFAULT_RESPONSE_BUDGETS)
+        if RESPONSE_BUDGETS_OVERRIDE:
+            self.budgets.update({k: tuple(v) for k, v in json.loads(RESPONSE_BUDGETS_OVERRIDE).items()})
+        if budgets:
+            self.budgets.update(budgets)
+        self.reasoning_mode = reasoning_mode
+        self._lengths: Dict[str, SampleWindow] = {call_type: SampleWindow(window=500) for call_type in self.budgets}
+        self._reasoning_lengths: Dict[str, SampleWindow] = {call_type: SampleWindow(window=500) for call_type in self.budgets}
+        self._length_cutoffs: Dict[str, int] = {call_type: 0 for call_type in self.budgets}
+        self._reasoning_tokens: Dict[str, int] = {call_type: 0 for call_type in self.budgets}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock() # Keeps concurrent reasoning log lines from interleaving
+
+    def _budget(self, call_type: str) -> tuple:
+        return self.budgets.get(call_type, self.budgets["follow_up"])
+
+    def max_tokens(self, call_type: str) -> int:
+        default, floor, ceiling, _, _ = self._budget(call_type)
+        lengths = self._lengths.get(call_type)
+        if lengths is None or len(lengths) < RESPONSE_BUDGET_MIN_SAMPLES:
+            return default
+        content = min(ceiling, max(floor, lengths.percentile(0.95) * RESPONSE_BUDGET_HEADROOM))
+        reasoning = min(ceiling, self._reasoning_lengths[call_type].percentile(0.95) * RESPONSE_BUDGET_HEADROOM)
+        return int(content + reasoning)
+
+    def limiter(self, call_type: str) -> SentenceLimiter:
+        _, _, _, max_sentences, soft_token_limit = self._budget(call_type)
+        return SentenceLimiter(max_sentences, soft_token_limit)
+
+    def observe(self, call_type: str, completion_tokens: int, hit_length_limit: bool = False, reasoning: str = "", reasoning_tokens: int = 0):
+        """
+        Records how many content tokens and how many reasoning tokens a completion used. Replies cut off by
+        max_tokens are recorded at twice their lengths, so a budget that is too tight grows back quickly. In "log"
+        mode the completion's reasoning text is appended to REASONING_LOG_PATH, in a worker thread when called
+        from the event loop.
+        """
+        if call_type in self._lengths:
+            with self._lock:
+                if hit_length_limit:
+                    self._length_cutoffs[call_type] += 1
+                    completion_tokens *= 2
+                    reasoning_tokens *= 2
+                self._lengths[call_type].observe(completion_tokens)
+                self._reasoning_lengths[call_type].observe(reasoning_tokens)
+        if reasoning and self.reasoning_mode == "log" and REASONING_LOG_PATH:
+            line = json.dumps({"call_type": call_type, "reasoning": reasoning}) + "\n"
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self._log_reasoning, line)
+            except RuntimeError: # Not on the event loop
+                self._log_reasoning(line)
+
+    def _log_reasoning(self, line: str):
+        try:
+            with self._log_lock, open(REASONING_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Warning: could not log reasoning tokens: {e}")
+
+    def handle_reasoning(self, call_type: str, reasoning: str) -> Optional[str]:
+        """Counts a reasoning delta and returns it only when it should appear in the reply ("include" mode)."""
+        with self._lock:
+            if call_type in self._reasoning_tokens:
+                self._reasoning_tokens[call_type] += 1
+        return reasoning if self.reasoning_mode == "include" else None
+
+    def stats(self) -> dict:
+        return {
+            call_type: {
+                "max_tokens": self.max_tokens(call_type),
+                "observed": len(self._lengths[call_type]),
+                "p95_tokens": self._lengths[call_type].percentile(0.95),
+                "p95_reasoning_tokens": self._reasoning_lengths[call_type].percentile(0.95),
+                "length_cutoffs": self._length_cutoffs[call_type],
+                "reasoning_tokens": self._reasoning_tokens[call_type],
+            }
+            for call_type in self.budgets
+        }
+
+
+# Shared controller so every session contributes to the observed length distributions
+response_budget = ResponseBudgetController()
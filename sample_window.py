@@ -0,0 +1,20 @@
+from collections import deque
+from typing import Optional
+
+
+class SampleWindow:
+    def __init__(self, window: int = 200):
+        """Rolling window of the most recent `window` observations of some quantity, summarized by percentiles."""
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.samples.append(value)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
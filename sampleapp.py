@@ -1,5 +1,6 @@
 # main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional
 import uuid
@@ -9,12 +10,24 @@ import json
 import asyncio
 import threading # For running blocking PyAudio in a separate thread
 import random
+import time
 
 # Import core logic from refactored modules - NOW USING GEMINI AND NVIDIA
 from tts_service_nvidia import NvidiaTextToSpeech # Changed to NVIDIA TTS
 from stt_service import OpenAIAudioTranscriber # Keeping OpenAI STT as NVIDIA STT integration is complex
-from interviewer_logic_gemini import InterviewLogicGemini # Changed to Gemini Interviewer Logic
-from summary_logic_gemini import InterviewSummarizerGemini # Changed to Gemini Summarizer
+from interviewer_logic_gemini import InterviewLogicNVIDIA, InterviewerUnavailableError, UPSTREAM_UNAVAILABLE_MESSAGE # NVIDIA interviewer logic on the shared async client pool
+from summary_logic_gemini import InterviewSummarizerNVIDIA, RunningEvaluator, ConceptExplainerNVIDIA # Map-reduce summarizer on the shared LLM pool
+from llm_client import close_llm_pools, get_llm_pool
+from closing_intent import closing_intent_detector
+from prompt_registry import PromptRegistry, PromptNotRegisteredError, DIFFICULTIES, Difficulty
+from opening_pool import opening_pool
+from response_budget import response_budget
+from turn_tracing import tracer
+from session_store import SessionStore, DurableSessionStore, render_session_gauges
+from session_backend import get_session_backend
+from question_bank import question_bank
+from question_sampler import question_sampler, adaptive_engine
+from question_search import get_question_search
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -26,22 +39,110 @@ app = FastAPI(
     version="0.2.0",
 )
 
-# --- Interviewer Session Store (for demonstration purposes) ---
-interview_sessions: Dict[str, InterviewLogicGemini] = {} # Changed type
+# Interviews that expire without /end are archived here (transcript, plus the running evaluation if enabled)
+EXPIRED_INTERVIEWS_PATH = os.getenv("EXPIRED_INTERVIEWS_PATH", os.path.join(os.path.dirname(__file__), "data", "expired_interviews.jsonl"))
+EXPIRED_INTERVIEW_SUMMARY = os.getenv("EXPIRED_INTERVIEW_SUMMARY", "0") == "1"
+
+# Strong references to archive tasks so they are not garbage-collected mid-flight
+_archive_tasks = set()
+
+def archive_expired_interview(session_id: str, interview_logic: InterviewLogicNVIDIA):
+    """Eviction hook for interview sessions: archives the transcript in the background instead of losing it."""
+    task = asyncio.create_task(_archive_interview(session_id, interview_logic))
+    _archive_tasks.add(task)
+    task.add_done_callback(_archive_tasks.discard)
+
+async def _archive_interview(session_id: str, interview_logic: InterviewLogicNVIDIA):
+    summary = None
+    evaluator = interview_logic.evaluator
+    if evaluator is not None:
+        if EXPIRED_INTERVIEW_SUMMARY:
+            try:
+                summary = await evaluator.finalize()
+            except Exception as e:
+                print(f"Could not summarize expired interview {session_id}: {e}")
+        else:
+            evaluator.cancel()
+    record = {"session_id": session_id, "expired_at": time.time(), "history": interview_logic.history, "summary": summary}
+
+    def append_record():
+        with open(EXPIRED_INTERVIEWS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
 
-# --- Aptitude Tutor User Sessions (for demonstration purposes) ---
-aptitude_user_sessions = {
-    "default_user": {
-        "score": {"correct": 0, "total": 0},
-        "chat_history": [] # Chat history for the Nvidia chat part
+    try:
+        await asyncio.to_thread(append_record)
+    except OSError as e:
+        print(f"Could not archive expired interview {session_id}: {e}")
+
+def encode_interview(interview_logic: InterviewLogicNVIDIA):
+    evaluator = interview_logic.evaluator
+    meta = {
+        "persona": interview_logic.persona,
+        "is_done": interview_logic.is_done_flag,
+        "criteria": evaluator.criteria if evaluator is not None else None,
+        # The running evaluation travels with the session so a restored copy resumes it instead of starting over
+        "rubric": evaluator.rubric if evaluator is not None else "",
+        "evaluated": evaluator.evaluated if evaluator is not None else 0,
     }
-}
+    return meta, interview_logic.history
+
+def decode_interview(meta: dict, history: list) -> InterviewLogicNVIDIA:
+    evaluator = None
+    if meta.get("criteria"):
+        evaluator = RunningEvaluator(meta["criteria"], summarizer)
+        evaluator.resume(meta.get("rubric", ""), meta.get("evaluated", 0), history)
+    return interviewer_logic_class.restore(meta["persona"], history, meta["is_done"], evaluator)
+
+def discard_interview(interview_logic: InterviewLogicNVIDIA):
+    """Stops the background evaluation of a hot copy that was evicted or replaced by a newer one."""
+    if interview_logic.evaluator is not None:
+        interview_logic.evaluator.cancel()
+
+def persist_evaluation(session_id: str, interview_logic: InterviewLogicNVIDIA):
+    """Stores the rubric whenever a background evaluation update lands, not only when the next turn is saved."""
+    evaluator = interview_logic.evaluator
+    if evaluator is not None:
+        evaluator.on_progress = lambda: interview_sessions.save_meta(
+            session_id, {"rubric": evaluator.rubric, "evaluated": evaluator.evaluated}
+        )
+
+# --- Interviewer Session Store ---
+# Durable in SESSION_BACKEND (shared by all workers, survives restarts) with a hot in-process copy.
+# Idle sessions expire; hot copies are evicted least recently used beyond the session count or memory cap.
+interview_sessions = DurableSessionStore(
+    "interview",
+    SessionStore(
+        max_sessions=int(os.getenv("INTERVIEW_MAX_SESSIONS", "500")),
+        idle_timeout=float(os.getenv("INTERVIEW_SESSION_IDLE_TIMEOUT_S", "3600")),
+        max_bytes=int(os.getenv("INTERVIEW_SESSIONS_MAX_BYTES", str(128 * 1024 * 1024))),
+    ),
+    encode_interview,
+    decode_interview,
+    backend=get_session_backend(),
+    on_expire=archive_expired_interview,
+    on_discard=discard_interview,
+)
+
+# --- Aptitude Tutor User Sessions ---
+# Scores live in question_sampler.tracker (one progress file per user), so an expired tutor session only loses its chat history
+aptitude_user_sessions = DurableSessionStore(
+    "aptitude",
+    SessionStore(
+        max_sessions=int(os.getenv("APTITUDE_MAX_SESSIONS", "2000")),
+        idle_timeout=float(os.getenv("APTITUDE_SESSION_IDLE_TIMEOUT_S", "3600")),
+        max_bytes=int(os.getenv("APTITUDE_SESSIONS_MAX_BYTES", str(64 * 1024 * 1024))),
+    ),
+    lambda user_session: ({}, user_session["chat_history"]),
+    lambda meta, chat_history: {"chat_history": chat_history},
+    backend=get_session_backend(),
+)
 
 # --- Pydantic Models for API Request/Response (Interviewer) ---
 # These models remain the same as they define the API contract, not the internal AI model.
 class InterviewStartRequest(BaseModel):
     persona_path: str = Field(..., description="Path to the interviewer persona file (e.g., 'personas/ethan.txt')")
-    difficulty: str = Field("medium", description="Difficulty of the interview (easy, medium, hard)")
+    difficulty: Difficulty = Field("medium", description="Difficulty of the interview (easy, medium, hard)")
+    criteria_path: Optional[str] = Field(None, description="If set, the interview is evaluated against this criteria file in the background as it goes, so /end only renders the result")
 
 class InterviewStartResponse(BaseModel):
     session_id: str
@@ -55,6 +156,7 @@ class InterviewResponse(BaseModel):
     is_interview_done: bool
 
 class ConversationTurn(BaseModel):
+    turn_id: int
     role: str
     content: str
 
@@ -62,6 +164,8 @@ class InterviewHistoryResponse(BaseModel):
     session_id: str
     history: List[ConversationTurn]
     is_done: bool
+    last_turn_id: Optional[int] = Field(None, description="Pass as `since` on the next poll to get only newer turns")
+    has_more: bool = Field(False, description="More turns are available after this page")
 
 class SummarizeRequest(BaseModel):
     criteria_path: str = Field(..., description="Path to the summary criteria file (e.g., 'guidelines/meta-sweml-response-guidelines.txt')")
@@ -76,25 +180,6 @@ class TTSRequest(BaseModel):
 class TranscribeResponse(BaseModel):
     transcription: str
 
-# --- Dummy Implementations for Aptitude Tutor external modules ---
-# These are kept for the aptitude section.
-class ConceptExplainer:
-    def explain_concept(self, topic: str) -> str:
-        return f"This is a detailed explanation of {topic}. It covers its definition, uses, and related concepts."
-
-class ProgressTracker:
-    def __init__(self):
-        self.scores = {}
-
-    def update_progress(self, user_id: str, correct_answers: int, total_questions: int):
-        if user_id not in self.scores:
-            self.scores[user_id] = {"correct": 0, "total": 0}
-        self.scores[user_id]["correct"] = correct_answers
-        self.scores[user_id]["total"] = total_questions
-
-    def get_score(self, user_id: str):
-        return self.scores.get(user_id, {"correct": 0, "total": 0})
-
 # --- NVIDIA Chat for Aptitude Tutor (Conceptual) ---
 class NvidiaChatForAptitude:
     def __init__(self):
@@ -125,6 +210,9 @@ class Question(BaseModel):
     question: str
     options: list[str]
 
+class QuestionMatch(Question):
+    score: float
+
 class Answer(BaseModel):
     question_id: int
     selected_option_index: int
@@ -135,29 +223,59 @@ class ChatMessage(BaseModel):
 class TopicRequest(BaseModel):
     topic: str
 
+class TopicBatchRequest(BaseModel):
+    topics: List[str] = Field(..., description="Topics to explain; repeated topics are explained once.")
+    max_concurrency: Optional[int] = Field(None, ge=1, le=32, description="Topics explained at once (defaults to EXPLAIN_BATCH_CONCURRENCY).")
+
 # --- Services Initialization ---
 tts_service = NvidiaTextToSpeech() # Using NVIDIA TTS
 stt_service = OpenAIAudioTranscriber() # Keeping OpenAI STT
-interviewer_logic_class = InterviewLogicGemini # Using Gemini for interviewer logic
-summarizer = InterviewSummarizerGemini() # Using Gemini for summarization
+interviewer_logic_class = InterviewLogicNVIDIA # Using NVIDIA for interviewer logic
+summarizer = InterviewSummarizerNVIDIA() # Chunked map-reduce evaluation of the transcript
+prompt_registry = PromptRegistry() # Persona and guideline files, loaded once
 
 # Aptitude Tutor specific services
-concept_explainer_instance = ConceptExplainer()
-progress_tracker_instance = ProgressTracker()
+concept_explainer_instance = ConceptExplainerNVIDIA() # Shares the async LLM client pool
 nvidia_chat_instance = NvidiaChatForAptitude() # Using NVIDIA Chat for aptitude
 
-# --- Load Aptitude Questions ---
-QUESTIONS_FILE_PATH = os.path.join(os.path.dirname(__file__), "data", "questions.json")
-questions_data = []
-try:
-    with open(QUESTIONS_FILE_PATH, encoding="utf-8") as f:
-        questions_data = json.load(f)
-except FileNotFoundError:
-    print(f"WARNING: questions.json not found at {QUESTIONS_FILE_PATH}. Aptitude questions will not be available.")
-    questions_data = []
-except json.JSONDecodeError:
-    print(f"ERROR: Could not decode questions.json at {QUESTIONS_FILE_PATH}. Check file format.")
-    questions_data = []
+async def get_aptitude_session(user_id: str) -> dict:
+    """Returns the user's tutor session, recreating it if it expired or never existed."""
+    user_session = await aptitude_user_sessions.get(user_id)
+    if user_session is None:
+        user_session = {"chat_history": []}
+        await aptitude_user_sessions.set(user_id, user_session)
+    return user_session
+
+@app.on_event("startup")
+async def prewarm_interview_openings():
+    """Keeps pre-generated opening turns ready for every registered persona and difficulty."""
+    for path in prompt_registry.paths():
+        if path.startswith("personas/"):
+            for difficulty in DIFFICULTIES:
+                opening_pool.register(prompt_registry.get_persona(path, difficulty).full_persona)
+    opening_pool.start()
+
+# Background tasks started at startup and cancelled at shutdown
+_session_sweepers = []
+
+@app.on_event("startup")
+async def start_session_sweepers():
+    """Expires idle interview and tutor sessions even when no new session is being created."""
+    for store in (interview_sessions, aptitude_user_sessions):
+        _session_sweepers.append(asyncio.create_task(store.run_sweeper()))
+    if adaptive_engine is not None:
+        adaptive_engine.start_saver() # Saves the online difficulty and ability updates periodically
+
+@app.on_event("shutdown")
+async def shutdown_llm_clients():
+    """Stops background pre-generation and releases the pooled keep-alive connections to the LLM API."""
+    for task in _session_sweepers:
+        task.cancel()
+    await opening_pool.stop()
+    await close_llm_pools()
+    if adaptive_engine is not None:
+        await adaptive_engine.stop_saver()
+        await asyncio.to_thread(adaptive_engine.save) # Keeps the latest online updates across restarts
 
 
 # --- General Root Endpoint ---
@@ -166,6 +284,43 @@ async def read_root():
     return {"message": "Welcome to the AI Assistant Backend (Gemini & NVIDIA)! Check /docs for available APIs."}
 
 
+@app.get("/prompts")
+async def list_prompts():
+    """Lists the registered persona/guideline files with their token counts."""
+    return [{"path": path, "tokens": prompt_registry.get_tokens(path)} for path in prompt_registry.paths()]
+
+
+@app.get("/llm/stats")
+async def get_llm_transport_stats():
+    """Transport counters (circuit breaker, retries, hedges, timeouts) and scheduler lane depths and wait times."""
+    pool = get_llm_pool()
+    return {
+        "transport": pool.transport.stats(),
+        "scheduler": pool.scheduler.stats(),
+        "opening_pool": opening_pool.stats(),
+        "response_budgets": response_budget.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage turn latency and per-lane LLM histograms (TTFT, tokens/sec, tokens, queue wait) in the Prometheus text format."""
+    metrics = tracer.render_prometheus() + render_session_gauges({"interview": interview_sessions.cache, "aptitude": aptitude_user_sessions.cache})
+    return PlainTextResponse(metrics, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/sessions/stats")
+async def get_session_stats():
+    """Live (hot) sessions, bytes held, eviction counters and backend reloads for the interview and tutor session stores."""
+    return {"interview": interview_sessions.stats(), "aptitude": aptitude_user_sessions.stats()}
+
+
+@app.get("/metrics/turns")
+async def get_recent_turn_traces(limit: int = 10):
+    """The most recent interview turns with their spans, plus p50/p95 per stage."""
+    return {"stages": tracer.stage_summary(), "turns": tracer.recent(limit)}
+
+
 # --- INTERVIEWER Endpoints (using Gemini) ---
 @app.post("/interview/start", response_model=InterviewStartResponse)
 async def start_interview(request: InterviewStartRequest):
@@ -173,16 +328,14 @@ async def start_interview(request: InterviewStartRequest):
     Starts a new interview session using Gemini AI.
     """
     session_id = str(uuid.uuid4())
-    
-    full_persona_file_path = os.path.join(os.path.dirname(__file__), request.persona_path)
 
     try:
-        with open(full_persona_file_path, 'r') as f:
-            persona = f.read()
+        # Preloaded and pre-assembled at startup; no disk I/O on this path
+        persona_prompt = prompt_registry.get_persona(request.persona_path, request.difficulty)
         
-        full_persona = f"{persona}\nBegin the interview. You are the interviewer and I am the interviewee. Please be very concise as the interviewer in your answers but do not skip the formalities. Use this opportunity to pick up on interviewee social cues. Keep in mind time is limited and make this interview {request.difficulty}"
-        
-        interview_logic = interviewer_logic_class(full_persona) # Use Gemini Logic
+        interview_logic = interviewer_logic_class(persona_prompt.full_persona) # Use NVIDIA Logic
+        if request.criteria_path:
+            interview_logic.evaluator = RunningEvaluator(prompt_registry.get_text(request.criteria_path), summarizer)
         
         # The first message from the AI is generated by its initial setup, as handled in InterviewLogicGemini's __init__
         # and first call to get_interviewer_response.
@@ -191,15 +344,22 @@ async def start_interview(request: InterviewStartRequest):
         
         # Call with an empty string or a generic start signal if `get_interviewer_response`
         # handles the initial AI-driven greeting logic.
-        first_interviewer_message = await interview_logic.get_interviewer_response("") 
+        # A pre-generated opening from the warm pool makes this instant; otherwise generate it live.
+        first_interviewer_message = opening_pool.take(persona_prompt.full_persona)
+        if first_interviewer_message is not None:
+            interview_logic.seed_opening(first_interviewer_message)
+        else:
+            first_interviewer_message = await interview_logic.get_interviewer_response("") 
         
-        interview_sessions[session_id] = interview_logic
+        await interview_sessions.set(session_id, interview_logic)
         return InterviewStartResponse(
             session_id=session_id,
             interviewer_message=first_interviewer_message
         )
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail=f"Persona file not found at {full_persona_file_path}")
+    except PromptNotRegisteredError as e:
+        raise HTTPException(status_code=404, detail=f"Prompt file not found: {e.args[0]}")
+    except InterviewerUnavailableError:
+        raise HTTPException(status_code=503, detail=UPSTREAM_UNAVAILABLE_MESSAGE)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start interview: {e}")
 
@@ -208,62 +368,145 @@ async def respond_to_interview(session_id: str, request: InterviewResponseReques
     """
     Sends the interviewee's response and gets the interviewer's next message using Gemini AI.
     """
-    interview_logic = interview_sessions.get(session_id)
+    interview_logic = await interview_sessions.get(session_id)
     if not interview_logic:
         raise HTTPException(status_code=404, detail="Interview session not found.")
     
     if interview_logic.is_done_flag:
         raise HTTPException(status_code=400, detail="Interview is already finished. Please start a new session or end this one to summarize.")
+    persist_evaluation(session_id, interview_logic)
 
+    trace = tracer.start_turn("respond", session_id)
     try:
-        interviewer_message = await interview_logic.get_interviewer_response(request.user_text)
+        interviewer_message = await interview_logic.get_interviewer_response(request.user_text, trace=trace)
         
-        is_done = await interview_logic.check_if_done(interviewer_message)
+        is_done = await interview_logic.check_if_done(interviewer_message, trace=trace)
         interview_logic.is_done_flag = is_done
 
         return InterviewResponse(
             interviewer_message=interviewer_message,
             is_interview_done=is_done
         )
+    except InterviewerUnavailableError:
+        # The answer was not recorded; the message asks the candidate to repeat it
+        return InterviewResponse(interviewer_message=UPSTREAM_UNAVAILABLE_MESSAGE, is_interview_done=False)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get interviewer response: {e}")
+    finally:
+        await interview_sessions.save(session_id, interview_logic) # Write-through so any worker can take the next turn
+        trace.finish()
+
+@app.post("/interview/{session_id}/respond/stream")
+async def respond_to_interview_stream(session_id: str, request: InterviewResponseRequest):
+    """
+    Server-Sent-Events version of /respond: streams the interviewer's message token by token.
+    Each `delta` event carries a text fragment; a final `done` event carries the full message and the done flag.
+    """
+    interview_logic = await interview_sessions.get(session_id)
+    if not interview_logic:
+        raise HTTPException(status_code=404, detail="Interview session not found.")
+    
+    if interview_logic.is_done_flag:
+        raise HTTPException(status_code=400, detail="Interview is already finished. Please start a new session or end this one to summarize.")
+    persist_evaluation(session_id, interview_logic)
+
+    async def event_stream():
+        message_parts = []
+        trace = tracer.start_turn("respond_stream", session_id)
+        try:
+            async for delta in interview_logic.get_interviewer_response_stream(request.user_text, trace=trace):
+                message_parts.append(delta)
+                yield f"event: delta\ndata: {json.dumps({'delta': delta})}\n\n"
+
+            interviewer_message = "".join(message_parts)
+            is_done = await interview_logic.check_if_done(interviewer_message, trace=trace)
+            interview_logic.is_done_flag = is_done
+            yield f"event: done\ndata: {json.dumps({'interviewer_message': interviewer_message, 'is_interview_done': is_done})}\n\n"
+        except InterviewerUnavailableError:
+            # Nothing was streamed and the answer was not recorded; the message asks the candidate to repeat it
+            yield f"event: delta\ndata: {json.dumps({'delta': UPSTREAM_UNAVAILABLE_MESSAGE})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'interviewer_message': UPSTREAM_UNAVAILABLE_MESSAGE, 'is_interview_done': False})}\n\n"
+        except Exception as e:
+            # Headers are already sent, so surface the failure as an SSE event instead of an HTTP status
+            yield f"event: error\ndata: {json.dumps({'detail': f'Failed to get interviewer response: {e}'})}\n\n"
+        finally:
+            await interview_sessions.save(session_id, interview_logic)
+            trace.finish()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/interview/{session_id}/history", response_model=InterviewHistoryResponse)
-async def get_interview_history(session_id: str):
+async def get_interview_history(
+    session_id: str,
+    since: Optional[int] = Query(None, ge=-1, description="Only return turns with a turn_id greater than this"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Return at most this many turns (default: all)"),
+    if_none_match: Optional[str] = Header(None),
+):
     """
-    Retrieves the full conversation history for a given session.
+    Retrieves the conversation history for a given session: the whole transcript by default, or incrementally:
+    pass the previous response's `last_turn_id` as `since` to get only new turns, and `limit` to page through
+    them. Responses carry an ETag; re-polling with If-None-Match returns 304 with no body while the transcript
+    is unchanged.
     """
-    interview_logic = interview_sessions.get(session_id)
+    interview_logic = await interview_sessions.get(session_id)
     if not interview_logic:
         raise HTTPException(status_code=404, detail="Interview session not found.")
     
-    history_pydantic = [ConversationTurn(role=turn['role'], content=turn['content']) for turn in interview_logic.history]
-    return InterviewHistoryResponse(session_id=session_id, history=history_pydantic, is_done=interview_logic.is_done_flag)
+    turn_count = interview_logic.turn_log.sync(interview_logic.history)
+    is_done = interview_logic.is_done_flag
+    etag = f'"{interview_logic.turn_log.version}-{int(is_done)}-{since}-{limit}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # Each turn was serialized once when it was logged; the page is assembled from those bytes
+    turns = interview_logic.turn_log.page(since, limit)
+    last_turn_id = turns[-1].turn_id if turns else since
+    has_more = last_turn_id is not None and last_turn_id < turn_count - 1
+    body = b"".join((
+        b'{"session_id":', json.dumps(session_id).encode(),
+        b',"history":[', b",".join(turn.encoded for turn in turns),
+        b'],"is_done":', json.dumps(is_done).encode(),
+        b',"last_turn_id":', json.dumps(last_turn_id).encode(),
+        b',"has_more":', json.dumps(has_more).encode(), b"}",
+    ))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+@app.get("/interview/done_detector/stats")
+async def get_done_detector_stats():
+    """
+    Returns how often the local end-of-interview detector answered on its own and how often it agreed with the LLM.
+    """
+    return closing_intent_detector.stats()
 
 @app.post("/interview/{session_id}/end", response_model=SummaryResponse)
 async def end_interview_and_summarize(session_id: str, request: SummarizeRequest):
     """
-    Explicitly ends an interview and generates a summary using Gemini AI based on predefined criteria.
+    Explicitly ends an interview and evaluates the transcript against predefined criteria (chunked map-reduce, see InterviewSummarizerNVIDIA).
     """
-    interview_logic = interview_sessions.get(session_id)
+    interview_logic = await interview_sessions.get(session_id)
     if not interview_logic:
         raise HTTPException(status_code=404, detail="Interview session not found.")
     
-    full_criteria_file_path = os.path.join(os.path.dirname(__file__), request.criteria_path)
-
     try:
-        with open(full_criteria_file_path, 'r') as f:
-            criteria = f.read()
-
-        summary_text = await asyncio.to_thread(
-            summarizer.summarize_interview, interview_logic.history, criteria
-        )
+        criteria = prompt_registry.get_text(request.criteria_path)
+
+        summary_text = None
+        evaluator = interview_logic.evaluator
+        if evaluator is not None and evaluator.criteria == criteria:
+            # Most of the work already happened during the interview
+            summary_text = await evaluator.finalize()
+        if summary_text is None:
+            summary_text = await summarizer.summarize_interview(interview_logic.history, criteria)
         
-        del interview_sessions[session_id]
+        await interview_sessions.pop(session_id)
         
         return SummaryResponse(summary=summary_text)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail=f"Criteria file not found at {full_criteria_file_path}")
+    except PromptNotRegisteredError:
+        raise HTTPException(status_code=404, detail=f"Criteria file not found: {request.criteria_path}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to summarize interview: {e}")
 
@@ -275,7 +518,8 @@ async def text_to_speech_endpoint(request: TTSRequest):
     Converts text to speech using NVIDIA TTS and returns the audio content.
     """
     try:
-        audio_buffer = await tts_service.text_to_speech(request.text, request.voice)
+        with tracer.stage("tts"):
+            audio_buffer = await tts_service.text_to_speech(request.text, request.voice)
         return audio_buffer
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"NVIDIA Text-to-speech failed: {e}")
@@ -290,9 +534,10 @@ async def transcribe_uploaded_audio_endpoint(audio_file: UploadFile = File(...))
     
     try:
         file_content = await audio_file.read()
-        transcription_text = await stt_service.transcribe_audio_from_bytes(
-            file_content, audio_file.filename, audio_file.content_type
-        )
+        with tracer.stage("stt"):
+            transcription_text = await stt_service.transcribe_audio_from_bytes(
+                file_content, audio_file.filename, audio_file.content_type
+            )
         return TranscribeResponse(transcription=transcription_text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI Audio transcription failed: {e}")
@@ -318,60 +563,71 @@ async def transcribe_recorded_audio_endpoint():
             wf.writeframes(b''.join(frames))
         audio_buffer.seek(0)
         
-        transcription_text = await stt_service.transcribe_audio_from_bytes(
-            audio_buffer.getvalue(), "recorded_audio.wav", "audio/wav"
-        )
+        with tracer.stage("stt"):
+            transcription_text = await stt_service.transcribe_audio_from_bytes(
+                audio_buffer.getvalue(), "recorded_audio.wav", "audio/wav"
+            )
         return TranscribeResponse(transcription=transcription_text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recording or transcription failed: {e}")
 
 # --- APTITUDE TUTOR Endpoints ---
 @app.get("/aptitude/questions/random", response_model=Question)
-async def get_random_aptitude_question():
-    """Returns a random question from the aptitude dataset."""
-    if not questions_data:
+async def get_random_aptitude_question(user_id: str = "default_user", topic: Optional[str] = None):
+    """Returns a random question the user has not answered yet, optionally from one topic."""
+    question = await asyncio.to_thread(question_sampler.draw, user_id, topic=topic)
+    if question is None:
         raise HTTPException(status_code=404, detail="No aptitude questions available. Check server logs.")
     
-    question = random.choice(questions_data)
     return Question(
-        id=question["id"],
-        question=question["question"],
-        options=question["options"]
+        id=question.id,
+        question=question.question,
+        options=question.options
     )
 
+@app.get("/aptitude/questions/search", response_model=List[QuestionMatch])
+async def search_aptitude_questions(q: str, k: int = Query(10, ge=1, le=50), topic: Optional[str] = None):
+    """Questions whose text, options or explanation best match a topic or phrase, best first."""
+    matches = await asyncio.to_thread(get_question_search().search, q, k, topic)
+    return [QuestionMatch(id=m.id, question=m.question, options=m.options, score=round(score, 4)) for m, score in matches]
+
+@app.get("/aptitude/questions/{question_id}/similar", response_model=List[QuestionMatch])
+async def get_similar_aptitude_questions(question_id: int, k: int = Query(5, ge=1, le=50)):
+    """The questions most like a given one ("more like this"), best first."""
+    matches = await asyncio.to_thread(get_question_search().similar, question_id, k)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Question not found in dataset")
+    return [QuestionMatch(id=m.id, question=m.question, options=m.options, score=round(score, 4)) for m, score in matches]
+
 @app.post("/aptitude/questions/submit_answer")
 async def submit_aptitude_answer(answer: Answer, user_id: str = "default_user"):
     """Submits an answer to an aptitude question and updates the user's score."""
-    if not questions_data:
+    if not question_bank:
         raise HTTPException(status_code=404, detail="No aptitude questions loaded.")
 
-    question = next((q for q in questions_data if q["id"] == answer.question_id), None)
+    question = question_bank.get(answer.question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found in dataset")
 
-    is_correct = (answer.selected_option_index == question["correct_option_index"])
-
-    user_session = aptitude_user_sessions.get(user_id)
-    if not user_session:
-        user_session = aptitude_user_sessions[user_id] = {"score": {"correct": 0, "total": 0}, "chat_history": []}
-
-    user_session["score"]["total"] += 1
-    if is_correct:
-        user_session["score"]["correct"] += 1
-    
-    progress_tracker_instance.update_progress(user_id, user_session["score"]["correct"], user_session["score"]["total"])
+    is_correct = question.is_correct(answer.selected_option_index)
+    await asyncio.to_thread(question_sampler.record, user_id, question.id, is_correct)
 
-    return {"is_correct": is_correct, "correct_option_index": question["correct_option_index"]}
+    return {"is_correct": is_correct, "correct_option_index": question.correct_option_index}
 
 @app.get("/aptitude/progress")
 async def get_aptitude_user_progress(user_id: str = "default_user"):
-    """Returns the current progress (score) for a user in the aptitude section."""
-    user_session = aptitude_user_sessions.get(user_id)
-    if not user_session:
+    """
+    Returns the current progress (score) for a user in the aptitude section, from their progress file.
+    `total` counts distinct questions attempted and `correct` those answered correctly at least once, across
+    all sessions: retrying a question does not raise `total`, and a correct retry of a missed question raises
+    `correct`. (Scores used to count every submission in the current session only.)
+    """
+    score = await asyncio.to_thread(question_sampler.tracker.get_score, user_id)
+    if not score["total"]:
         return {"correct": 0, "total": 0, "accuracy": 0.0, "message": "Start practicing aptitude to see your progress!"}
 
-    correct = user_session["score"]["correct"]
-    total = user_session["score"]["total"]
+    correct = score["correct"]
+    total = score["total"]
     
     accuracy = (correct / total) * 100 if total > 0 else 0.0
     
@@ -387,23 +643,48 @@ async def explain_aptitude_concept_endpoint(request: TopicRequest, user_id: str
     if not request.topic:
         raise HTTPException(status_code=400, detail="Topic cannot be empty.")
 
-    explanation = await asyncio.to_thread(concept_explainer_instance.explain_concept, request.topic)
+    explanation = await concept_explainer_instance.explain_concept(request.topic)
 
-    user_session = aptitude_user_sessions.get(user_id)
-    if not user_session:
-        user_session = aptitude_user_sessions[user_id] = {"score": {"correct": 0, "total": 0}, "chat_history": []}
+    user_session = await get_aptitude_session(user_id)
     
     user_session["chat_history"].extend([
         {"role": "user", "content": f"Explain: {request.topic}"},
         {"role": "assistant", "content": explanation}
     ])
+    await aptitude_user_sessions.save(user_id, user_session)
     
     return {"explanation": explanation}
 
+@app.post("/aptitude/explain_concept/batch")
+async def explain_aptitude_concepts_batch_endpoint(request: TopicBatchRequest):
+    """
+    Explains several topics concurrently and streams results as newline-delimited JSON, one
+    {"topic": ..., "explanation": ...} object per topic, in completion order. Used to pre-warm the explanation cache.
+    """
+    if not any(topic.strip() for topic in request.topics):
+        raise HTTPException(status_code=400, detail="At least one non-empty topic is required.")
+
+    async def result_stream():
+        async for topic, explanation in concept_explainer_instance.explain_concepts(request.topics, request.max_concurrency):
+            yield json.dumps({"topic": topic, "explanation": explanation}) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+@app.get("/aptitude/explain_concept/cache")
+async def get_explanation_cache_stats():
+    """Returns hit/miss counters and entry counts for the concept explanation cache."""
+    return await asyncio.to_thread(concept_explainer_instance.cache.stats)
+
+@app.delete("/aptitude/explain_concept/cache")
+async def invalidate_explanation_cache(topic: Optional[str] = None):
+    """Admin: drops cached explanations for one topic, or the whole cache when no topic is given."""
+    removed = await asyncio.to_thread(concept_explainer_instance.cache.invalidate, topic)
+    return {"removed": removed, "topic": topic}
+
 @app.get("/aptitude/chat_history")
 async def get_aptitude_chat_history(user_id: str = "default_user"):
     """Returns the chat history for a user in the aptitude section."""
-    user_session = aptitude_user_sessions.get(user_id)
+    user_session = await aptitude_user_sessions.get(user_id)
     if not user_session:
         return []
     return user_session["chat_history"]
@@ -414,13 +695,12 @@ async def chat_with_aptitude_ai(message: ChatMessage, user_id: str = "default_us
     if not message.message:
         raise HTTPException(status_code=400, detail="Message cannot be empty.")
 
-    user_session = aptitude_user_sessions.get(user_id)
-    if not user_session:
-        user_session = aptitude_user_sessions[user_id] = {"score": {"correct": 0, "total": 0}, "chat_history": []}
+    user_session = await get_aptitude_session(user_id)
 
     user_session["chat_history"].append({"role": "user", "content": message.message})
     
     response = await asyncio.to_thread(nvidia_chat_instance.nvidia_chat, user_session["chat_history"])
     user_session["chat_history"].append({"role": "assistant", "content": response})
+    await aptitude_user_sessions.save(user_id, user_session)
     
     return {"response": response}
\ No newline at end of file
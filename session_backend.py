@@ -0,0 +1,198 @@
+import os
+import time
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+SESSION_DB_PATH = os.getenv(
+    "SESSION_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sessions.sqlite3")
+)
+# "sqlite" shares sessions between workers and across restarts; "memory" keeps them in this process only
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+
+Turn = Dict[str, str]
+
+
+class SessionBackend(ABC):
+    """
+    Durable storage for session state, shared by every worker. A session is identified by (kind, key) and
+    consists of a small JSON `meta` object plus an append-only list of {'role', 'content'} turns.
+    """
+
+    def version(self) -> Optional[int]:
+        """
+        A number that changes whenever another process writes to the backend (not when this one does), so cached
+        heads stay valid while it is unchanged; None if the backend cannot tell, in which case heads are re-read.
+        """
+        return None
+
+    @abstractmethod
+    def head(self, kind: str, key: str) -> Optional[Tuple[str, int]]:
+        """Returns (meta JSON, turn count) without loading the turns, or None if the session does not exist."""
+
+    @abstractmethod
+    def load(self, kind: str, key: str) -> Optional[Tuple[dict, List[Turn]]]:
+        ...
+
+    @abstractmethod
+    def save(self, kind: str, key: str, meta: dict, new_turns: List[Turn], start: int):
+        """Writes `meta` and appends `new_turns` as turns number `start` onwards (start=0 rewrites all turns)."""
+
+    @abstractmethod
+    def update_meta(self, kind: str, key: str, fields: dict) -> Optional[dict]:
+        """
+        Merges `fields` into an existing session's meta without touching its turns or idle timer; returns the
+        merged meta, or None (writing nothing) if the session no longer exists.
+        """
+
+    @abstractmethod
+    def delete(self, kind: str, key: str):
+        ...
+
+    @abstractmethod
+    def pop_idle(self, kind: str, idle_seconds: float) -> List[Tuple[str, dict, List[Turn]]]:
+        """Atomically removes and returns sessions not saved for `idle_seconds`, so only one worker expires each."""
+
+    def close(self):
+        pass
+
+
+class SQLiteSessionBackend(SessionBackend):
+    def __init__(self, db_path: str = SESSION_DB_PATH):
+        """
+        SQLite session backend in WAL mode, so readers in other workers never block the writer.
+        Session headers and turns live in separate tables; turns are only ever appended (one row per turn),
+        so saving after a reply writes just the new rows.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL") # Durable across process crashes; WAL keeps it consistent
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, meta TEXT NOT NULL, turn_count INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (kind, key))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_turns ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+            "PRIMARY KEY (kind, key, seq))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (kind, updated_at)")
+
+    def version(self) -> Optional[int]:
+        # Bumped by commits from other connections only; reading it touches no table
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def head(self, kind: str, key: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT meta, turn_count FROM sessions WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    def _load(self, kind: str, key: str) -> Optional[Tuple[dict, List[Turn]]]:
+        row = self._conn.execute(
+            "SELECT meta, turn_count FROM sessions WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        if row is None:
+            return None
+        turns = [
+            {"role": role, "content": content}
+            for role, content in self._conn.execute(
+                "SELECT role, content FROM session_turns WHERE kind = ? AND key = ? AND seq < ? ORDER BY seq",
+                (kind, key, row[1]),
+            )
+        ]
+        return json.loads(row[0]), turns
+
+    def load(self, kind: str, key: str) -> Optional[Tuple[dict, List[Turn]]]:
+        with self._lock:
+            return self._load(kind, key)
+
+    def save(self, kind: str, key: str, meta: dict, new_turns: List[Turn], start: int):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if start == 0:
+                    self._conn.execute("DELETE FROM session_turns WHERE kind = ? AND key = ?", (kind, key))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO session_turns (kind, key, seq, role, content) VALUES (?, ?, ?, ?, ?)",
+                    [(kind, key, start + i, turn["role"], turn["content"]) for i, turn in enumerate(new_turns)],
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (kind, key, meta, turn_count, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (kind, key, json.dumps(meta, sort_keys=True), start + len(new_turns), time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update_meta(self, kind: str, key: str, fields: dict) -> Optional[dict]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT meta FROM sessions WHERE kind = ? AND key = ?", (kind, key)
+                ).fetchone()
+                meta = None
+                if row is not None:
+                    meta = {**json.loads(row[0]), **fields}
+                    self._conn.execute(
+                        "UPDATE sessions SET meta = ? WHERE kind = ? AND key = ?",
+                        (json.dumps(meta, sort_keys=True), kind, key),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return meta
+
+    def _delete(self, kind: str, key: str):
+        self._conn.execute("DELETE FROM session_turns WHERE kind = ? AND key = ?", (kind, key))
+        self._conn.execute("DELETE FROM sessions WHERE kind = ? AND key = ?", (kind, key))
+
+    def delete(self, kind: str, key: str):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._delete(kind, key)
+            self._conn.execute("COMMIT")
+
+    def pop_idle(self, kind: str, idle_seconds: float) -> List[Tuple[str, dict, List[Turn]]]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                keys = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM sessions WHERE kind = ? AND updated_at < ?", (kind, time.time() - idle_seconds)
+                )]
+                popped = []
+                for key in keys:
+                    meta, turns = self._load(kind, key)
+                    popped.append((key, meta, turns))
+                    self._delete(kind, key)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return popped
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_session_backend: Optional[SessionBackend] = None
+
+
+def get_session_backend() -> Optional[SessionBackend]:
+    """Returns the process-wide durable backend selected by SESSION_BACKEND, or None for in-memory sessions."""
+    global _session_backend
+    if _session_backend is None and SESSION_BACKEND == "sqlite":
+        _session_backend = SQLiteSessionBackend()
+    return _session_backend
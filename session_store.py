@@ -0,0 +1,416 @@
+import os
+import time
+import json
+import asyncio
+import itertools
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from session_backend import SessionBackend
+
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "200"))
+SESSION_IDLE_TIMEOUT_S = float(os.getenv("SESSION_IDLE_TIMEOUT_S", "1800"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))) # 0 disables the memory cap
+SESSION_SWEEP_INTERVAL_S = float(os.getenv("SESSION_SWEEP_INTERVAL_S", "60"))
+
+
+def session_history(value: Any) -> Optional[list]:
+    """
+    The conversation history a session holds: the `history` list of interviewer objects or the `chat_history`
+    list of tutor sessions (dicts).
+    """
+    history = getattr(value, "history", None)
+    if history is None and isinstance(value, dict):
+        history = value.get("chat_history")
+    return history
+
+
+class _SessionEntry:
+    __slots__ = ("value", "lock", "users", "last_used", "size", "history", "counted")
+
+    def __init__(self):
+        self.value: Any = None
+        self.size = 0 # Measured size in bytes
+        self.history: Optional[list] = None # The history list `size` was measured from
+        self.counted = 0 # Turns of `history` included in `size`
+        self.lock = asyncio.Lock()
+        self.users = 0 # Events holding or waiting for the lock
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT_S,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+        max_bytes: int = SESSION_MAX_BYTES,
+        history_of: Callable[[Any], Optional[list]] = session_history,
+    ):
+        """
+        In-process store of per-client session state (e.g. one InterviewLogicNVIDIA per browser).
+        Sessions idle for longer than `idle_timeout` seconds are dropped, and beyond `max_sessions` the least
+        recently used session is evicted, as it is while the sessions hold more than `max_bytes` (the characters in
+        the histories returned by `history_of`; 0 disables the cap). Histories are append-only, so an access only
+        adds the turns appended since the entry's cursor; a replaced or shortened history is re-measured, and
+        sweep() re-measures everything to correct for in-place edits. Expiry also happens only in sweep(), keeping
+        request-path work independent of the number and size of the other sessions.
+        Sessions with an event running or queued on their lock are never evicted. lock(key) serializes
+        concurrent events for one session; different sessions never wait on each other. `on_evict(key, value)`
+        is called for sessions dropped by eviction or expiry (to persist or summarize them), not by pop().
+        """
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self.max_bytes = max_bytes
+        self.history_of = history_of
+        self._entries: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self.bytes_held = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.evicted_memory = 0
+
+    def _touch(self, key: str) -> _SessionEntry:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _SessionEntry()
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry
+
+    def _measure(self, entry: _SessionEntry, full: bool = False):
+        """Adds the turns appended since the last measurement to the entry's size (all of them if `full`)."""
+        history = self.history_of(entry.value) if entry.value is not None else None
+        if not history:
+            size, counted = 0, 0
+        else:
+            size, counted = entry.size, entry.counted
+            if full or history is not entry.history or len(history) < counted:
+                size, counted = 0, 0
+            size += sum(len(turn.get("content") or "") for turn in history[counted:])
+            counted = len(history)
+        self.bytes_held += size - entry.size
+        entry.size, entry.history, entry.counted = size, history, counted
+
+    def _remove(self, key: str, entry: _SessionEntry):
+        del self._entries[key]
+        self.bytes_held -= entry.size
+
+    def _drop(self, key: str, entry: _SessionEntry):
+        self._remove(key, entry)
+        if entry.value is not None and self.on_evict is not None:
+            try:
+                self.on_evict(key, entry.value)
+            except Exception as e:
+                print(f"Session eviction hook failed for {key}: {e}")
+
+    def evict_expired(self) -> int:
+        """Drops sessions idle for longer than the timeout; returns how many were dropped."""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [key for key, entry in self._entries.items() if entry.last_used < cutoff and not entry.users]
+        for key in expired:
+            self._drop(key, self._entries[key])
+        self.evicted_idle += len(expired)
+        return len(expired)
+
+    def _evict_lru(self):
+        while len(self._entries) > self.max_sessions or (self.max_bytes and self.bytes_held > self.max_bytes):
+            over_count = len(self._entries) > self.max_sessions
+            # The most recently used session is the one being served; the memory cap never evicts it
+            candidates = self._entries.items() if over_count else itertools.islice(self._entries.items(), len(self._entries) - 1)
+            victim = next((key for key, entry in candidates if not entry.users), None)
+            if victim is None:
+                return # Every session is busy; allow a temporary overshoot
+            self._drop(victim, self._entries[victim])
+            if over_count:
+                self.evicted_lru += 1
+            else:
+                self.evicted_memory += 1
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.last_used > self.idle_timeout and not entry.users:
+            self._drop(key, entry)
+            self.evicted_idle += 1
+            return None
+        entry = self._touch(key)
+        self._measure(entry) # Picks up whatever the previous request appended
+        return entry.value
+
+    def set(self, key: str, value: Any):
+        entry = self._touch(key)
+        entry.value = value
+        self._measure(entry)
+        self._evict_lru()
+
+    def pop(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, entry.value = entry.value, None
+        self._measure(entry)
+        if not entry.users:
+            self._remove(key, entry)
+        return value
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        """Holds the session's lock for the duration of one event, so its events run one at a time."""
+        entry = self._touch(key)
+        entry.users += 1
+        try:
+            async with entry.lock:
+                entry.last_used = time.monotonic()
+                yield
+        finally:
+            entry.users -= 1
+        entry.last_used = time.monotonic()
+        if self._entries.get(key) is entry:
+            self._measure(entry)
+            if entry.value is None and not entry.users:
+                self._remove(key, entry) # Nothing was stored (e.g. the session was cleared); don't keep an empty slot
+            else:
+                self._evict_lru()
+
+    def sweep(self) -> int:
+        """Re-measures every session, expires idle ones and enforces the caps; returns how many expired."""
+        for entry in self._entries.values():
+            self._measure(entry, full=True)
+        expired = self.evict_expired()
+        self._evict_lru()
+        return expired
+
+    async def run_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL_S):
+        """Runs sweep() every `interval` seconds; run as a background task."""
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._entries),
+            "max_sessions": self.max_sessions,
+            "idle_timeout_s": self.idle_timeout,
+            "bytes_held": self.bytes_held,
+            "max_bytes": self.max_bytes,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "evicted_memory": self.evicted_memory,
+        }
+
+
+
+class DurableSessionStore:
+    def __init__(
+        self,
+        kind: str,
+        cache: SessionStore,
+        encode: Callable[[Any], Tuple[dict, List[dict]]],
+        decode: Callable[[dict, List[dict]], Any],
+        backend: Optional[SessionBackend] = None,
+        on_expire: Optional[Callable[[str, Any], None]] = None,
+        on_discard: Optional[Callable[[Any], None]] = None,
+    ):
+        """
+        Session store shared by every worker: `backend` holds the durable copy and `cache` (a SessionStore) the
+        hot in-process copy. `encode(value)` splits a session into (meta dict, turns) and `decode` rebuilds it.
+        - save() writes through after each change, appending only the turns added since the last save;
+          save_meta() updates only some meta fields, for progress made in the background between saves.
+        - get() serves the cached copy after a freshness check against the backend, and reloads lazily on a miss
+          or when another worker has changed the session since. The check is skipped while the backend reports
+          that no other worker has written anything since the session was last verified.
+        - Sessions not saved for the cache's idle timeout are expired by run_sweeper() in exactly one worker,
+          which passes them to `on_expire(key, value)`.
+        - `on_discard(value)` is called for hot copies dropped while the session lives on in the backend
+          (evicted from the cache or replaced by a newer copy), e.g. to stop their background work.
+        Backend calls run in worker threads so a busy database never stalls the event loop.
+        Without a backend this is a plain SessionStore whose evictions call `on_expire`.
+        """
+        self.kind = kind
+        self.cache = cache
+        self.encode = encode
+        self.decode = decode
+        self.backend = backend
+        self.on_expire = on_expire
+        self.on_discard = on_discard
+        self._saved: Dict[str, Tuple[str, int]] = {} # key -> (meta JSON, turn count) last written or read by this worker
+        self._verified: Dict[str, int] = {} # key -> backend version at which _saved was known to be current
+        self.reloads = 0
+        self.head_checks = 0
+        if backend is None:
+            cache.on_evict = on_expire
+        else:
+            # Dropping the hot copy loses nothing; the session stays in the backend
+            cache.on_evict = self._evicted
+
+    def _forget(self, key: str):
+        self._saved.pop(key, None)
+        self._verified.pop(key, None)
+
+    def _discard(self, value: Any):
+        if value is not None and self.on_discard is not None:
+            try:
+                self.on_discard(value)
+            except Exception as e:
+                print(f"Session discard hook failed: {e}")
+
+    def _evicted(self, key: str, value: Any):
+        self._forget(key)
+        self._discard(value)
+
+    def _fetch(self, key: str, known: Optional[Tuple[str, int]]):
+        """
+        Runs in a worker thread. Returns (version, head, record): the session's current head, and its full record
+        if it differs from `known`. The head query is skipped when `known` was verified at the current version.
+        """
+        version = self.backend.version()
+        if known is not None and version is not None and self._verified.get(key) == version:
+            return version, known, None
+        self.head_checks += 1
+        head = self.backend.head(self.kind, key)
+        if head is None or head == known:
+            return version, head, None
+        record = self.backend.load(self.kind, key)
+        return version, head if record is not None else None, record
+
+    async def get(self, key: str) -> Any:
+        value = self.cache.get(key)
+        if self.backend is None:
+            return value
+        known = self._saved.get(key) if value is not None else None
+        version, head, record = await asyncio.to_thread(self._fetch, key, known)
+        if head is None:
+            if value is not None: # Ended or expired by another worker
+                self.cache.pop(key)
+                self._forget(key)
+                self._discard(value)
+            return None
+        if record is not None:
+            meta, turns = record
+            latest = self.decode(meta, turns)
+            self._saved[key] = (json.dumps(meta, sort_keys=True), len(turns))
+            current = self.cache.pop(key)
+            self.cache.set(key, latest)
+            self.reloads += 1
+            if current is not None and current is not latest:
+                self._discard(current)
+            value = latest
+        if version is not None:
+            self._verified[key] = version
+        return value
+
+    async def set(self, key: str, value: Any):
+        self.cache.set(key, value)
+        self._forget(key)
+        await self.save(key, value)
+
+    def _write(self, key: str, meta: dict, new_turns: List[dict], start: int) -> Optional[int]:
+        """Runs in a worker thread. Returns the backend version if no other worker wrote while this one did."""
+        before = self.backend.version()
+        self.backend.save(self.kind, key, meta, new_turns, start)
+        after = self.backend.version()
+        return after if after is not None and after == before else None
+
+    async def save(self, key: str, value: Any):
+        """Writes the session's changes through to the backend (no-op without one)."""
+        if self.backend is None:
+            return
+        meta, turns = self.encode(value)
+        saved = self._saved.get(key)
+        start = saved[1] if saved is not None and saved[1] <= len(turns) else 0
+        count = len(turns)
+        version = await asyncio.to_thread(self._write, key, meta, turns[start:count], start)
+        self._saved[key] = (json.dumps(meta, sort_keys=True), count)
+        if version is not None:
+            self._verified[key] = version
+        else:
+            self._verified.pop(key, None)
+
+    def _write_meta(self, key: str, fields: dict) -> Tuple[Optional[dict], Optional[int]]:
+        """Runs in a worker thread. Returns the merged meta and, if no other worker wrote meanwhile, the backend version."""
+        before = self.backend.version()
+        meta = self.backend.update_meta(self.kind, key, fields)
+        after = self.backend.version()
+        return meta, after if after is not None and after == before else None
+
+    async def save_meta(self, key: str, fields: dict):
+        """
+        Writes only `fields` into the session's stored meta (e.g. progress made by background work), leaving its
+        turns and idle timer alone. Does nothing if the session has ended, been expired or was never saved here.
+        """
+        saved = self._saved.get(key)
+        if self.backend is None or saved is None:
+            return
+        meta, version = await asyncio.to_thread(self._write_meta, key, fields)
+        saved_now = self._saved.get(key)
+        if meta is None or saved_now is None:
+            return
+        expected = {**json.loads(saved_now[0]), **fields}
+        if meta == expected:
+            # Nobody else changed the session: it still matches this worker's copy
+            self._saved[key] = (json.dumps(meta, sort_keys=True), saved_now[1])
+            if version is not None:
+                self._verified[key] = version
+        else:
+            self._verified.pop(key, None) # Re-check the head, and reload if another worker changed it
+
+    async def pop(self, key: str) -> Any:
+        value = self.cache.pop(key)
+        if self.backend is not None:
+            self._forget(key)
+            await asyncio.to_thread(self.backend.delete, self.kind, key)
+        return value
+
+    async def expire_idle(self) -> int:
+        """Expires sessions idle in the backend; returns how many this worker expired."""
+        if self.backend is None:
+            return self.cache.evict_expired()
+        expired = await asyncio.to_thread(self.backend.pop_idle, self.kind, self.cache.idle_timeout)
+        for key, meta, turns in expired:
+            value = self.cache.pop(key)
+            self._forget(key)
+            if self.on_expire is not None:
+                try:
+                    self.on_expire(key, value if value is not None else self.decode(meta, turns))
+                except Exception as e:
+                    print(f"Session expiry hook failed for {key}: {e}")
+        self.cache.evicted_idle += len(expired)
+        return len(expired)
+
+    async def run_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL_S):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.expire_idle()
+            except Exception as e:
+                print(f"Could not expire idle {self.kind} sessions: {e}")
+            self.cache.sweep()
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "reloads": self.reloads,
+            "head_checks": self.head_checks,
+        }
+
+
+def render_session_gauges(stores: Dict[str, SessionStore]) -> str:
+    """Live-session and bytes-held gauges plus eviction counters in the Prometheus text format, one series per store."""
+    lines = []
+    for name, kind, read in (
+        ("sessions_live", "gauge", lambda store: len(store)),
+        ("sessions_bytes_held", "gauge", lambda store: store.bytes_held),
+        ("sessions_evicted_idle_total", "counter", lambda store: store.evicted_idle),
+        ("sessions_evicted_lru_total", "counter", lambda store: store.evicted_lru),
+        ("sessions_evicted_memory_total", "counter", lambda store: store.evicted_memory),
+    ):
+        lines.append(f"# TYPE {name} {kind}")
+        lines += [f'{name}{{store="{label}"}} {read(store)}' for label, store in stores.items()]
+    return "\n".join(lines) + "\n"
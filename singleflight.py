@@ -0,0 +1,103 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class SharedCallCancelledError(RuntimeError):
+    """The shared call a waiter was following was cancelled before it finished."""
+
+
+class _SharedStream:
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[Exception] = None
+        self.condition = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesces identical in-flight calls: while a call for a key is running, later callers with the same key
+        wait for that call instead of starting their own. Streams are fanned out chunk by chunk to every waiter,
+        and late joiners replay the chunks they missed. The shared call runs detached, so one waiter giving up
+        does not cancel it for the others.
+        """
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, _SharedStream] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def _forget_call(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the result of `factory()`, sharing one execution among concurrent callers with the same key."""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget_call(key, f))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    async def _pump(self, key: Hashable, shared: _SharedStream, factory: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for chunk in factory():
+                async with shared.condition:
+                    shared.chunks.append(chunk)
+                    shared.condition.notify_all()
+        except asyncio.CancelledError:
+            shared.cancelled = True # Waiters each get their own error; the cancellation itself propagates
+            raise
+        except Exception as e:
+            shared.error = e
+        finally:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+            async with shared.condition:
+                shared.done = True
+                shared.condition.notify_all()
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Yields the chunks of `factory()`, sharing one upstream stream among concurrent callers with the same key."""
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = self._streams[key] = _SharedStream()
+            shared.task = asyncio.create_task(self._pump(key, shared, factory))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        position = 0
+        while True:
+            async with shared.condition:
+                while position >= len(shared.chunks) and not shared.done:
+                    await shared.condition.wait()
+                pending = shared.chunks[position:]
+                position = len(shared.chunks)
+                done = shared.done
+            for chunk in pending:
+                yield chunk
+            if done:
+                if shared.cancelled:
+                    raise SharedCallCancelledError(f"shared stream {key!r} was cancelled")
+                if shared.error is not None:
+                    raise shared.error
+                return
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+        }
+
+
+# Shared coalescing layer for deterministic LLM calls
+llm_singleflight = SingleFlight()
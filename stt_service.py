@@ -12,6 +12,8 @@ import io
 import asyncio
 from typing import Optional, Callable
 
+from turn_tracing import tracer
+
 class SpeechHandler:
     def __init__(self):
         # Initialize text-to-speech engine
@@ -112,11 +114,12 @@ class SpeechHandler:
         try:
             # Run TTS in thread pool to avoid blocking
             loop = asyncio.get_event_loop()
-            audio_buffer = await loop.run_in_executor(
-                None, 
-                self._blocking_text_to_speech, 
-                text
-            )
+            with tracer.stage("tts"):
+                audio_buffer = await loop.run_in_executor(
+                    None, 
+                    self._blocking_text_to_speech, 
+                    text
+                )
             return audio_buffer
         except Exception as e:
             print(f"TTS failed: {e}")
@@ -189,11 +192,12 @@ class SpeechHandler:
             
             # Run blocking recognition in thread pool
             loop = asyncio.get_event_loop()
-            text = await loop.run_in_executor(
-                None, 
-                self._blocking_speech_recognition, 
-                timeout
-            )
+            with tracer.stage("stt"):
+                text = await loop.run_in_executor(
+                    None, 
+                    self._blocking_speech_recognition, 
+                    timeout
+                )
             
             return text.lower() if text else None
             
@@ -1,24 +1,316 @@
 import os
 import asyncio
-from openai import OpenAI
-from typing import List, Dict
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
+from llm_client import NVIDIA_API_KEY, get_llm_pool
+from explanation_cache import ExplanationCache, get_explanation_cache, make_cache_key, normalize_topic
+from singleflight import llm_singleflight
+from llm_scheduler import PRIORITY_CONCEPT_EXPLANATION, PRIORITY_SUMMARY, PRIORITY_PREWARM
+from response_budget import response_budget
+from context_window import CHARS_PER_TOKEN, estimate_tokens
+
+# Default number of topics explained at once by explain_concepts
+EXPLAIN_BATCH_CONCURRENCY = int(os.getenv("EXPLAIN_BATCH_CONCURRENCY", "4"))
+
+# Transcript tokens per map chunk, chunks evaluated at once, and the most partial-evaluation tokens merged per reduce call
+SUMMARY_CHUNK_TOKEN_BUDGET = int(os.getenv("SUMMARY_CHUNK_TOKEN_BUDGET", "3000"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "6"))
+SUMMARY_REDUCE_TOKEN_BUDGET = int(os.getenv("SUMMARY_REDUCE_TOKEN_BUDGET", "6000"))
+
+# Rough size the running rubric is asked to stay under, in words
+RUBRIC_MAX_WORDS = int(os.getenv("RUBRIC_MAX_WORDS", "350"))
+
+SUMMARY_SYSTEM_PROMPT = "You are an experienced hiring panel member who evaluates interview transcripts fairly and strictly against the given criteria."
+
+
+def split_exchanges(history: List[Dict[str, str]]) -> List[str]:
+    """
+    Splits an interview history into question/answer exchanges: each interviewer turn together with the
+    candidate replies that follow it. System messages and the hidden start instruction are skipped.
+    """
+    exchanges: List[List[str]] = []
+    for index, turn in enumerate(history):
+        content = (turn.get('content') or "").strip()
+        if turn['role'] == 'system' or not content:
+            continue
+        if turn['role'] == 'user' and not any(t['role'] == 'assistant' for t in history[:index]):
+            continue # The "start the interview" instruction, not something the candidate said
+        if turn['role'] == 'assistant' or not exchanges:
+            exchanges.append([])
+        speaker = "Interviewer" if turn['role'] == 'assistant' else "Candidate"
+        exchanges[-1].append(f"{speaker}: {content}")
+    return ["\n".join(lines) for lines in exchanges]
+
+
+def pack_chunks(items: List[str], token_budget: int) -> List[List[str]]:
+    """Groups consecutive items into chunks of at most `token_budget` estimated tokens (an oversized item gets its own chunk)."""
+    chunks: List[List[str]] = []
+    chunk_tokens = 0
+    for item in items:
+        tokens = estimate_tokens(item)
+        if not chunks or chunk_tokens + tokens > token_budget:
+            chunks.append([])
+            chunk_tokens = 0
+        chunks[-1].append(item)
+        chunk_tokens += tokens
+    return chunks
+
+
+def truncate_to_tokens(text: str, token_budget: int) -> str:
+    """Cuts `text` to about `token_budget` estimated tokens, marking the cut."""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    return text[:max(0, token_budget) * CHARS_PER_TOKEN].rstrip() + " [...]"
+
+
+class InterviewSummarizerNVIDIA:
+    temperature = 0.2
+
+    def __init__(
+        self,
+        model_name: str = "openai/gpt-oss-20b",
+        api_key: str = None,
+        chunk_token_budget: int = SUMMARY_CHUNK_TOKEN_BUDGET,
+        map_concurrency: int = SUMMARY_MAP_CONCURRENCY,
+        reduce_token_budget: int = SUMMARY_REDUCE_TOKEN_BUDGET,
+    ):
+        """
+        Map-reduce interview evaluator.
+        The transcript is split into question/answer exchanges and packed into chunks of about
+        `chunk_token_budget` tokens. Each chunk is scored against the criteria in parallel (map), and the partial
+        evaluations are merged into the final summary (reduce). Short interviews that fit in one chunk are
+        evaluated in a single call. Because the map calls run side by side, end-of-interview latency stays
+        roughly one map call plus one reduce call however long the interview was.
+        """
+        self.llm = get_llm_pool(api_key=api_key)
+        self.model_name = model_name
+        self.chunk_token_budget = chunk_token_budget
+        self.map_concurrency = map_concurrency
+        self.reduce_token_budget = reduce_token_budget
+
+        print(f"InterviewSummarizerNVIDIA initialized with model: {self.model_name}")
+
+    async def _complete(self, prompt: str, call_type: str, priority: int = PRIORITY_SUMMARY) -> str:
+        completion = await self.llm.complete_chat(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=self.temperature,
+            top_p=0.9,
+            max_tokens=response_budget.max_tokens(call_type),
+            priority=priority
+        )
+        choice = completion.choices[0]
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            details = getattr(usage, "completion_tokens_details", None)
+            reasoning_tokens = getattr(details, "reasoning_tokens", None) or 0
+            response_budget.observe(
+                call_type, usage.completion_tokens - reasoning_tokens, choice.finish_reason == "length", reasoning_tokens=reasoning_tokens
+            )
+        return (choice.message.content or "").strip()
+
+    async def _evaluate_chunk(self, exchanges: List[str], first: int, total: int, criteria: str) -> str:
+        last = first + len(exchanges) - 1
+        prompt = (
+            f"Evaluation criteria:\n{criteria}\n\n"
+            f"Below are exchanges {first} to {last} of an interview with {total} exchanges in total.\n\n"
+            + "\n\n".join(exchanges) +
+            "\n\nEvaluate only these exchanges against each criterion. For every criterion that they give evidence "
+            "for, note a score out of 10 and the specific evidence (quote briefly). Mention criteria with no "
+            "evidence in these exchanges as 'not covered'. Do not write an overall verdict."
+        )
+        try:
+            return await self._complete(prompt, "summary_partial")
+        except Exception as e:
+            # One failed chunk should not sink the whole evaluation; the reduce step is told about the gap
+            print(f"Error evaluating interview exchanges {first}-{last}: {e}")
+            return f"[Exchanges {first}-{last} could not be evaluated.]"
+
+    async def _reduce(self, partials: List[str], criteria: str, final: bool) -> str:
+        prompt = (
+            f"Evaluation criteria:\n{criteria}\n\n"
+            "Below are partial evaluations, each covering consecutive parts of the same interview, in order.\n\n"
+            + "\n\n".join(f"--- Part {i} ---\n{partial}" for i, partial in enumerate(partials, 1))
+        )
+        if final:
+            prompt += (
+                "\n\nMerge them into the final interview evaluation: a score out of 10 for each criterion with a "
+                "short justification based on the evidence across all parts, the candidate's key strengths and "
+                "weaknesses, and an overall recommendation."
+            )
+            return await self._complete(prompt, "summary")
+        prompt += "\n\nMerge them into a single partial evaluation in the same format, keeping the evidence per criterion."
+        return await self._complete(prompt, "summary_partial")
+
+    async def summarize_interview(self, history: List[Dict[str, str]], criteria: str) -> str:
+        """Evaluates a whole interview history against `criteria` and returns the summary text."""
+        exchanges = split_exchanges(history)
+        if not exchanges:
+            return "The interview ended before any questions were answered, so there is nothing to evaluate."
+
+        chunks = pack_chunks(exchanges, self.chunk_token_budget)
+        if len(chunks) == 1:
+            prompt = (
+                f"Evaluation criteria:\n{criteria}\n\nInterview transcript:\n\n" + "\n\n".join(exchanges) +
+                "\n\nEvaluate the candidate: a score out of 10 for each criterion with a short justification, "
+                "key strengths and weaknesses, and an overall recommendation."
+            )
+            return await self._complete(prompt, "summary")
+
+        # Map: score every chunk in parallel
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+        starts = []
+        position = 1
+        for chunk in chunks:
+            starts.append(position)
+            position += len(chunk)
+
+        async def evaluate(chunk: List[str], first: int) -> str:
+            async with semaphore:
+                return await self._evaluate_chunk(chunk, first, len(exchanges), criteria)
+
+        partials = await asyncio.gather(*(evaluate(chunk, first) for chunk, first in zip(chunks, starts)))
+        print(f"Interview evaluated in {len(chunks)} chunks ({len(exchanges)} exchanges).")
+
+        async def merge(group: List[str]) -> str:
+            return group[0] if len(group) == 1 else await self._reduce(group, criteria, final=False)
+
+        # Reduce: merge groups of partials until they fit into one final call
+        partials = list(partials)
+        budget = self.reduce_token_budget
+        while len(partials) > 1 and sum(estimate_tokens(partial) for partial in partials) > budget:
+            groups = pack_chunks(partials, budget)
+            if len(groups) == len(partials):
+                # No two neighbours fit together: merge them pairwise, each cut to its share of the budget
+                groups = [[truncate_to_tokens(partial, budget // 2) for partial in partials[i:i + 2]] for i in range(0, len(partials), 2)]
+            partials = list(await asyncio.gather(*(merge(group) for group in groups)))
+        # Whatever is left (e.g. one oversized partial) is cut to fit the final call
+        partials = [truncate_to_tokens(partial, budget // len(partials)) for partial in partials]
+        return await self._reduce(partials, criteria, final=True)
+
+    async def update_rubric(self, rubric: str, exchanges: List[str], first: int, criteria: str, priority: int = PRIORITY_PREWARM) -> str:
+        """Folds new exchanges (numbered from `first`) into the running per-criterion rubric notes and returns the new notes."""
+        prompt = (
+            f"Evaluation criteria:\n{criteria}\n\n"
+            f"Rubric notes so far:\n{rubric or '(none yet)'}\n\n"
+            f"New interview exchanges, starting at exchange {first}:\n\n" + "\n\n".join(exchanges) +
+            "\n\nUpdate the rubric notes with the new exchanges. For each criterion keep one entry: a running "
+            "score out of 10 (or 'not covered yet') and the one or two strongest pieces of evidence so far. "
+            f"Keep the notes under {RUBRIC_MAX_WORDS} words and return only the updated notes."
+        )
+        return await self._complete(prompt, "summary_partial", priority)
+
+    async def render_rubric(self, rubric: str, criteria: str) -> str:
+        """Turns finished rubric notes into the final interview evaluation."""
+        prompt = (
+            f"Evaluation criteria:\n{criteria}\n\n"
+            f"Rubric notes covering the whole interview:\n{rubric}\n\n"
+            "Write the final interview evaluation from these notes: a score out of 10 for each criterion with a "
+            "short justification, the candidate's key strengths and weaknesses, and an overall recommendation."
+        )
+        return await self._complete(prompt, "summary")
+
+
+class RunningEvaluator:
+    def __init__(self, criteria: str, summarizer: Optional[InterviewSummarizerNVIDIA] = None):
+        """
+        Background evaluator attached to one interview session.
+        After each completed exchange the new exchanges are folded into a compact per-criterion rubric, in the
+        lowest scheduler lane and off the interview's critical path. Updates never overlap: exchanges that
+        complete while one is running are picked up together by the next. finalize() then only has to fold in
+        the last exchange and render the rubric. If an update fails the evaluator gives up and finalize()
+        returns None, so the caller can fall back to InterviewSummarizerNVIDIA.summarize_interview.
+        `on_progress()`, if set, is awaited after a background update folded in new exchanges, e.g. to persist
+        the rubric so other workers resume from it rather than redo it.
+        """
+        self.criteria = criteria
+        self.summarizer = summarizer or InterviewSummarizerNVIDIA()
+        self.rubric = ""
+        self.evaluated = 0 # Exchanges already folded into the rubric
+        self.failed = False
+        self._history: List[Dict[str, str]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.on_progress: Optional[Callable[[], Awaitable[None]]] = None
+
+    def resume(self, rubric: str, evaluated: int, history: List[Dict[str, str]]):
+        """
+        Restores a saved rubric (e.g. from another worker). Nothing is scheduled here: the next update() or
+        finalize() catches up on the exchanges it does not cover yet.
+        """
+        self.rubric = rubric
+        self.evaluated = evaluated if rubric else 0
+        self._history = history
+
+    def update(self, history: List[Dict[str, str]]):
+        """Call after the interviewer replies; schedules a rubric update for any newly completed exchanges."""
+        self._history = history
+        if not self.failed and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._background_update())
+
+    async def _background_update(self):
+        evaluated = self.evaluated
+        await self._catch_up(include_last=False)
+        if self.evaluated > evaluated and self.on_progress is not None:
+            try:
+                await self.on_progress()
+            except Exception as e:
+                print(f"Could not save running evaluation progress: {e}")
+
+    async def _catch_up(self, include_last: bool, priority: int = PRIORITY_PREWARM):
+        while not self.failed:
+            exchanges = split_exchanges(self._history)
+            if not include_last:
+                exchanges = exchanges[:-1] # The latest question has not been answered yet
+            pending = exchanges[self.evaluated:]
+            if not pending:
+                return
+            batch = pack_chunks(pending, self.summarizer.chunk_token_budget)[0]
+            try:
+                self.rubric = await self.summarizer.update_rubric(self.rubric, batch, self.evaluated + 1, self.criteria, priority)
+            except Exception as e:
+                print(f"Running evaluation failed; falling back to a full summary at the end: {e}")
+                self.failed = True
+                return
+            self.evaluated += len(batch)
+
+    async def finalize(self) -> Optional[str]:
+        """Waits for the running update, folds in the remaining exchanges and renders the final evaluation."""
+        if self._task is not None:
+            # wait() does not raise if the update was cancelled (e.g. its session copy was discarded); the catch-up
+            # below resumes from the last exchange it finished
+            await asyncio.wait({self._task})
+        # The candidate is waiting now, so the last catch-up runs in the summary lane
+        await self._catch_up(include_last=True, priority=PRIORITY_SUMMARY)
+        if self.failed or not self.rubric:
+            return None
+        return await self.summarizer.render_rubric(self.rubric, self.criteria)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
 
 class ConceptExplainerNVIDIA:
-    def __init__(self, model_name: str = "openai/gpt-oss-20b", api_key: str = None):
+    temperature = 0.3
+
+    def __init__(self, model_name: str = "openai/gpt-oss-20b", api_key: str = None, cache: Optional[ExplanationCache] = None, use_cache: bool = True):
         if api_key is None:
-            api_key = "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"
+            api_key = NVIDIA_API_KEY
             if not api_key:
                 raise ValueError("NVIDIA API Key not provided and NVAPI_KEY environment variable not set.")
         
-        self.client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key=api_key
-        )
+        self.llm = get_llm_pool(api_key=api_key)
         self.model_name = model_name
+        # Explanations are deterministic enough at low temperature to be reused across candidates
+        self.cache = (cache or get_explanation_cache()) if use_cache else None
         
         print(f"ConceptExplainerNVIDIA initialized with model: {self.model_name}")
 
-    async def explain_concept(self, concept: str) -> str:
+    async def _stream_explanation(self, concept: str) -> AsyncIterator[str]:
+        """
+        Upstream NVIDIA API call: yields explanation deltas and caches the full text once the stream completes.
+        """
         prompt = f"Explain the concept of '{concept}' in detail, suitable for someone studying for an aptitude test. Provide examples if applicable. Keep the explanation concise yet comprehensive."
         
         messages = [
@@ -29,55 +321,96 @@ class ConceptExplainerNVIDIA:
         print(f"Calling NVIDIA API for concept explanation on: '{concept}' using '{self.model_name}'...")
 
         full_explanation_content = []
-        try:
-            completion = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.3,
-                top_p=0.9,
-                max_tokens=1500,
-                stream=True
-            )
+        max_tokens = response_budget.max_tokens("explanation")
+        completion = self.llm.stream_chat(
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            top_p=0.9,
+            max_tokens=max_tokens,
+            priority=PRIORITY_CONCEPT_EXPLANATION
+        )
+
+        completion_tokens = 0
+        reasoning_tokens = 0
+        hit_length_limit = False
+        async for chunk in completion:
+            if chunk.choices and chunk.choices[0]:
+                hit_length_limit = hit_length_limit or chunk.choices[0].finish_reason == "length"
+                reasoning = getattr(chunk.choices[0].delta, "reasoning_content", None)
+                if reasoning:
+                    reasoning_tokens += 1 # Budgeted apart from the explanation itself
+                    reasoning = response_budget.handle_reasoning("explanation", reasoning)
+                    if reasoning:
+                        full_explanation_content.append(reasoning)
+                        yield reasoning
+            if chunk.choices and chunk.choices[0] and chunk.choices[0].delta.content is not None:
+                completion_tokens += 1
+                full_explanation_content.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+
+        response_budget.observe("explanation", completion_tokens, hit_length_limit, reasoning_tokens=reasoning_tokens)
+        explanation_text = "".join(full_explanation_content).strip()
+        if not explanation_text:
+            print(f"WARNING: no explanation received for concept '{concept}'.")
+        if explanation_text and self.cache is not None:
+            await asyncio.to_thread(self.cache.set, concept, self.model_name, self.temperature, explanation_text)
+
+    async def explain_concept_stream(self, concept: str) -> AsyncIterator[str]:
+        """
+        Yields the explanation as it is generated. Concurrent requests for the same topic share a single
+        upstream stream, which is fanned out to every waiter.
+        """
+        if self.cache is not None:
+            cached = self.cache.peek(concept, self.model_name, self.temperature)
+            if cached is None:
+                cached = await asyncio.to_thread(self.cache.get, concept, self.model_name, self.temperature)
+            if cached is not None:
+                yield cached
+                return
+
+        key = ("explain_concept", make_cache_key(concept, self.model_name, self.temperature))
+        async for delta in llm_singleflight.stream(key, lambda: self._stream_explanation(concept)):
+            yield delta
 
-            # --- DEBUGGING START ---
-            found_content = False
-            for chunk in completion:
-                # Print the raw chunk to see what's coming back
-                # print(f"Raw chunk: {chunk}") 
-                if chunk.choices and chunk.choices[0] and chunk.choices[0].delta.content is not None:
-                    full_explanation_content.append(chunk.choices[0].delta.content)
-                    found_content = True
-            
-            if not found_content:
-                print(f"DEBUG: No content found in any chunk for concept '{concept}'.")
-                # If no content, try fetching non-streaming to see the full error/response structure
-                print(f"DEBUG: Attempting non-streaming call for concept '{concept}' for more error details.")
-                non_stream_completion = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    temperature=0.3,
-                    top_p=0.9,
-                    max_tokens=1500,
-                    stream=False # Try non-streaming to get potential error messages directly
-                )
-                if hasattr(non_stream_completion.choices[0].message, 'content') and non_stream_completion.choices[0].message.content:
-                     print(f"DEBUG (Non-Stream) Full response content: {non_stream_completion.choices[0].message.content}")
-                else:
-                     print(f"DEBUG (Non-Stream) No content found. Full completion object: {non_stream_completion}")
-
-            # --- DEBUGGING END ---
-
-            explanation_text = "".join(full_explanation_content).strip()
-            print(f"Full Explanation for '{concept}':\n{explanation_text if explanation_text else '[No explanation received]'}\n--------------------------------------------------")
-            return explanation_text
+    async def explain_concept(self, concept: str) -> str:
+        try:
+            full_explanation_content = [delta async for delta in self.explain_concept_stream(concept)]
+            return "".join(full_explanation_content).strip()
         except Exception as e:
             print(f"Error in NVIDIA API call for concept explanation: {e}")
             return f"Failed to get explanation due to API error: {e}"
 
+    async def explain_concepts(self, concepts: List[str], max_concurrency: Optional[int] = None) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Explains several topics concurrently, at most `max_concurrency` at a time, yielding (topic, explanation)
+        pairs as each one finishes. Topics that normalize to the same key are explained once and reported
+        under their first spelling.
+        """
+        unique_concepts = {}
+        for concept in concepts:
+            if concept and concept.strip():
+                unique_concepts.setdefault(normalize_topic(concept), concept.strip())
+
+        semaphore = asyncio.Semaphore(max_concurrency or EXPLAIN_BATCH_CONCURRENCY)
+
+        async def explain_one(concept: str) -> Tuple[str, str]:
+            async with semaphore:
+                return concept, await self.explain_concept(concept)
+
+        tasks = [asyncio.create_task(explain_one(concept)) for concept in unique_concepts.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer stopped early (e.g. client disconnected): don't leave orphaned calls running
+            for task in tasks:
+                task.cancel()
+
 if __name__ == "__main__":
     async def test_concept_explainer():
-        # Make sure your API key is correct here or set as NVAPI_KEY
-        explainer = ConceptExplainerNVIDIA(api_key="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") 
+        # Reads the API key from the NVAPI_KEY environment variable
+        explainer = ConceptExplainerNVIDIA()
 
         concepts_to_explain = [
             "Probability",
@@ -87,7 +420,7 @@ if __name__ == "__main__":
             "Merge Sort Algorithm"
         ]
 
-        for concept in concepts_to_explain:
-            await explainer.explain_concept(concept)
+        async for concept, explanation in explainer.explain_concepts(concepts_to_explain):
+            print(f"Done: {concept} ({len(explanation)} chars)")
 
     asyncio.run(test_concept_explainer())
\ No newline at end of file
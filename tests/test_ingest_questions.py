@@ -0,0 +1,81 @@
+import os
+import json
+
+import pytest
+
+import ingest_questions
+from ingest_questions import ingest, iter_blocks, parse_block
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "accenture_sample.txt")
+SAMPLE_HEADER = r"Accenture Aptitude Questions and Answers with Explanation"
+
+
+@pytest.fixture(autouse=True)
+def no_strip_patterns():
+    ingest_questions._init_worker([])
+    yield
+    ingest_questions._init_worker([])
+
+
+@pytest.mark.parametrize("chunk_size", [1 << 20, 37, 5, 1])
+def test_sample_splits_into_25_numbered_blocks(chunk_size):
+    blocks = list(iter_blocks(SAMPLE_PATH, chunk_size))
+    assert [number for _, number, _ in blocks] == list(range(1, 26))
+    # Numbers inside explanations ("x = 40 2. 5 men") end a block only where the next question starts
+    assert blocks[0][2].rstrip().endswith("So we get x = 40")
+    assert blocks[1][2].startswith("5 men and 10 boys")
+
+
+@pytest.mark.parametrize("chunk_size", [1 << 20, 37, 5])
+def test_sample_parses_25_of_25(chunk_size):
+    results = [parse_block(block) for block in iter_blocks(SAMPLE_PATH, chunk_size)]
+    assert [reason for _, reason, _ in results] == [None] * 25
+    first = results[0][0]
+    assert first["question"] == "A certain number of men take 45 days to complete work. If there are 10 men less then they will take 60 days to complete the work. Find the original number of men."
+    assert first["options"] == ["A. 50", "B. 60", "C. 30", "D. 40"]
+    assert first["correct_option_index"] == 3
+    assert first["explanation"] == "Let us assume initially there are X men. Then x*45 = (x-10)*60. So we get x = 40"
+    # A header between the options and the answer stays out of the answer and explanation
+    tenth = results[9][0]
+    assert tenth["correct_option_index"] == 2
+    assert tenth["explanation"] == "(S-R)*42/5 = (S+R)*7 S:R = 11:1"
+
+
+def test_strip_removes_repeated_headers():
+    ingest_questions._init_worker([SAMPLE_HEADER])
+    results = [parse_block(block)[0] for block in iter_blocks(SAMPLE_PATH)]
+    assert results[9]["options"] == ["A. 11:5", "B. 11:6", "C. 11:1", "D. 6:5"]
+    assert not any(SAMPLE_HEADER in record["explanation"] for record in results)
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("What is 2 + 2? A. 3 B. 4 C. 5 D. 6 Explanation: 2 + 2 = 4", "no answer"),
+    ("What is 2 + 2? A. 3 B. 4 Answer - D. 6", "answer not among options"),
+    ("What is 2 + 2? A. 4 Answer - A. 4", "fewer than two options"),
+    ("A. 3 B. 4 Answer - B. 4", "empty question"),
+])
+def test_rejects(text, reason):
+    block = ("sample.txt", 1, text)
+    record, rejected, returned = parse_block(block)
+    assert record is None
+    assert rejected == reason
+    assert returned is block
+
+
+def test_duplicates_are_rejected_within_an_import(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    sample = open(SAMPLE_PATH, encoding="utf-8").read()
+    (raw / "first.txt").write_text(sample, encoding="utf-8")
+    (raw / "second.txt").write_text(sample, encoding="utf-8")
+    bank_path = tmp_path / "questions.json"
+    bank_path.write_text("[]", encoding="utf-8")
+    rejects_path = tmp_path / "rejects.jsonl"
+
+    report = ingest([str(raw)], str(bank_path), rejects_path=str(rejects_path), workers=1, dry_run=True)
+
+    assert report["blocks"] == 50
+    assert report["accepted"] == 25
+    assert report["rejected"] == {"duplicate": 25}
+    rejects = [json.loads(line) for line in rejects_path.read_text(encoding="utf-8").splitlines()]
+    assert {reject["source"] for reject in rejects} == {"second.txt"}
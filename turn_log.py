@@ -0,0 +1,66 @@
+import json
+import zlib
+from typing import Dict, List, Optional
+
+
+class Turn:
+    __slots__ = ("turn_id", "role", "content", "encoded", "source", "digest")
+
+    def __init__(self, turn_id: int, role: str, content: str, source: Optional[Dict[str, str]] = None, previous_digest: int = 0):
+        self.turn_id = turn_id
+        self.role = role
+        self.content = content
+        self.source = source # The history entry this turn was logged from, to notice when it has been replaced
+        # Serialized once when the turn is logged; pages are built by joining these
+        self.encoded = json.dumps({"turn_id": turn_id, "role": role, "content": content}).encode("utf-8")
+        # Checksum chained over every turn up to this one, so it identifies the whole transcript so far
+        self.digest = zlib.crc32(self.encoded, previous_digest)
+
+
+class TurnLog:
+    __slots__ = ("_turns",)
+
+    def __init__(self):
+        """
+        Append-only, compact log of an interview's turns with monotonically increasing turn ids (the turn's
+        position in the history). It mirrors a history list: sync() only logs the turns added since the last
+        call, so polling a long transcript does not re-process the turns already seen.
+        """
+        self._turns: List[Turn] = []
+
+    def truncate(self, length: int):
+        """Drops logged turns from index `length` on (e.g. a user turn whose reply never arrived)."""
+        del self._turns[length:]
+
+    def sync(self, history: List[Dict[str, str]]) -> int:
+        """Logs any turns appended to `history` since the last sync; returns the number of logged turns."""
+        if self._turns and (len(history) < len(self._turns) or history[len(self._turns) - 1] is not self._turns[-1].source):
+            # History was replaced, or rolled back and re-extended, since the last sync: rebuild from the first changed turn
+            self.truncate(next(
+                (i for i, turn in enumerate(self._turns) if i >= len(history) or history[i] is not turn.source),
+                len(self._turns),
+            ))
+        for turn_id in range(len(self._turns), len(history)):
+            turn = history[turn_id]
+            self._turns.append(Turn(turn_id, turn["role"], turn["content"], turn, self._turns[-1].digest if self._turns else 0))
+        return len(self._turns)
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def version(self) -> str:
+        """
+        Identifies the logged transcript by content: it changes whenever a turn is added, rolled back or
+        replaced, and is the same on every worker holding the same transcript (used as the history ETag).
+        """
+        return f"{len(self._turns)}-{self._turns[-1].digest:08x}" if self._turns else "0"
+
+    @property
+    def last_turn_id(self) -> Optional[int]:
+        return self._turns[-1].turn_id if self._turns else None
+
+    def page(self, since: Optional[int] = None, limit: Optional[int] = None) -> List[Turn]:
+        """Turns with an id greater than `since` (all turns when None), oldest first, at most `limit` of them (no limit when None)."""
+        start = 0 if since is None else max(0, since + 1)
+        return self._turns[start:] if limit is None else self._turns[start:start + limit]
@@ -0,0 +1,194 @@
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sample_window import SampleWindow
+from llm_scheduler import PRIORITY_NAMES
+
+TRACE_RECENT_TURNS = int(os.getenv("TRACE_RECENT_TURNS", "50"))
+
+# Bucket upper bounds (Prometheus `le` labels)
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0, 34.0, 60.0)
+TOKENS_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 120, 160, 240, 320)
+
+# Stages of an interview turn, in the order they happen
+STAGES = ("stt", "queue_wait", "ttft", "generation", "done_check", "tts", "turn")
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], label: str):
+        """Cumulative-bucket histogram with a single label, rendered in the Prometheus text format."""
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._series: Dict[str, list] = {} # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock() # STT/TTS timings may be recorded from worker threads
+
+    def observe(self, label_value: str, value: float):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                labels = f'{self.label}="{label_value}"'
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[len(self.buckets)]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series[-1]}")
+                lines.append(f"{self.name}_count{{{labels}}} {series[len(self.buckets)]}")
+        return lines
+
+
+class TurnTrace:
+    __slots__ = ("tracer", "turn_id", "kind", "session_id", "started_at", "spans", "metrics", "duration_s")
+
+    def __init__(self, tracer: "Tracer", kind: str, session_id: Optional[str] = None):
+        """Spans and LLM metrics of one interview turn; passed explicitly to the calls that make up the turn."""
+        self.tracer = tracer
+        self.turn_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.spans: List[Tuple[str, float]] = []
+        self.metrics: Dict[str, float] = {}
+        self.duration_s: Optional[float] = None
+
+    def add_span(self, stage: str, seconds: float):
+        self.spans.append((stage, seconds))
+        self.tracer.stage_seconds.observe(stage, seconds)
+        self.tracer._observe_stage(stage, seconds)
+
+    def finish(self):
+        """Records the whole turn; only the first call counts."""
+        if self.duration_s is None:
+            self.duration_s = time.time() - self.started_at
+            self.add_span("turn", self.duration_s)
+            self.tracer._recent.append(self)
+
+    def as_dict(self) -> dict:
+        return {
+            "turn_id": self.turn_id,
+            "kind": self.kind,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "spans": [{"stage": stage, "seconds": round(seconds, 4)} for stage, seconds in self.spans],
+            "metrics": self.metrics,
+        }
+
+
+class Tracer:
+    def __init__(self, recent_turns: int = TRACE_RECENT_TURNS):
+        """
+        Per-stage latency and token instrumentation.
+        Interview turns carry a TurnTrace through STT, queue wait, time to first token, generation, the
+        done-check and TTS; every span also feeds the `interview_stage_seconds` histogram. LLM calls record
+        queue wait, time to first token, tokens/sec and prompt/completion tokens per scheduler lane, whether or
+        not they belong to a turn. Histograms are exported in the Prometheus text format by render_prometheus().
+        """
+        self.stage_seconds = Histogram("interview_stage_seconds", "Duration of each stage of an interview turn.", SECONDS_BUCKETS, "stage")
+        self.queue_wait = Histogram("llm_queue_wait_seconds", "Time LLM requests spent waiting for scheduler admission.", SECONDS_BUCKETS, "lane")
+        self.ttft = Histogram("llm_time_to_first_token_seconds", "Time from request to first streamed chunk.", SECONDS_BUCKETS, "lane")
+        self.tokens_per_second = Histogram("llm_tokens_per_second", "Streamed completion tokens per second after the first token.", RATE_BUCKETS, "lane")
+        self.prompt_tokens = Histogram("llm_prompt_tokens", "Prompt tokens per LLM request (estimated for streams).", TOKENS_BUCKETS, "lane")
+        self.completion_tokens = Histogram("llm_completion_tokens", "Completion tokens per LLM request.", TOKENS_BUCKETS, "lane")
+        self._stage_latency: Dict[str, SampleWindow] = {}
+        self._recent = deque(maxlen=recent_turns)
+
+    def start_turn(self, kind: str, session_id: Optional[str] = None) -> TurnTrace:
+        return TurnTrace(self, kind, session_id)
+
+    def _observe_stage(self, stage: str, seconds: float):
+        tracker = self._stage_latency.get(stage)
+        if tracker is None:
+            tracker = self._stage_latency[stage] = SampleWindow(window=500)
+        tracker.observe(seconds)
+
+    @contextmanager
+    def stage(self, stage: str, trace: Optional[TurnTrace] = None) -> Iterator[None]:
+        """Times a block as `stage`, inside `trace` when given (e.g. STT and TTS, which also run outside turns)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if trace is not None:
+                trace.add_span(stage, seconds)
+            else:
+                self.stage_seconds.observe(stage, seconds)
+                self._observe_stage(stage, seconds)
+
+    def observe_queue_wait(self, priority: int, seconds: float, trace: Optional[TurnTrace] = None):
+        self.queue_wait.observe(PRIORITY_NAMES.get(priority, str(priority)), seconds)
+        if trace is not None:
+            trace.add_span("queue_wait", seconds)
+
+    def observe_stream(
+        self,
+        priority: int,
+        ttft: float,
+        generation: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        trace: Optional[TurnTrace] = None,
+    ):
+        """Records a finished (or abandoned) streamed completion."""
+        lane = PRIORITY_NAMES.get(priority, str(priority))
+        rate = completion_tokens / generation if generation > 0 else 0.0
+        self.ttft.observe(lane, ttft)
+        self.prompt_tokens.observe(lane, prompt_tokens)
+        self.completion_tokens.observe(lane, completion_tokens)
+        if completion_tokens > 1:
+            self.tokens_per_second.observe(lane, rate)
+        if trace is not None:
+            trace.add_span("ttft", ttft)
+            trace.add_span("generation", generation)
+            trace.metrics["prompt_tokens"] = trace.metrics.get("prompt_tokens", 0) + prompt_tokens
+            trace.metrics["completion_tokens"] = trace.metrics.get("completion_tokens", 0) + completion_tokens
+            trace.metrics["tokens_per_second"] = round(rate, 1)
+
+    def observe_completion(self, priority: int, prompt_tokens: int, completion_tokens: int):
+        lane = PRIORITY_NAMES.get(priority, str(priority))
+        self.prompt_tokens.observe(lane, prompt_tokens)
+        self.completion_tokens.observe(lane, completion_tokens)
+
+    def recent(self, limit: int = 10) -> List[dict]:
+        """The most recent finished turns, newest first."""
+        return [trace.as_dict() for trace in list(self._recent)[::-1][:limit]]
+
+    def stage_summary(self) -> Dict[str, dict]:
+        """Count, p50 and p95 per stage, from a rolling window of recent spans."""
+        summary = {}
+        for stage in sorted(self._stage_latency, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            tracker = self._stage_latency[stage]
+            summary[stage] = {
+                "count": len(tracker),
+                "p50_s": tracker.percentile(0.5),
+                "p95_s": tracker.percentile(0.95),
+            }
+        return summary
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for histogram in (self.stage_seconds, self.queue_wait, self.ttft, self.tokens_per_second, self.prompt_tokens, self.completion_tokens):
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+
+# Shared tracer for both the Gradio and FastAPI front ends
+tracer = Tracer()